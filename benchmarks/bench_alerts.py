@@ -0,0 +1,76 @@
+"""
+Micro-benchmark: alert rendering with the cached HostContext and the
+precompiled templates, against the previous path that resolved the host IP
+and device info for every alert.
+
+    python benchmarks/bench_alerts.py --alerts 10000 --digest-size 25
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'nsfw_quarantine_app'))
+
+from alert_mailer import (Alert, HostContext, build_digest_message, get_device_info, get_ip_address,
+                          render_alert, render_digest)
+
+REASONS = [
+    ["NSFW content detected with 97.12% confidence."],
+    ["Profanity detected in text file.", "Censored preview: **** this ****..."],
+    ["Hate speech detected in text (92.40% confidence)."],
+]
+
+
+def make_alerts(count):
+    timestamp = datetime.now().isoformat()
+    return [Alert(f"/data/uploads/{i:06d}.jpg", REASONS[i % len(REASONS)], f"quarantine/{i:06d}.jpg", timestamp)
+            for i in range(count)]
+
+
+def bench(label, fn, alerts, per_call):
+    start = time.perf_counter()
+    fn(alerts)
+    elapsed = time.perf_counter() - start
+    print(f"{label:28s} {elapsed:8.3f} s  {len(alerts) / elapsed:12,.0f} alerts/s  "
+          f"{elapsed / (len(alerts) / per_call) * 1e6:10.1f} us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--alerts', type=int, default=10000, help='Alerts to render (default: 10000)')
+    parser.add_argument('--digest-size', type=int, default=25, help='Alerts per digest (default: 25)')
+    args = parser.parse_args()
+
+    alerts = make_alerts(args.alerts)
+    host = HostContext()
+
+    start = time.perf_counter()
+    get_ip_address()
+    print(f"host lookup: {(time.perf_counter() - start) * 1000:.2f} ms per call")
+
+    def per_alert_lookup(items):
+        for alert in items:
+            render_alert(alert, (get_ip_address(), get_device_info()))
+
+    def cached_host(items):
+        for alert in items:
+            render_alert(alert, host.get())
+
+    def digests(items):
+        for i in range(0, len(items), args.digest_size):
+            render_digest(items[i:i + args.digest_size], host.get())
+
+    def digest_messages(items):
+        for i in range(0, len(items), args.digest_size):
+            build_digest_message(items[i:i + args.digest_size], 'alerts@example.com', 'admin@example.com')
+
+    bench('lookup per alert', per_alert_lookup, alerts, 1)
+    bench('cached host context', cached_host, alerts, 1)
+    bench(f'digests of {args.digest_size}', digests, alerts, args.digest_size)
+    bench(f'digest emails of {args.digest_size}', digest_messages, alerts, args.digest_size)
+
+
+if __name__ == '__main__':
+    main()
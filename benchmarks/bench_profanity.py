@@ -0,0 +1,161 @@
+"""
+Micro-benchmark: the precompiled Aho-Corasick ProfanityMatcher against the
+previous better_profanity path (load_censor_words + contains_profanity + censor
+on every file), and a verdict parity check between the two on short texts full
+of look-alikes, spaced-out letters and punctuation.
+
+    python benchmarks/bench_profanity.py --docs 200 --doc-bytes 4096
+    python benchmarks/bench_profanity.py --parity-texts 50000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'nsfw_quarantine_app'))
+
+from profanity_matcher import CHARS_MAPPING, ProfanityMatcher, default_wordlist_path
+
+FILLER = (
+    "the quick brown fox jumps over lazy dog report server request latency queue "
+    "batch model image text file scan result cache window token stream offset"
+).split()
+# Clean words close to wordlist entries, and texts the two implementations once disagreed on
+NEAR_MISSES = "sh shi she tit tat assess class hell's he'll well Dr. I a".split()
+PARITY_CASES = [
+    "run the sh script", "Dr. Shi presented the results", "s h i t", "s h i t ", "f u c k", "f u c k.",
+    "hell's kitchen", "sh!t", "sh!t happens", "blow  job", "p.u.s.s.y.", "shit's", "son-of-a-bitch",
+]
+SEPARATORS = [' ', '  ', '-', '.', ', ', '!', '_', '+', "'", '\n']
+
+
+def make_corpus(words, docs, doc_bytes, profane_rate, seed=0):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(docs):
+        parts = []
+        size = 0
+        while size < doc_bytes:
+            word = rng.choice(words) if rng.random() < profane_rate else rng.choice(FILLER)
+            parts.append(word)
+            size += len(word) + 1
+        corpus.append(' '.join(parts))
+    return corpus
+
+
+def make_parity_texts(words, count, seed=0):
+    """Short texts of wordlist entries in disguise (look-alikes, case, spacing, suffixes) among near misses."""
+    rng = random.Random(seed)
+
+    def disguise(word):
+        chars = []
+        for ch in word:
+            r = rng.random()
+            if r < 0.25 and ch.lower() in CHARS_MAPPING:
+                ch = rng.choice(CHARS_MAPPING[ch.lower()])
+            elif r < 0.3:
+                ch = ch.upper()
+            chars.append(ch)
+        word = ''.join(chars)
+        r = rng.random()
+        if r < 0.15:
+            return rng.choice([' ', '.', '-', '']).join(word)
+        if r < 0.2:
+            return word[:-1]
+        if r < 0.25:
+            return word + rng.choice(['s', "'s", 'x'])
+        return word
+
+    texts = list(PARITY_CASES)
+    while len(texts) < count:
+        parts = []
+        for _ in range(rng.randint(1, 8)):
+            parts.append(disguise(rng.choice(words)) if rng.random() < 0.4 else rng.choice(NEAR_MISSES + FILLER))
+            parts.append(rng.choice(SEPARATORS))
+        if rng.random() < 0.5:
+            parts.pop()
+        texts.append(''.join(parts))
+    return texts
+
+
+def check_parity(matcher, texts):
+    """Texts on which the matcher and better_profanity.contains_profanity disagree."""
+    from better_profanity import profanity
+
+    profanity.load_censor_words()
+    mismatches = []
+    for text in texts:
+        flagged = bool(matcher.find_all(text))
+        if flagged != profanity.contains_profanity(text):
+            mismatches.append((text, flagged))
+    return mismatches
+
+
+def bench_matcher(matcher, corpus):
+    start = time.perf_counter()
+    flagged = 0
+    for doc in corpus:
+        matches = matcher.find_all(doc)
+        if matches:
+            matcher.censor(doc, matches, limit=100)
+            flagged += 1
+    return time.perf_counter() - start, flagged
+
+
+def bench_better_profanity(corpus):
+    from better_profanity import profanity
+
+    start = time.perf_counter()
+    flagged = 0
+    for doc in corpus:
+        profanity.load_censor_words()
+        if profanity.contains_profanity(doc):
+            profanity.censor(doc)[:100]
+            flagged += 1
+    return time.perf_counter() - start, flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=200, help='Documents in the synthetic corpus (default: 200)')
+    parser.add_argument('--doc-bytes', type=int, default=4096, help='Approximate size of each document (default: 4096)')
+    parser.add_argument('--profane-rate', type=float, default=0.002, help='Fraction of profane words (default: 0.002)')
+    parser.add_argument('--wordlist', default=None, help="Wordlist file (default: better_profanity's)")
+    parser.add_argument('--parity-texts', type=int, default=20000,
+                        help='Texts compared against better_profanity (default: 20000, 0 to skip)')
+    args = parser.parse_args()
+
+    wordlist = args.wordlist or default_wordlist_path()
+    with open(wordlist, 'r', encoding='utf-8') as f:
+        words = [line.strip() for line in f if line.strip()]
+
+    start = time.perf_counter()
+    matcher = ProfanityMatcher(words)
+    build = time.perf_counter() - start
+    print(f"matcher build: {build * 1000:.1f} ms ({matcher.pattern_count} patterns, {len(matcher._goto)} states)")
+
+    corpus = make_corpus(words, args.docs, args.doc_bytes, args.profane_rate)
+    total_mb = sum(len(doc) for doc in corpus) / 1e6
+
+    elapsed, flagged = bench_matcher(matcher, corpus)
+    print(f"aho-corasick:     {elapsed:8.3f} s  {total_mb / elapsed:8.2f} MB/s  {flagged} flagged")
+    try:
+        elapsed_bp, flagged_bp = bench_better_profanity(corpus)
+    except ImportError:
+        print("better_profanity: not installed, skipped")
+        return
+    print(f"better_profanity: {elapsed_bp:8.3f} s  {total_mb / elapsed_bp:8.2f} MB/s  {flagged_bp} flagged")
+    print(f"speedup: {elapsed_bp / elapsed:.1f}x")
+
+    if args.parity_texts and not args.wordlist:
+        mismatches = check_parity(matcher, make_parity_texts(words, args.parity_texts))
+        print(f"parity: {len(mismatches)} of {args.parity_texts} texts disagree with better_profanity")
+        for text, flagged in mismatches[:10]:
+            print(f"  {text!r}: matcher {'flags' if flagged else 'passes'} it, better_profanity does not")
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
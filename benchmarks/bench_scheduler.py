@@ -0,0 +1,147 @@
+"""
+Simulated benchmark: per-file latency and makespan of a mixed corpus scanned
+by one FIFO iter_scan loop (what the GUI used to do) and by the ScanScheduler
+lanes. The detector is simulated with sleeps that mimic batched image
+inference, text classification proportional to size and long video/audio
+files, so the numbers show the scheduling effect, not model speed.
+
+    python benchmarks/bench_scheduler.py --files 1000 --seed 1
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'nsfw_quarantine_app'))
+
+from scheduler import PRIORITY_INTERACTIVE, ScanScheduler, lane_of
+
+# Simulated costs in seconds
+BATCH_OVERHEAD = 0.004
+PER_IMAGE = 0.001
+TEXT_PER_MB = 0.004
+MEDIA_PER_MB = 0.004
+
+
+def make_corpus(count, rng):
+    """Mostly small images and texts, with a few huge logs and long videos/recordings."""
+    sizes = {}
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.7:
+            path, size = f"img_{i}.jpg", rng.randint(20_000, 2_000_000)
+        elif roll < 0.97:
+            path, size = f"doc_{i}.txt", rng.randint(500, 200_000)
+        elif roll < 0.985:
+            path, size = f"log_{i}.log", rng.randint(50_000_000, 500_000_000)
+        elif roll < 0.993:
+            path, size = f"clip_{i}.mp4", rng.randint(50_000_000, 300_000_000)
+        else:
+            path, size = f"talk_{i}.mp3", rng.randint(20_000_000, 100_000_000)
+        sizes[path] = size
+    return sizes
+
+
+class SimulatedDetector:
+    """Stands in for ContentDetector.iter_scan: images in batches, everything else one by one."""
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+
+    def cost(self, file_path):
+        lane = lane_of(file_path)
+        if lane == 'text':
+            return self.sizes[file_path] / 1e6 * TEXT_PER_MB
+        return self.sizes[file_path] / 1e6 * MEDIA_PER_MB
+
+    def iter_scan(self, file_paths, batch_size=16):
+        images = []
+        for file_path in file_paths:
+            if lane_of(file_path) == 'image':
+                images.append(file_path)
+                if len(images) >= batch_size:
+                    yield from self._images(images)
+                    images = []
+                continue
+            yield from self._images(images)
+            images = []
+            time.sleep(self.cost(file_path))
+            yield file_path, (False, [])
+        yield from self._images(images)
+
+    @staticmethod
+    def _images(paths):
+        if paths:
+            time.sleep(BATCH_OVERHEAD + PER_IMAGE * len(paths))
+        for file_path in paths:
+            yield file_path, (False, [])
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def report(label, latencies, makespan, interactive=None):
+    line = (f"{label:18s} makespan {makespan:7.2f} s  p50 {percentile(latencies, 50):7.2f} s  "
+            f"p99 {percentile(latencies, 99):7.2f} s")
+    if interactive is not None:
+        line += f"  interactive rescan {interactive * 1000:7.1f} ms"
+    print(line)
+
+
+def run_fifo(detector, paths, batch_size):
+    start = time.perf_counter()
+    latencies = [time.perf_counter() - start for _ in detector.iter_scan(paths, batch_size)]
+    return latencies, time.perf_counter() - start
+
+
+def run_scheduler(detector, paths, batch_size, order, rescan_path, window):
+    sched = ScanScheduler(detector, batch_size=batch_size, order=order, size_fn=detector.sizes.__getitem__,
+                          window=window)
+    try:
+        start = time.perf_counter()
+        # A generator, as the CLI passes its crawl
+        job = sched.submit(iter(paths))
+        rescan = []
+
+        def interactive():
+            time.sleep(0.5)
+            t = time.perf_counter()
+            sched.scan(rescan_path, PRIORITY_INTERACTIVE)
+            rescan.append(time.perf_counter() - t)
+
+        thread = threading.Thread(target=interactive)
+        thread.start()
+        latencies = [time.perf_counter() - start for _ in job.results()]
+        makespan = time.perf_counter() - start
+        thread.join()
+        return latencies, makespan, rescan[0]
+    finally:
+        sched.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=1000, help="Files in the simulated corpus (default: 1000)")
+    parser.add_argument('--batch-size', type=int, default=16, help='Image batch size (default: 16)')
+    parser.add_argument('--seed', type=int, default=1, help='Corpus random seed (default: 1)')
+    parser.add_argument('--window', type=int, default=1024, help='Scheduler window per job (default: 1024)')
+    args = parser.parse_args()
+
+    sizes = make_corpus(args.files, random.Random(args.seed))
+    paths = list(sizes)
+    rescan_path = 'rescan.jpg'
+    sizes[rescan_path] = 100_000
+    detector = SimulatedDetector(sizes)
+
+    report('fifo loop', *run_fifo(detector, paths, args.batch_size))
+    for order in ('fifo', 'size'):
+        report(f'scheduler ({order})', *run_scheduler(detector, paths, args.batch_size, order, rescan_path,
+                                                     args.window))
+
+
+if __name__ == '__main__':
+    main()
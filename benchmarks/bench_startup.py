@@ -0,0 +1,68 @@
+"""
+Startup-time and resident-memory benchmark for ContentDetector.
+
+Each scenario runs in a fresh interpreter so import and model-loading costs
+are measured cold (apart from the OS page cache and the model download cache):
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'nsfw_quarantine_app')
+
+SCENARIOS = {
+    'import': "import detector",
+    'construct': "import detector; d = detector.ContentDetector(quarantine_dir=QDIR)",
+    'image-only': "import detector; d = detector.ContentDetector(quarantine_dir=QDIR); d.warm_up(('image',))",
+    'text-only': "import detector; d = detector.ContentDetector(quarantine_dir=QDIR); d.warm_up(('text',))",
+    'all-models': "import detector; d = detector.ContentDetector(quarantine_dir=QDIR); d.warm_up(('image', 'text'))",
+}
+
+CHILD = """
+import json, os, resource, sys, time
+sys.path.insert(0, {app_dir!r})
+QDIR = {qdir!r}
+start = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+heavy = sorted(m for m in ('torch', 'timm', 'transformers', 'cv2', 'tkinter') if m in sys.modules)
+print(json.dumps({{'seconds': elapsed, 'maxrss_mb': rss_kb / 1024, 'heavy_modules': heavy}}))
+"""
+
+
+def run_scenario(body: str, qdir: str) -> dict:
+    code = CHILD.format(app_dir=APP_DIR, qdir=qdir, body=body)
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'child failed')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario (default: 3)')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='Scenario(s) to run (default: all)')
+    args = parser.parse_args()
+
+    qdir = tempfile.mkdtemp(prefix='bench_quarantine_')
+    print(f"{'scenario':<12} {'median s':>9} {'min s':>8} {'max RSS MB':>11}  heavy modules loaded")
+    for name in args.scenario or list(SCENARIOS):
+        try:
+            runs = [run_scenario(SCENARIOS[name], qdir) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{name:<12} failed: {e}")
+            continue
+        seconds = [r['seconds'] for r in runs]
+        rss = max(r['maxrss_mb'] for r in runs)
+        print(f"{name:<12} {statistics.median(seconds):>9.3f} {min(seconds):>8.3f} {rss:>11.1f}  {', '.join(runs[-1]['heavy_modules']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Automated parity check of the exported backends against eager PyTorch.
+
+Exports the models into a temporary directory (or uses --model-dir), runs
+backends.parity_check on synthetic inputs and exits 1 when any modality
+differs by more than --tolerance. When torch, timm, transformers or the
+backend's runtime is not installed, or the models cannot be exported (no
+network and no download cache), it prints why and exits 0 so it can run
+unconditionally in CI:
+
+    python benchmarks/check_backend_parity.py --backend onnx
+"""
+import argparse
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'nsfw_quarantine_app')
+sys.path.insert(0, APP_DIR)
+
+REQUIRED = {
+    'onnx': ('torch', 'timm', 'transformers', 'onnx', 'onnxruntime'),
+    'torchscript': ('torch', 'timm', 'transformers'),
+}
+
+
+def skip(reason: str):
+    print(f"SKIPPED: {reason}")
+    sys.exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=sorted(REQUIRED), default='onnx', help='Backend to check (default: onnx)')
+    parser.add_argument('--model-dir', default=None,
+                        help='Directory written by the export command (default: export into a temporary directory)')
+    parser.add_argument('--models', default='image,text', help='Models to check (default: image,text)')
+    parser.add_argument('--tolerance', type=float, default=1e-3,
+                        help='Largest allowed probability difference (default: 1e-3)')
+    args = parser.parse_args()
+
+    missing = [name for name in REQUIRED[args.backend] if importlib.util.find_spec(name) is None]
+    if missing:
+        skip(f"{', '.join(missing)} not installed")
+
+    from backends import export_models, parity_check
+
+    modalities = tuple(m.strip() for m in args.models.split(',') if m.strip())
+    model_dir = args.model_dir
+    tmp_dir = None
+    if model_dir is None:
+        tmp_dir = model_dir = tempfile.mkdtemp(prefix='parity_models_')
+    try:
+        if tmp_dir is not None:
+            try:
+                export_models(model_dir, args.backend, modalities)
+            except OSError as e:
+                # Model weights unavailable offline; nothing to compare
+                skip(f"could not export the models: {e}")
+        elif not os.path.isdir(model_dir):
+            skip(f"model directory {model_dir} does not exist")
+
+        diffs = parity_check(model_dir, args.backend, modalities=modalities)
+        failed = False
+        for modality, diff in diffs.items():
+            ok = diff <= args.tolerance
+            failed = failed or not ok
+            print(f"{args.backend} {modality}: max probability difference {diff:.2e} "
+                  f"({'ok' if ok else 'FAIL'}, tolerance {args.tolerance:.0e})")
+        if failed:
+            sys.exit(1)
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Load test for the moderation server (python -m nsfw_quarantine_app serve).
+Opens --concurrency keep-alive connections, sends --requests scan requests in
+total and reports latency percentiles and requests per second.
+
+    python benchmarks/load_test.py --port 8765 --image sample.jpg --concurrency 32 --requests 2000
+    python benchmarks/load_test.py --unix /tmp/moderation.sock --text "have a nice day"
+"""
+import argparse
+import asyncio
+import json
+import time
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Server closed the connection")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    body = await reader.readexactly(length)
+    return status, json.loads(body) if body else {}
+
+
+async def connect(args):
+    if args.unix:
+        return await asyncio.open_unix_connection(args.unix)
+    return await asyncio.open_connection(args.host, args.port)
+
+
+async def client(args, request, remaining, latencies, errors, flagged):
+    reader, writer = await connect(args)
+    try:
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, response = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(response.get('error', status))
+            elif response.get('flagged'):
+                flagged[0] += 1
+    finally:
+        writer.close()
+
+
+def build_request(args) -> bytes:
+    if args.image:
+        with open(args.image, 'rb') as f:
+            body = f.read()
+        content_type = 'image/' + (args.image.rsplit('.', 1)[-1].lower().replace('jpg', 'jpeg'))
+    elif args.path:
+        body = json.dumps({'path': args.path}).encode('utf-8')
+        content_type = 'application/json'
+    else:
+        body = args.text.encode('utf-8')
+        content_type = 'text/plain; charset=utf-8'
+    head = (f"POST /scan HTTP/1.1\r\nHost: moderation\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+async def run(args):
+    request = build_request(args)
+    latencies = []
+    errors = []
+    flagged = [0]
+    remaining = [args.requests]
+    start = time.perf_counter()
+    await asyncio.gather(*[client(args, request, remaining, latencies, errors, flagged)
+                           for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(latencies)} requests in {elapsed:.2f} s over {args.concurrency} connections "
+          f"({len(errors)} errors, {flagged[0]} flagged)")
+    if latencies:
+        print(f"throughput  {len(latencies) / elapsed:10.1f} req/s")
+        for label, p in (('p50', 50), ('p90', 90), ('p99', 99)):
+            print(f"latency {label} {percentile(latencies, p) * 1000:10.2f} ms")
+        print(f"latency max {max(latencies) * 1000:10.2f} ms")
+    if errors:
+        print(f"first error: {errors[0]}")
+
+    reader, writer = await connect(args)
+    writer.write(b"GET /health HTTP/1.1\r\nHost: moderation\r\nConnection: close\r\n\r\n")
+    await writer.drain()
+    _, health = await read_response(reader)
+    writer.close()
+    print(f"server: {health.get('batches')} batches, mean batch size {health.get('mean_batch_size')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1', help='Server address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Server port (default: 8765)')
+    parser.add_argument('--unix', default=None, help='Connect to this Unix socket instead of TCP')
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent connections (default: 32)')
+    parser.add_argument('--requests', type=int, default=1000, help='Total requests (default: 1000)')
+    payload = parser.add_mutually_exclusive_group()
+    payload.add_argument('--image', default=None, help='Send this image file as the request body')
+    payload.add_argument('--path', default=None, help='Ask the server to scan this path')
+    payload.add_argument('--text', default='Thanks for the quick reply, see you tomorrow.',
+                         help='Send this text (default: a short harmless sentence)')
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The app's modules import each other by bare name (as when running main.py from
+# this directory), so make them importable under `python -m nsfw_quarantine_app`.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main
+
+sys.exit(main())
@@ -2,8 +2,20 @@ import smtplib
 from email.message import EmailMessage
 import socket
 import platform
+import string
 from datetime import datetime
+from collections import namedtuple
 import os
+import queue
+import threading
+import time
+
+# SMTP server defaults; override with ALERT_SMTP_HOST / ALERT_SMTP_PORT / ALERT_SMTP_SSL
+# (e.g. a local `python -m aiosmtpd -n -l localhost:8025` with ALERT_SMTP_SSL=0)
+SMTP_HOST = 'smtp.gmail.com'
+SMTP_PORT = 465
+
+Alert = namedtuple('Alert', 'file_path reasons quarantine_path timestamp')
 
 
 def get_device_info():
@@ -15,6 +27,151 @@ def get_ip_address():
     except Exception:
         return "127.0.0.1"
 
+def smtp_settings_from_env():
+    """SMTP host, port and SSL flag from the environment, falling back to the module defaults."""
+    return {
+        'host': os.environ.get('ALERT_SMTP_HOST', SMTP_HOST),
+        'port': int(os.environ.get('ALERT_SMTP_PORT', SMTP_PORT)),
+        'use_ssl': os.environ.get('ALERT_SMTP_SSL', '1').lower() not in ('0', 'false', 'no'),
+    }
+
+
+class HostContext:
+    """
+    IP address and device string for alerts, looked up once and cached for ttl
+    seconds. get_ip_address() can block on DNS for seconds on a misconfigured
+    host, so once a value is cached, expiry triggers a background refresh and
+    callers keep getting the previous value in the meantime.
+    """
+
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+        self._value = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self):
+        """Return (ip_address, device_info)."""
+        value = self._value
+        if value is not None and time.monotonic() < self._expires:
+            return value
+        with self._lock:
+            if self._value is None:
+                self._refresh()
+            elif time.monotonic() >= self._expires and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, daemon=True).start()
+            return self._value
+
+    def _refresh(self):
+        value = (get_ip_address(), get_device_info())
+        self._value = value
+        self._expires = time.monotonic() + self.ttl
+        self._refreshing = False
+
+
+_host_context = HostContext()
+
+
+def get_host_context():
+    """The process-wide HostContext."""
+    return _host_context
+
+
+# Alert templates (str.format syntax); unknown field names fail when the module loads
+ALERT_SUBJECT = "[ALERT] Quarantined File: {filename} ({severity})"
+DIGEST_SUBJECT = "[ALERT] {count} Quarantined Files ({severity})"
+ALERT_INTRO = "A file has been quarantined by the NSFW Quarantine App.\n\n"
+DIGEST_INTRO = "{count} files have been quarantined by the NSFW Quarantine App.\n\n"
+DIGEST_SECTION = "--- {index} of {count} ---\n"
+ALERT_BODY = (
+    "File: {filename}\n"
+    "Quarantine Path: {quarantine_path}\n"
+    "Content Type: {content_type}\n"
+    "Timestamp: {timestamp}\n"
+    "Severity: {severity}\n"
+    "IP Address: {ip_address}\n"
+    "User Agent: {device_info}\n"
+    "Reasons:\n{reasons}\n"
+)
+_ALERT_FIELDS = frozenset(('filename', 'quarantine_path', 'content_type', 'timestamp',
+                           'severity', 'ip_address', 'device_info', 'reasons', 'count', 'index'))
+
+
+def _compile(template):
+    """Bind str.format of a template once, failing early on unknown fields."""
+    fields = {name for _, name, _, _ in string.Formatter().parse(template) if name}
+    unknown = fields - _ALERT_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown alert template fields: {', '.join(sorted(unknown))}")
+    return template.format
+
+
+_alert_subject = _compile(ALERT_SUBJECT)
+_digest_subject = _compile(DIGEST_SUBJECT)
+_digest_intro = _compile(DIGEST_INTRO)
+_digest_section = _compile(DIGEST_SECTION)
+_alert_body = _compile(ALERT_BODY)
+
+
+def _severity(reasons):
+    return "HIGH" if reasons and any('NSFW' in r or 'violent' in r.lower() for r in reasons) else "LOW"
+
+def _render_body(alert, severity, ip_address, device_info):
+    filename = os.path.basename(alert.file_path)
+    return _alert_body(
+        filename=filename,
+        quarantine_path=alert.quarantine_path if alert.quarantine_path else "N/A",
+        content_type=f"image/{os.path.splitext(filename)[-1].lstrip('.').lower()}",
+        timestamp=alert.timestamp,
+        severity=severity,
+        ip_address=ip_address,
+        device_info=device_info,
+        reasons='\n'.join(alert.reasons) if alert.reasons else 'No specific reason.',
+    )
+
+def render_alert(alert, host=None):
+    """Return (subject, body) of the single-file alert email."""
+    ip_address, device_info = host or _host_context.get()
+    severity = _severity(alert.reasons)
+    subject = _alert_subject(filename=os.path.basename(alert.file_path), severity=severity)
+    return subject, ALERT_INTRO + _render_body(alert, severity, ip_address, device_info)
+
+def render_digest(alerts, host=None):
+    """Return (subject, body) of one email covering several alerts."""
+    if len(alerts) == 1:
+        return render_alert(alerts[0], host)
+    ip_address, device_info = host or _host_context.get()
+    count = len(alerts)
+    parts = [_digest_intro(count=count)]
+    high = False
+    for index, alert in enumerate(alerts, 1):
+        severity = _severity(alert.reasons)
+        high = high or severity == "HIGH"
+        if index > 1:
+            parts.append('\n')
+        parts.append(_digest_section(index=index, count=count))
+        parts.append(_render_body(alert, severity, ip_address, device_info))
+    subject = _digest_subject(count=count, severity="HIGH" if high else "LOW")
+    return subject, ''.join(parts)
+
+def _message(subject, body, sender, recipient):
+    msg = EmailMessage()
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = recipient
+    msg.set_content(body)
+    return msg
+
+def build_alert_message(alert, sender, recipient):
+    """The single-file alert email."""
+    return _message(*render_alert(alert), sender, recipient)
+
+def build_digest_message(alerts, sender, recipient):
+    """One email covering several quarantined files."""
+    return _message(*render_digest(alerts), sender, recipient)
+
 def send_quarantine_alert(file_path, reasons, quarantine_path=None, sender=None, recipient=None, smtp_user=None, smtp_pass=None):
     """
     Send an email alert when a file is quarantined.
@@ -31,33 +188,187 @@ def send_quarantine_alert(file_path, reasons, quarantine_path=None, sender=None,
         print("[ALERT ERROR] Email credentials/config missing.")
         return
     filename = os.path.basename(file_path)
-    quarantine_loc = quarantine_path if quarantine_path else "N/A"
-    content_type = f"image/{os.path.splitext(filename)[-1].lstrip('.').lower()}"
-    timestamp = datetime.now().isoformat()
-    severity = "HIGH" if reasons and any('NSFW' in r or 'violent' in r.lower() for r in reasons) else "LOW"
-    ip_address = get_ip_address()
-    device_info = get_device_info()
-    reason_text = '\n'.join(reasons) if reasons else 'No specific reason.'
-
-    msg = EmailMessage()
-    msg['Subject'] = f"[ALERT] Quarantined File: {filename} ({severity})"
-    msg['From'] = sender
-    msg['To'] = recipient
-    msg.set_content(
-        f"A file has been quarantined by the NSFW Quarantine App.\n\n"
-        f"File: {filename}\n"
-        f"Quarantine Path: {quarantine_loc}\n"
-        f"Content Type: {content_type}\n"
-        f"Timestamp: {timestamp}\n"
-        f"Severity: {severity}\n"
-        f"IP Address: {ip_address}\n"
-        f"User Agent: {device_info}\n"
-        f"Reasons:\n{reason_text}\n"
-    )
+    alert = Alert(file_path, reasons, quarantine_path, datetime.now().isoformat())
+    msg = build_alert_message(alert, sender, recipient)
+    settings = smtp_settings_from_env()
+    smtp_class = smtplib.SMTP_SSL if settings['use_ssl'] else smtplib.SMTP
     try:
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
+        with smtp_class(settings['host'], settings['port']) as smtp:
             smtp.login(smtp_user, smtp_pass)
             smtp.send_message(msg)
         print(f"[ALERT] Email sent for {filename}")
     except Exception as e:
         print(f"[ALERT ERROR] Could not send alert for {filename}: {e}")
+
+
+_FLUSH = object()
+_STOP = object()
+
+
+class AlertDispatcher:
+    """
+    Deliver quarantine alerts from a background thread so scanning never waits on SMTP.
+
+    submit() only enqueues. The worker collects alerts into a digest and sends it
+    once digest_size alerts are waiting or digest_interval seconds have passed
+    since the first one, over a single SMTP connection that is kept open between
+    digests (and reopened if the server drops it). Failed sends are retried with
+    exponential backoff. Login is skipped when no credentials are given, so a
+    local debugging server can be used.
+    """
+
+    def __init__(self, sender, recipient, smtp_user=None, smtp_pass=None,
+                 host=SMTP_HOST, port=SMTP_PORT, use_ssl=True,
+                 digest_size=25, digest_interval=30.0, max_retries=3, retry_backoff=2.0,
+                 timeout=30.0, idle_timeout=60.0):
+        if not (sender and recipient):
+            raise ValueError("An alert sender and recipient are required")
+        self.sender = sender
+        self.recipient = recipient
+        self.smtp_user = smtp_user
+        self.smtp_pass = smtp_pass
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.digest_size = max(1, digest_size)
+        self.digest_interval = digest_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.sent_alerts = 0
+        self.sent_messages = 0
+        self.failed_alerts = 0
+        self._queue = queue.Queue()
+        self._smtp = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """
+        Build a dispatcher from the ALERT_MAIL_* and ALERT_SMTP_* variables,
+        or return None if the sender or recipient is missing.
+        """
+        sender = os.environ.get('ALERT_MAIL_SENDER')
+        recipient = os.environ.get('ALERT_MAIL_RECIPIENT')
+        if not (sender and recipient):
+            return None
+        settings = smtp_settings_from_env()
+        settings.update(kwargs)
+        return cls(sender, recipient, os.environ.get('ALERT_MAIL_USER'), os.environ.get('ALERT_MAIL_PASS'), **settings)
+
+    def submit(self, file_path, reasons, quarantine_path=None):
+        """Queue an alert; returns immediately."""
+        self._ensure_started()
+        self._queue.put(Alert(file_path, list(reasons or []), quarantine_path, datetime.now().isoformat()))
+
+    def flush(self):
+        """Ask the worker to send whatever is queued now instead of waiting for the digest interval."""
+        if self._thread is not None:
+            self._queue.put(_FLUSH)
+
+    def close(self, timeout=None):
+        """Send everything still queued, close the connection and stop the worker."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='alert-dispatcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            # Idle: wait for the first alert, dropping the connection if nothing comes
+            try:
+                item = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._disconnect()
+                continue
+            if item is _STOP:
+                break
+            if item is _FLUSH:
+                continue
+            batch = [item]
+            deadline = time.monotonic() + self.digest_interval
+            stop = False
+            while len(batch) < self.digest_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=max(0.0, remaining)) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                if item is _FLUSH:
+                    break
+                batch.append(item)
+            self._deliver(batch)
+            if stop:
+                break
+        # Drain anything submitted before close()
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, Alert):
+                leftover.append(item)
+        for start in range(0, len(leftover), self.digest_size):
+            self._deliver(leftover[start:start + self.digest_size])
+        self._disconnect()
+
+    def _deliver(self, batch):
+        try:
+            msg = build_digest_message(batch, self.sender, self.recipient)
+        except Exception as e:
+            # A malformed alert must not take the worker thread (and every later alert) down with it
+            self.failed_alerts += len(batch)
+            print(f"[ALERT ERROR] Could not build alert for {len(batch)} file{'s' if len(batch) != 1 else ''}: {e}")
+            return
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._connection().send_message(msg)
+                self.sent_alerts += len(batch)
+                self.sent_messages += 1
+                print(f"[ALERT] Email sent for {len(batch)} quarantined file{'s' if len(batch) != 1 else ''}")
+                return
+            except Exception as e:
+                # The connection may be stale or broken; start over with a fresh one
+                self._disconnect()
+                if attempt == self.max_retries:
+                    self.failed_alerts += len(batch)
+                    print(f"[ALERT ERROR] Could not send alert for {len(batch)} file{'s' if len(batch) != 1 else ''}: {e}")
+                    return
+                time.sleep(self.retry_backoff * (2 ** attempt))
+
+    def _connection(self):
+        if self._smtp is None:
+            smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+            smtp = smtp_class(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.smtp_user and self.smtp_pass:
+                    smtp.login(self.smtp_user, self.smtp_pass)
+            except Exception:
+                smtp.close()
+                raise
+            self._smtp = smtp
+        return self._smtp
+
+    def _disconnect(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            self._smtp.close()
+        self._smtp = None
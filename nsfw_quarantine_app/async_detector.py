@@ -0,0 +1,190 @@
+"""
+asyncio front end for ContentDetector, for embedding in async services.
+
+    detector = AsyncContentDetector(ContentDetector())
+    is_flagged, reasons = await detector.scan('upload.jpg')   # or raw bytes
+    async for source, (is_flagged, reasons) in detector.scan_many(paths):
+        ...
+
+Requests are queued and coalesced: the first request of a batch waits up to
+batch_window_ms for others to arrive, then the whole group is scanned with one
+call on an executor thread, so the event loop never blocks on disk I/O, image
+decoding or the models, and concurrent requests share model forward passes.
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterable, List, Tuple, Union
+
+# A file path, or the content itself
+Payload = Union[str, os.PathLike, bytes, bytearray, memoryview]
+
+
+class AsyncContentDetector:
+    """
+    Awaitable scans on top of a ContentDetector.
+
+    max_batch: most requests scanned together
+    batch_window_ms: how long the first request of a batch waits for others
+    max_inflight: requests accepted at once; further scan() calls wait for a slot
+    batch_workers: executor threads, i.e. batches running at the same time
+    """
+
+    def __init__(self, detector, max_batch: int = 16, batch_window_ms: float = 5.0, max_inflight: int = 64,
+                 batch_workers: int = 1):
+        self.detector = detector
+        self.max_batch = max(1, max_batch)
+        self.batch_window = max(0.0, batch_window_ms) / 1000
+        self.max_inflight = max(1, max_inflight)
+        self.batch_workers = max(1, batch_workers)
+        # Batches run and requests scanned, for the average batch size
+        self.batches = 0
+        self.batched_requests = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.batch_workers, thread_name_prefix='async-scan')
+        # Created in the event loop on first use
+        self._queue = None
+        self._inflight = None
+        self._slots = None
+        self._dispatcher = None
+        self._running = set()
+        self._closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def scan(self, item: Payload, mime: str = None) -> Tuple[bool, List[str]]:
+        """
+        Scan a file path or in-memory content and return (is_flagged, reasons).
+        The type of content is sniffed from its magic bytes (mime is a fallback, see
+        ContentDetector.scan_bytes). Cancelling the call drops the request if its
+        batch has not started yet.
+        """
+        if self._closed:
+            raise RuntimeError("AsyncContentDetector is closed")
+        if isinstance(item, os.PathLike):
+            item = os.fspath(item)
+        elif not isinstance(item, str):
+            item = (item, mime)
+        self._start()
+        async with self._inflight:
+            future = asyncio.get_running_loop().create_future()
+            self._queue.put_nowait((item, future))
+            return await future
+
+    async def scan_many(self, items: Iterable[Payload]) -> AsyncIterator[Tuple[object, Tuple[bool, List[str]]]]:
+        """
+        Yield (path, result) for paths and (position in items, result) for in-memory
+        content, as scans complete. At most max_inflight scans are pending at a time;
+        leaving the loop early cancels the rest.
+        """
+        async def one(index, item):
+            return (item if isinstance(item, (str, os.PathLike)) else index), await self.scan(item)
+
+        pending = set()
+        try:
+            for index, item in enumerate(items):
+                pending.add(asyncio.ensure_future(one(index, item)))
+                if len(pending) >= self.max_inflight:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def aclose(self):
+        """Stop accepting requests, cancel queued ones and release the executor."""
+        self._closed = True
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            for task in list(self._running):
+                task.cancel()
+            await asyncio.gather(self._dispatcher, *self._running, return_exceptions=True)
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                future.cancel()
+        self._executor.shutdown(wait=False)
+
+    def _start(self):
+        if self._dispatcher is None:
+            self._queue = asyncio.Queue()
+            self._inflight = asyncio.Semaphore(self.max_inflight)
+            self._slots = asyncio.Semaphore(self.batch_workers)
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def _dispatch(self):
+        """Collect queued requests into batches and hand each batch to the executor."""
+        loop = asyncio.get_running_loop()
+        while True:
+            # Collecting only starts once an executor thread is free, so requests that
+            # arrive while the models are busy join the next batch instead of waiting alone
+            await self._slots.acquire()
+            batch = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.batch_window
+                while len(batch) < self.max_batch:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except BaseException:
+                for _, future in batch:
+                    future.cancel()
+                self._slots.release()
+                raise
+            # Requests cancelled while queued are dropped
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                self._slots.release()
+                continue
+            task = loop.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch):
+        try:
+            items = [item for item, _ in batch]
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(self._executor, self._scan_batch, items)
+            except Exception as e:
+                logging.error(f"Error scanning a batch of {len(items)} requests: {e}")
+                results = [(False, [f"Error scanning: {e}"])] * len(items)
+            self.batches += 1
+            self.batched_requests += len(items)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            for _, future in batch:
+                future.cancel()
+            self._slots.release()
+
+    def _scan_batch(self, items: List) -> List[Tuple[bool, List[str]]]:
+        """Scan one batch on an executor thread: paths through iter_scan, content in memory."""
+        results = [None] * len(items)
+        paths = [i for i, item in enumerate(items) if isinstance(item, str)]
+        if paths:
+            scanned = self.detector.iter_scan([items[i] for i in paths], batch_size=len(paths))
+            for i, (_, result) in zip(paths, scanned):
+                results[i] = result
+        payloads = [i for i, item in enumerate(items) if not isinstance(item, str)]
+        if payloads:
+            scanned = self.detector.scan_bytes_batch([items[i] for i in payloads], batch_size=len(payloads))
+            for i, result in zip(payloads, scanned):
+                results[i] = result
+        return results
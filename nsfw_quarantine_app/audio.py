@@ -0,0 +1,131 @@
+"""
+Audio decoding and speech recognition for audio moderation.
+
+ffmpeg decodes any supported file to 16 kHz mono 16-bit PCM on a pipe, which is
+read in fixed-size, slightly overlapping windows, so memory is bounded by one
+window however long the recording is. Each window is transcribed by a
+pluggable ASR backend:
+
+    whisper  local Whisper model (faster-whisper if installed, else openai-whisper)
+    stub     returns given transcripts, for tests and dry runs
+"""
+import logging
+import subprocess
+import threading
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+SAMPLE_RATE = 16000
+# Bytes per sample of s16le PCM
+SAMPLE_WIDTH = 2
+
+
+def iter_pcm_windows(audio_path: str, window_seconds: float = 30.0, overlap_seconds: float = 1.0,
+                     sample_rate: int = SAMPLE_RATE, ffmpeg: str = 'ffmpeg') -> Iterator[Tuple[float, float, bytes]]:
+    """
+    Yield (start_seconds, end_seconds, pcm) windows of mono s16le audio. Consecutive
+    windows share overlap_seconds so a word cut at a boundary is heard whole once.
+    Closing the generator stops ffmpeg.
+    """
+    bytes_per_second = sample_rate * SAMPLE_WIDTH
+    window_bytes = int(window_seconds * sample_rate) * SAMPLE_WIDTH
+    overlap_bytes = min(int(overlap_seconds * sample_rate) * SAMPLE_WIDTH, window_bytes // 2)
+    command = [ffmpeg, '-nostdin', '-hide_banner', '-loglevel', 'error', '-i', audio_path,
+               '-vn', '-sn', '-dn', '-ac', '1', '-ar', str(sample_rate), '-f', 's16le', '-']
+    proc = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Drain stderr on the side so a chatty decoder can never block on a full pipe
+    errors = []
+    reader = threading.Thread(target=_collect_errors, args=(proc.stderr, errors), daemon=True)
+    reader.start()
+    try:
+        carry = b''
+        position = 0  # byte offset of the start of carry
+        while True:
+            data = carry + proc.stdout.read(window_bytes - len(carry))
+            if len(data) <= len(carry):
+                break
+            yield position / bytes_per_second, (position + len(data)) / bytes_per_second, data
+            if len(data) < window_bytes:
+                break
+            carry = data[-overlap_bytes:] if overlap_bytes else b''
+            position += len(data) - len(carry)
+        if proc.wait() != 0:
+            reader.join(timeout=1)
+            raise RuntimeError(f"ffmpeg failed: {errors[-1] if errors else f'exit code {proc.returncode}'}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        reader.join(timeout=1)
+
+
+def _collect_errors(stream, errors: list):
+    for raw in stream:
+        line = raw.decode('utf-8', errors='replace').strip()
+        if line:
+            errors.append(line)
+            del errors[:-20]
+    stream.close()
+
+
+def pcm_to_float32(pcm: bytes):
+    """s16le bytes to a float32 numpy array in [-1, 1], the input Whisper expects."""
+    import numpy as np
+
+    return np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768.0
+
+
+class StubTranscriber:
+    """Returns the given transcripts one window at a time (then empty strings), or calls fn(pcm, sample_rate)."""
+    name = 'stub'
+
+    def __init__(self, transcripts: Iterable[str] = (), fn: Optional[Callable[[bytes, int], str]] = None):
+        self._transcripts = iter(transcripts)
+        self._fn = fn
+
+    def transcribe(self, pcm: bytes, sample_rate: int = SAMPLE_RATE) -> str:
+        if self._fn is not None:
+            return self._fn(pcm, sample_rate)
+        return next(self._transcripts, '')
+
+
+class WhisperTranscriber:
+    """Local Whisper speech recognition; prefers faster-whisper (int8 on CPU) over openai-whisper."""
+    name = 'whisper'
+
+    def __init__(self, model_size: str = 'base', language: Optional[str] = 'en'):
+        self.model_size = model_size
+        self.language = language
+        try:
+            from faster_whisper import WhisperModel
+            self._model = WhisperModel(model_size, device='cpu', compute_type='int8')
+            self._faster = True
+        except ImportError:
+            try:
+                import whisper
+            except ImportError:
+                raise ImportError("The whisper ASR backend needs faster-whisper or openai-whisper installed")
+            self._model = whisper.load_model(model_size, device='cpu')
+            self._faster = False
+        logging.info(f"Loaded Whisper '{model_size}' ({'faster-whisper' if self._faster else 'openai-whisper'})")
+
+    def transcribe(self, pcm: bytes, sample_rate: int = SAMPLE_RATE) -> str:
+        audio = pcm_to_float32(pcm)
+        if self._faster:
+            segments, _ = self._model.transcribe(audio, language=self.language, vad_filter=True)
+            return ' '.join(segment.text.strip() for segment in segments)
+        return self._model.transcribe(audio, language=self.language, fp16=False)['text'].strip()
+
+
+ASR_BACKENDS = {
+    'whisper': WhisperTranscriber,
+    'stub': StubTranscriber,
+}
+
+
+def create_transcriber(backend: str = 'whisper', model_size: str = 'base'):
+    if backend not in ASR_BACKENDS:
+        raise ValueError(f"Unknown ASR backend '{backend}'. Choose from: {', '.join(ASR_BACKENDS)}")
+    if backend == 'whisper':
+        return WhisperTranscriber(model_size)
+    return ASR_BACKENDS[backend]()
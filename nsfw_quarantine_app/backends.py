@@ -0,0 +1,316 @@
+"""
+Inference backends for the NSFW and hate speech models.
+
+'torch' runs the eager timm / transformers models. 'onnx' and 'torchscript'
+run artifacts written by export_models(), so neither the timm model graph
+nor the transformers model class is built at load time. Every backend is a
+callable returning a torch tensor of logits, so callers do not care which
+one they hold:
+
+    image backend: backend(pixel_batch) -> logits (N, classes)
+    text backend:  backend(inputs) -> logits (N, 2), inputs being tokenizer.pad() output
+"""
+import json
+import logging
+import os
+import tempfile
+from typing import Callable, Dict, Iterable, Tuple
+
+BACKENDS = ('torch', 'onnx', 'torchscript')
+EXPORT_FORMATS = ('onnx', 'torchscript')
+_SUFFIXES = {'onnx': '.onnx', 'torchscript': '.pt'}
+
+NSFW_ARTIFACT = 'nsfw'
+HATE_SPEECH_ARTIFACT = 'hate_speech'
+TOKENIZER_DIR = 'hate_speech_tokenizer'
+# Input names of the exported text model, in the positional order TorchScript expects
+TEXT_INPUTS = ('input_ids', 'attention_mask', 'token_type_ids')
+ONNX_OPSET = 17
+
+
+def check_backend(backend: str, model_dir: str = None):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+    if backend != 'torch' and not model_dir:
+        raise ValueError(f"The {backend} backend needs the directory written by the export command")
+
+
+def artifact_path(model_dir: str, name: str, backend: str, quantized: bool = False) -> str:
+    return os.path.join(model_dir, name + ('.int8' if quantized else '') + _SUFFIXES[backend])
+
+
+def quantize_dynamic_int8(model):
+    """Dynamic int8 quantization of every nn.Linear (weights int8, activations quantized per batch)."""
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _export_onnx(export: Callable[[str], None], path: str, quantize: bool = False):
+    """
+    Write an ONNX artifact with export(onnx_path). With quantize the fp32 graph only
+    feeds int8 quantization, so it goes to a temporary file next to path; an fp32
+    artifact already exported there is left alone.
+    """
+    if not quantize:
+        export(path)
+        return
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    fd, fp32_path = tempfile.mkstemp(prefix='.fp32-', suffix='.onnx', dir=os.path.dirname(path) or '.')
+    os.close(fd)
+    try:
+        export(fp32_path)
+        quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+    finally:
+        os.remove(fp32_path)
+
+
+def _metadata_path(model_dir: str, name: str) -> str:
+    return os.path.join(model_dir, name + '.json')
+
+
+def read_metadata(model_dir: str, name: str) -> Dict:
+    with open(_metadata_path(model_dir, name), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_metadata(model_dir: str, name: str, metadata: Dict):
+    with open(_metadata_path(model_dir, name), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+
+
+class OnnxBackend:
+    """onnxruntime session; feeds only the inputs the graph declares and returns the first output."""
+
+    def __init__(self, path: str, threads: int = 0):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def __call__(self, inputs):
+        import torch
+
+        if isinstance(inputs, dict):
+            inputs = dict(zip(TEXT_INPUTS, _text_tensors(inputs)))
+        else:
+            inputs = {self.input_names[0]: inputs}
+        feed = {name: inputs[name].cpu().numpy() for name in self.input_names}
+        return torch.from_numpy(self.session.run(None, feed)[0])
+
+
+class TorchScriptBackend:
+    """A torch.jit module; text inputs are passed positionally in TEXT_INPUTS order."""
+
+    def __init__(self, path: str):
+        import torch
+
+        self.module = torch.jit.load(path, map_location='cpu')
+        self.module.eval()
+
+    def __call__(self, inputs):
+        if isinstance(inputs, dict):
+            return self.module(*_text_tensors(inputs))
+        return self.module(inputs)
+
+
+class TorchTextBackend:
+    """Eager transformers sequence classifier."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, inputs):
+        return self.model(**inputs).logits
+
+
+def _text_tensors(inputs) -> Tuple:
+    import torch
+
+    input_ids = inputs['input_ids']
+    token_type_ids = inputs.get('token_type_ids')
+    if token_type_ids is None:
+        token_type_ids = torch.zeros_like(input_ids)
+    return input_ids, inputs['attention_mask'], token_type_ids
+
+
+def _load_artifact(backend: str, path: str, threads: int = 0):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No exported model at {path}; run the export command first")
+    if backend == 'onnx':
+        return OnnxBackend(path, threads)
+    return TorchScriptBackend(path)
+
+
+def load_image_backend(backend: str, model_dir: str, threads: int = 0, quantized: bool = False):
+    """
+    Return (backend, metadata) for an exported NSFW model; metadata has class_names and data_config.
+    quantized loads the int8 artifact written by export with quantize=True.
+    """
+    check_backend(backend, model_dir)
+    metadata = read_metadata(model_dir, NSFW_ARTIFACT)
+    metadata['data_config'] = {k: tuple(v) if isinstance(v, list) else v for k, v in metadata['data_config'].items()}
+    path = artifact_path(model_dir, NSFW_ARTIFACT, backend, quantized)
+    return _load_artifact(backend, path, threads), metadata
+
+
+def load_text_backend(backend: str, model_dir: str, threads: int = 0, quantized: bool = False):
+    """Return (backend, tokenizer) for an exported hate speech model."""
+    from transformers import AutoTokenizer
+
+    check_backend(backend, model_dir)
+    tokenizer = AutoTokenizer.from_pretrained(os.path.join(model_dir, TOKENIZER_DIR))
+    path = artifact_path(model_dir, HATE_SPEECH_ARTIFACT, backend, quantized)
+    return _load_artifact(backend, path, threads), tokenizer
+
+
+def export_nsfw_model(model_name: str, model_dir: str, fmt: str, quantize: bool = False) -> str:
+    """
+    Export the timm NSFW model with a dynamic batch axis; returns the artifact path.
+    quantize writes an int8 artifact instead (dynamic quantization of the linear layers).
+    """
+    import timm
+    import torch
+
+    model = timm.create_model(model_name, pretrained=True)
+    model.eval()
+    data_config = timm.data.resolve_model_data_config(model)
+    class_names = model.pretrained_cfg.get('label_names', [])
+    example = torch.randn(2, *data_config['input_size'])
+    path = artifact_path(model_dir, NSFW_ARTIFACT, fmt, quantize)
+    with torch.no_grad():
+        if fmt == 'onnx':
+            _export_onnx(lambda onnx_path: torch.onnx.export(
+                model, example, onnx_path, input_names=['pixel_values'], output_names=['logits'],
+                dynamic_axes={'pixel_values': {0: 'batch'}, 'logits': {0: 'batch'}}, opset_version=ONNX_OPSET),
+                path, quantize)
+        else:
+            if quantize:
+                model = quantize_dynamic_int8(model)
+            torch.jit.save(torch.jit.trace(model, example), path)
+    _write_metadata(model_dir, NSFW_ARTIFACT, {
+        'model_name': model_name,
+        'format': fmt,
+        'class_names': list(class_names),
+        'data_config': {k: list(v) if isinstance(v, tuple) else v for k, v in data_config.items()},
+    })
+    return path
+
+
+def export_hate_speech_model(model_name: str, model_dir: str, fmt: str, quantize: bool = False) -> str:
+    """Export the BERT classifier with dynamic batch and sequence axes, plus its tokenizer."""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name, torchscript=True)
+    model.eval()
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.inner(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids)[0]
+
+    wrapper = LogitsOnly(model)
+    example = tokenizer(["an example sentence for tracing", "another one"], padding=True, return_tensors='pt')
+    example_inputs = _text_tensors(example)
+    path = artifact_path(model_dir, HATE_SPEECH_ARTIFACT, fmt, quantize)
+    with torch.no_grad():
+        if fmt == 'onnx':
+            axes = {name: {0: 'batch', 1: 'sequence'} for name in TEXT_INPUTS}
+            axes['logits'] = {0: 'batch'}
+            _export_onnx(lambda onnx_path: torch.onnx.export(
+                wrapper, example_inputs, onnx_path, input_names=list(TEXT_INPUTS),
+                output_names=['logits'], dynamic_axes=axes, opset_version=ONNX_OPSET),
+                path, quantize)
+        else:
+            if quantize:
+                wrapper = quantize_dynamic_int8(wrapper)
+            torch.jit.save(torch.jit.trace(wrapper, example_inputs), path)
+    tokenizer.save_pretrained(os.path.join(model_dir, TOKENIZER_DIR))
+    _write_metadata(model_dir, HATE_SPEECH_ARTIFACT, {'model_name': model_name, 'format': fmt})
+    return path
+
+
+def export_models(model_dir: str, fmt: str, modalities: Iterable[str] = ('image', 'text'),
+                  nsfw_model_name: str = None, hate_speech_model_name: str = None, quantize: bool = False):
+    """Export the models for the given modalities into model_dir; returns the artifact paths."""
+    from detector import NSFW_MODEL_NAME, HATE_SPEECH_MODEL_NAME
+
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Choose from: {', '.join(EXPORT_FORMATS)}")
+    os.makedirs(model_dir, exist_ok=True)
+    paths = []
+    for modality in modalities:
+        if modality == 'image':
+            logging.info(f"Exporting NSFW model to {fmt}{' (int8)' if quantize else ''}...")
+            paths.append(export_nsfw_model(nsfw_model_name or NSFW_MODEL_NAME, model_dir, fmt, quantize))
+        elif modality == 'text':
+            logging.info(f"Exporting hate speech model to {fmt}{' (int8)' if quantize else ''}...")
+            paths.append(export_hate_speech_model(hate_speech_model_name or HATE_SPEECH_MODEL_NAME, model_dir, fmt,
+                                                  quantize))
+        else:
+            raise ValueError(f"Unknown modality: {modality}")
+        logging.info(f"Wrote {paths[-1]}")
+    return paths
+
+
+# Used by the parity check when no sample directory is given
+PARITY_TEXTS = (
+    "Thanks for the quick reply, see you at the meeting tomorrow.",
+    "I can't stand people like you, get out of this country.",
+    "The quarterly report is attached; numbers are up across all regions.",
+    "word " * 600,
+)
+
+
+def parity_check(model_dir: str, backend: str, samples=(), modalities: Iterable[str] = ('image', 'text'),
+                 batch_size: int = 8) -> Dict[str, float]:
+    """
+    Score the same inputs with the eager models and the exported backend and
+    return the largest absolute difference in class probabilities per modality.
+    samples are image and text paths; random images and built-in sentences
+    are used when there are none of a kind.
+    """
+    import torch
+    from PIL import Image
+
+    from detector import ContentDetector, IMAGE_EXTENSIONS, TEXT_EXTENSIONS
+
+    samples = list(samples)
+    eager = ContentDetector(quarantine_dir=os.path.join(model_dir, 'parity_quarantine'))
+    exported = ContentDetector(quarantine_dir=eager.quarantine_dir, backend=backend, model_dir=model_dir)
+    diffs = {}
+    if 'image' in modalities:
+        paths = [p for p in samples if p.lower().endswith(IMAGE_EXTENSIONS)][:batch_size]
+        if paths:
+            pixels = torch.stack([eager.nsfw_transforms(Image.open(p).convert('RGB')) for p in paths])
+        else:
+            pixels = torch.rand(batch_size, *eager.nsfw_data_config['input_size'])
+        with torch.no_grad():
+            expected = eager.nsfw_model(pixels).softmax(dim=-1)
+            actual = exported.nsfw_model(pixels).softmax(dim=-1)
+        diffs['image'] = float((expected - actual).abs().max())
+    if 'text' in modalities:
+        texts = []
+        for path in (p for p in samples if p.lower().endswith(TEXT_EXTENSIONS)):
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                texts.append(f.read(4096))
+        texts = texts[:batch_size] or list(PARITY_TEXTS)
+        tokenizer = eager.hate_speech_detector.tokenizer
+        inputs = tokenizer(texts, padding=True, truncation=True, max_length=512, return_tensors='pt')
+        with torch.no_grad():
+            expected = eager.hate_speech_detector.forward(inputs).softmax(dim=-1)
+            actual = exported.hate_speech_detector.forward(inputs).softmax(dim=-1)
+        diffs['text'] = float((expected - actual).abs().max())
+    eager.close()
+    exported.close()
+    return diffs
@@ -0,0 +1,214 @@
+import heapq
+import logging
+import mmap
+import os
+import struct
+import threading
+from typing import Iterable, Iterator
+
+MAGIC = b'NSFWBL1\0'
+DIGEST_SIZE = 32
+PREFIX_BITS = 16
+BUCKETS = 1 << PREFIX_BITS
+_HEADER = struct.Struct('<8sQ')
+_TABLE = struct.Struct(f'<{BUCKETS + 1}Q')
+
+
+class HashBlocklist:
+    """
+    Persistent set of SHA-256 digests of known-bad content.
+
+    The main file holds the digests sorted and packed (32 bytes each) followed
+    by a table of where each 16-bit prefix starts, and is memory-mapped, so
+    opening it costs nothing and a lookup is one table read plus a binary
+    search over ~n/65536 entries. New digests go to an in-memory set and an
+    append-only .pending journal, and are merged into the sorted file by
+    compact() (automatically once `compact_every` are pending).
+    """
+
+    def __init__(self, path: str, compact_every: int = 100000):
+        self.path = path
+        self.pending_path = path + '.pending'
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._journal = None
+        self._mmap = None
+        self._count = 0
+        self._table = None
+        dir_name = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(dir_name):
+            os.makedirs(dir_name)
+        self._open_sorted()
+        self._load_pending()
+
+    def __len__(self) -> int:
+        return self._count + len(self._pending)
+
+    def __contains__(self, digest) -> bool:
+        digest = _as_digest(digest)
+        if digest in self._pending:
+            return True
+        with self._lock:
+            return self._contains_sorted(digest)
+
+    def add(self, digest):
+        """Add one digest (raw bytes or hex); it is journaled immediately."""
+        self.add_many([digest])
+
+    def add_many(self, digests: Iterable):
+        new = []
+        with self._lock:
+            for digest in digests:
+                digest = _as_digest(digest)
+                if digest in self._pending or self._contains_sorted(digest):
+                    continue
+                self._pending.add(digest)
+                new.append(digest)
+            if new:
+                if self._journal is None:
+                    self._journal = open(self.pending_path, 'ab')
+                self._journal.write(b''.join(new))
+                self._journal.flush()
+            if len(self._pending) >= self.compact_every:
+                self._compact()
+
+    def import_hex(self, hex_path: str, chunk: int = 1000000) -> int:
+        """Bulk-import a text file with one hex digest per line. Returns the number read."""
+        count = 0
+        batch = []
+        with open(hex_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                batch.append(line)
+                count += 1
+                if len(batch) >= chunk:
+                    self.add_many(batch)
+                    batch = []
+        if batch:
+            self.add_many(batch)
+        self.compact()
+        return count
+
+    def export_hex(self, hex_path: str) -> int:
+        """Write every digest, sorted, as one hex line each. Returns the number written."""
+        count = 0
+        with self._lock, open(hex_path, 'w', encoding='utf-8') as f:
+            for digest in self._iter_sorted():
+                f.write(digest.hex() + '\n')
+                count += 1
+        return count
+
+    def compact(self):
+        """Merge pending digests into the sorted, memory-mapped file."""
+        with self._lock:
+            self._compact()
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+
+    def _contains_sorted(self, digest: bytes) -> bool:
+        if not self._count:
+            return False
+        prefix = int.from_bytes(digest[:2], 'big')
+        lo, hi = self._table[prefix], self._table[prefix + 1]
+        data = self._mmap
+        base = _HEADER.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = base + mid * DIGEST_SIZE
+            current = data[offset:offset + DIGEST_SIZE]
+            if current == digest:
+                return True
+            if current < digest:
+                lo = mid + 1
+            else:
+                hi = mid
+        return False
+
+    def _iter_sorted(self) -> Iterator[bytes]:
+        """All digests in order, streamed from the map and merged with pending ones (hold the lock)."""
+        existing = (self._mmap[o:o + DIGEST_SIZE] for o in self._offsets()) if self._mmap else iter(())
+        previous = None
+        for digest in heapq.merge(existing, sorted(self._pending)):
+            if digest != previous:
+                yield digest
+            previous = digest
+
+    def _offsets(self) -> Iterator[int]:
+        return range(_HEADER.size, _HEADER.size + self._count * DIGEST_SIZE, DIGEST_SIZE)
+
+    def _open_sorted(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._count = 0
+        self._table = None
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a hash blocklist")
+        self._count = count
+        self._table = _TABLE.unpack_from(self._mmap, _HEADER.size + count * DIGEST_SIZE)
+
+    def _load_pending(self):
+        if not os.path.exists(self.pending_path):
+            return
+        with open(self.pending_path, 'rb') as f:
+            data = f.read()
+        # A torn trailing record from a crash is ignored
+        usable = len(data) - len(data) % DIGEST_SIZE
+        for offset in range(0, usable, DIGEST_SIZE):
+            self._pending.add(data[offset:offset + DIGEST_SIZE])
+
+    def _compact(self):
+        if not self._pending:
+            return
+        tmp_path = self.path + '.tmp'
+        counts = [0] * BUCKETS
+        count = 0
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, 0))
+            for digest in self._iter_sorted():
+                f.write(digest)
+                counts[int.from_bytes(digest[:2], 'big')] += 1
+                count += 1
+            table = [0] * (BUCKETS + 1)
+            for i in range(BUCKETS):
+                table[i + 1] = table[i] + counts[i]
+            f.write(_TABLE.pack(*table))
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, count))
+            f.flush()
+            os.fsync(f.fileno())
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        os.replace(tmp_path, self.path)
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if os.path.exists(self.pending_path):
+            os.remove(self.pending_path)
+        self._pending = set()
+        self._open_sorted()
+        logging.info(f"Compacted hash blocklist {self.path}: {count} digests")
+
+
+def _as_digest(digest) -> bytes:
+    if isinstance(digest, str):
+        digest = bytes.fromhex(digest.strip())
+    if len(digest) != DIGEST_SIZE:
+        raise ValueError(f"Expected a {DIGEST_SIZE}-byte SHA-256 digest, got {len(digest)} bytes")
+    return bytes(digest)
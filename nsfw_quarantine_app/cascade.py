@@ -0,0 +1,211 @@
+"""
+Cheap pre-filter stages that run before the NSFW and hate speech models.
+
+Each stage looks at one file and either decides it, returning
+(is_flagged, reasons), or returns None to pass the file on to the next
+stage and finally to the models. The cascade counts which stage decided
+each file so the model compute it saves can be measured.
+"""
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+from PIL import Image
+
+from detector import IMAGE_EXTENSIONS, TEXT_EXTENSIONS
+from profanity_matcher import get_default_matcher
+from result_cache import file_sha256
+
+Verdict = Tuple[bool, List[str]]
+
+
+def _ext(file_path: str) -> str:
+    return os.path.splitext(file_path)[1].lower()
+
+
+class SizeGate:
+    """Files of at most min_bytes (empty or truncated files) cannot hold content worth a model pass."""
+    name = 'size'
+
+    def __init__(self, min_bytes: int = 0):
+        self.min_bytes = min_bytes
+
+    def __call__(self, file_path: str) -> Optional[Verdict]:
+        size = os.path.getsize(file_path)
+        if size <= self.min_bytes:
+            return False, [f"Prefilter ({self.name}): file is {size} bytes"]
+        return None
+
+
+class DimensionGate:
+    """Images smaller than min_side pixels on both sides (icons, spacers) are passed as safe."""
+    name = 'dimensions'
+
+    def __init__(self, min_side: int = 32):
+        self.min_side = min_side
+
+    def __call__(self, file_path: str) -> Optional[Verdict]:
+        if _ext(file_path) not in IMAGE_EXTENSIONS:
+            return None
+        # Image.open only parses the header; pixels are not decoded
+        with Image.open(file_path) as img:
+            width, height = img.size
+        if width < self.min_side and height < self.min_side:
+            return False, [f"Prefilter ({self.name}): image is {width}x{height}, below {self.min_side}px"]
+        return None
+
+
+class HashAllowlist:
+    """Files whose sha256 is in a known-safe list (one hex digest per line) are passed as safe."""
+    name = 'allowlist'
+
+    def __init__(self, allowlist_path: str, hash_fn=file_sha256):
+        self.hash_fn = hash_fn
+        with open(allowlist_path, 'r', encoding='utf-8') as f:
+            self.hashes = {line.strip().lower() for line in f if line.strip() and not line.startswith('#')}
+        logging.info(f"Loaded {len(self.hashes)} allowlisted hashes from {allowlist_path}")
+
+    def __call__(self, file_path: str) -> Optional[Verdict]:
+        if self.hash_fn(file_path) in self.hashes:
+            return False, [f"Prefilter ({self.name}): content hash is allowlisted"]
+        return None
+
+
+class TextProfanityPass:
+    """Text files with profanity are flagged by the automaton alone, without a BERT pass."""
+    name = 'profanity'
+
+    def __init__(self, max_bytes: int = 64 * 1024):
+        self.max_bytes = max_bytes
+
+    def __call__(self, file_path: str) -> Optional[Verdict]:
+        if _ext(file_path) not in TEXT_EXTENSIONS:
+            return None
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            content = f.read(self.max_bytes)
+        matcher = get_default_matcher()
+        matches = matcher.find_all(content)
+        if matches:
+            return True, [
+                "Profanity detected in text file.",
+                f"Censored preview: {matcher.censor(content, matches, limit=100)}...",
+                f"Prefilter ({self.name}): hate speech model skipped",
+            ]
+        return None
+
+
+class LowResProbe:
+    """
+    Decode a small thumbnail (JPEG DCT scaling via Image.draft makes this cheap)
+    and pass images with almost no skin-tone pixels as safe. Images with more
+    skin than max_skin_ratio go on to the full model.
+
+    Skin is detected by colour, so it is invisible in grayscale and washed-out
+    pixels (Cb and Cr near 128). Grayscale images, and images where more than
+    max_gray_ratio of the thumbnail has chroma below min_chroma, always go on
+    to the full model.
+    """
+    name = 'lowres'
+    # Modes without colour channels
+    GRAY_MODES = ('1', 'L', 'LA', 'I', 'I;16', 'F')
+
+    def __init__(self, size: int = 64, max_skin_ratio: float = 0.02, min_chroma: int = 10,
+                 max_gray_ratio: float = 0.25):
+        self.size = size
+        self.max_skin_ratio = max_skin_ratio
+        self.min_chroma = min_chroma
+        self.max_gray_ratio = max_gray_ratio
+
+    def __call__(self, file_path: str) -> Optional[Verdict]:
+        if _ext(file_path) not in IMAGE_EXTENSIONS:
+            return None
+        import numpy as np
+
+        with Image.open(file_path) as img:
+            if img.mode in self.GRAY_MODES:
+                return None
+            img.draft('YCbCr', (self.size, self.size))
+            img = img.convert('YCbCr')
+            img.thumbnail((self.size, self.size))
+            pixels = np.asarray(img)
+        if not pixels.size:
+            return None
+        cb = pixels[..., 1].astype(np.int16)
+        cr = pixels[..., 2].astype(np.int16)
+        chroma = np.maximum(np.abs(cb - 128), np.abs(cr - 128))
+        gray = float((chroma < self.min_chroma).mean())
+        if gray > self.max_gray_ratio:
+            return None
+        # Classic YCbCr skin range (Chai & Ngan)
+        skin = (cb >= 77) & (cb <= 127) & (cr >= 133) & (cr <= 173)
+        ratio = float(skin.mean())
+        if ratio <= self.max_skin_ratio:
+            return False, [f"Prefilter ({self.name}): {ratio:.1%} skin-tone pixels in thumbnail "
+                           f"({gray:.0%} without colour)"]
+        return None
+
+
+STAGES = {
+    'size': SizeGate,
+    'dimensions': DimensionGate,
+    'allowlist': HashAllowlist,
+    'profanity': TextProfanityPass,
+    'lowres': LowResProbe,
+}
+
+
+class PrefilterCascade:
+    """Run stages in order; the first one that returns a verdict decides the file."""
+
+    def __init__(self, stages: Iterable):
+        self.stages = list(stages)
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_spec(cls, spec: str, hash_fn=file_sha256) -> 'PrefilterCascade':
+        """
+        Build a cascade from a comma separated spec, e.g. "size,dimensions,allowlist:safe.txt,profanity".
+        'allowlist' takes the allowlist file after a colon.
+        """
+        stages = []
+        for item in spec.split(','):
+            name, _, arg = item.strip().partition(':')
+            if not name:
+                continue
+            if name not in STAGES:
+                raise ValueError(f"Unknown prefilter stage '{name}'. Choose from: {', '.join(STAGES)}")
+            if name == 'allowlist':
+                if not arg:
+                    raise ValueError("The allowlist stage needs a file: allowlist:<path>")
+                stages.append(HashAllowlist(arg, hash_fn=hash_fn))
+            else:
+                stages.append(STAGES[name]())
+        return cls(stages)
+
+    def decide(self, file_path: str) -> Optional[Tuple[Verdict, str]]:
+        """Return (verdict, stage name) from the first deciding stage, or None if the models are needed."""
+        for stage in self.stages:
+            try:
+                verdict = stage(file_path)
+            except Exception as e:
+                logging.warning(f"Prefilter stage {stage.name} failed for {file_path}: {e}")
+                continue
+            if verdict is not None:
+                self.record(stage.name)
+                return verdict, stage.name
+        return None
+
+    def record(self, stage_name: str):
+        with self._lock:
+            self.stats[stage_name] += 1
+
+    def summary(self) -> str:
+        total = sum(self.stats.values())
+        if not total:
+            return "no files"
+        model = self.stats.get('model', 0)
+        parts = [f"{name}={count}" for name, count in self.stats.most_common()]
+        return f"{', '.join(parts)} ({1 - model / total:.1%} of {total} files decided without a model pass)"
@@ -0,0 +1,371 @@
+"""
+Headless command-line entry point.
+
+    python -m nsfw_quarantine_app scan <dir> --workers N --batch-size B --output results.jsonl
+
+This module must not import tkinter, cv2 or ImageTk so it starts quickly on
+servers and in containers.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+from crawler import iter_files, ScanJournal
+
+
+def _alert_dispatcher(args):
+    """Build the alert dispatcher from the environment (.env is honoured when python-dotenv is installed)."""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    from alert_mailer import AlertDispatcher
+
+    dispatcher = AlertDispatcher.from_env(digest_size=args.alert_digest_size,
+                                          digest_interval=args.alert_digest_interval)
+    if dispatcher is None:
+        logging.error('[ALERT ERROR] Email env vars missing (ALERT_MAIL_SENDER, ALERT_MAIL_RECIPIENT, ALERT_MAIL_USER, ALERT_MAIL_PASS)')
+    return dispatcher
+
+
+def run_scan(args) -> int:
+    if not os.path.isdir(args.directory):
+        logging.error(f"Not a directory: {args.directory}")
+        return 2
+
+    from detector import ContentDetector, SCANNABLE_EXTENSIONS
+
+    if args.order == 'size' and (args.journal or args.processes):
+        # The journal resumes after the last file in crawl order, and worker processes keep that order
+        logging.error("--order size cannot be combined with --journal or --processes")
+        return 2
+
+    journal = None
+    resume_after = None
+    if args.journal:
+        journal = ScanJournal(args.journal, args.directory)
+        if args.restart:
+            journal.finish()
+        else:
+            resume_after = journal.load()
+            if resume_after is not None:
+                logging.info(f"Resuming after {os.path.join(*resume_after)} ({journal.completed} files already done)")
+
+    detector = ContentDetector(
+        quarantine_dir=args.quarantine_dir,
+        confidence_threshold=args.threshold,
+        decode_workers=args.workers,
+        decode_queue_depth=max(args.queue_depth, args.batch_size),
+        cache_path=args.cache,
+        phash_distance=args.phash_distance,
+        blocklist_path=args.blocklist,
+        backend=args.backend,
+        model_dir=args.model_dir,
+        quantize=_modalities(args.quantize) if args.quantize else (),
+        quarantine_mode=args.quarantine_mode,
+        video_sampling=args.video_sampling,
+        video_fps=args.video_fps,
+        asr_backend=args.asr_backend,
+        asr_model=args.asr_model,
+    )
+    if args.prefilter:
+        from cascade import PrefilterCascade
+        from result_cache import file_sha256
+        hash_fn = detector.result_cache.content_hash if detector.result_cache else file_sha256
+        try:
+            detector.prefilter = PrefilterCascade.from_spec(args.prefilter, hash_fn=hash_fn)
+        except (ValueError, OSError) as e:
+            logging.error(f"Invalid --prefilter: {e}")
+            detector.close()
+            return 2
+    alerts = _alert_dispatcher(args) if args.alerts else None
+
+    scanner = detector
+    if args.order == 'size':
+        from scheduler import ScanScheduler
+        scanner = ScanScheduler(detector, batch_size=args.batch_size)
+    elif args.processes:
+        from process_pool import ProcessScanner
+        try:
+            scanner = ProcessScanner(detector, processes=args.processes, torch_threads=args.torch_threads,
+                                     chunk_size=args.batch_size)
+        except RuntimeError as e:
+            logging.error(str(e))
+            detector.close()
+            return 2
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'a', encoding='utf-8')
+    scanned = flagged = quarantined = 0
+    files = iter_files(args.directory, SCANNABLE_EXTENSIONS, resume_after=resume_after)
+    completed = False
+    try:
+        # The scheduler's lanes already batch with args.batch_size
+        if args.order == 'size':
+            results = scanner.iter_scan(files)
+        else:
+            results = scanner.iter_scan(files, batch_size=args.batch_size)
+        for file_path, (is_flagged, reasons) in results:
+            scanned += 1
+            record = {'path': file_path, 'flagged': is_flagged, 'reasons': reasons}
+            if is_flagged:
+                flagged += 1
+                if not args.no_quarantine:
+                    success, msg = detector.quarantine_file(file_path)
+                    record['quarantined'] = success
+                    record['quarantine_path' if success else 'quarantine_error'] = msg
+                    if success:
+                        quarantined += 1
+                        if alerts:
+                            alerts.submit(file_path, reasons, msg)
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+            if journal:
+                journal.record(file_path)
+        completed = True
+    finally:
+        if journal and completed:
+            journal.finish()
+        elif journal:
+            journal.close()
+        if out is not sys.stdout:
+            out.close()
+        if scanner is not detector and hasattr(scanner, 'close'):
+            scanner.close()
+        detector.close()
+        if alerts:
+            # Sends the last digest before exiting
+            alerts.close()
+
+    logging.info(f"Scan complete: {scanned} scanned, {flagged} flagged, {quarantined} quarantined")
+    if alerts:
+        logging.info(f"Alerts: {alerts.sent_alerts} sent in {alerts.sent_messages} emails, {alerts.failed_alerts} failed")
+    transfers = detector.quarantine_store.transfers
+    if transfers:
+        logging.info(f"Quarantine transfers: {', '.join(f'{m}={n}' for m, n in transfers.most_common())}")
+    if detector.prefilter is not None:
+        logging.info(f"Decided by stage: {detector.prefilter.summary()}")
+    if detector.phash_index is not None:
+        logging.info(f"Perceptual hash index: {detector.phash_index.summary()}")
+    return 0
+
+
+def run_blocklist(args) -> int:
+    from blocklist import HashBlocklist
+
+    if args.action in ('import', 'export') and not args.file:
+        logging.error(f"blocklist {args.action} needs a hex digest file")
+        return 2
+    blocklist = HashBlocklist(args.path)
+    try:
+        if args.action == 'import':
+            count = blocklist.import_hex(args.file)
+            logging.info(f"Imported {count} digests; blocklist now holds {len(blocklist)}")
+        elif args.action == 'export':
+            count = blocklist.export_hex(args.file)
+            logging.info(f"Exported {count} digests to {args.file}")
+        elif args.action == 'compact':
+            blocklist.compact()
+        print(f"{len(blocklist)} digests in {args.path}")
+    finally:
+        blocklist.close()
+    return 0
+
+
+def _modalities(spec: str):
+    return [m.strip() for m in spec.split(',') if m.strip()]
+
+
+def run_export(args) -> int:
+    from backends import export_models
+
+    try:
+        export_models(args.output, args.format, _modalities(args.models), quantize=args.quantize)
+    except ValueError as e:
+        logging.error(str(e))
+        return 2
+    return 0
+
+
+def run_parity(args) -> int:
+    from backends import parity_check
+    from detector import SCANNABLE_EXTENSIONS
+
+    samples = list(iter_files(args.samples, SCANNABLE_EXTENSIONS)) if args.samples else []
+    diffs = parity_check(args.model_dir, args.backend, samples, _modalities(args.models))
+    failed = False
+    for modality, diff in diffs.items():
+        ok = diff <= args.tolerance
+        failed = failed or not ok
+        print(f"{modality}: max probability difference {diff:.2e} ({'ok' if ok else 'FAIL'}, tolerance {args.tolerance:.0e})")
+    return 1 if failed else 0
+
+
+def run_evaluate(args) -> int:
+    from evaluation import evaluate, format_report
+    from detector import SCANNABLE_EXTENSIONS
+
+    if not os.path.isdir(args.directory):
+        logging.error(f"Not a directory: {args.directory}")
+        return 2
+    paths = list(iter_files(args.directory, SCANNABLE_EXTENSIONS))
+    if args.limit:
+        paths = paths[:args.limit]
+    if not paths:
+        logging.error(f"No scannable files in {args.directory}")
+        return 2
+    report = evaluate(args.directory, paths, _modalities(args.quantize), args.backend, args.model_dir,
+                      args.batch_size)
+    print(format_report(report))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+def run_serve(args) -> int:
+    import asyncio
+    from detector import ContentDetector
+    from server import serve
+
+    detector = ContentDetector(
+        quarantine_dir=args.quarantine_dir,
+        confidence_threshold=args.threshold,
+        decode_workers=args.workers,
+        decode_queue_depth=max(64, args.max_batch),
+        cache_path=args.cache,
+        backend=args.backend,
+        model_dir=args.model_dir,
+        quantize=_modalities(args.quantize) if args.quantize else (),
+    )
+    # Load the models before accepting requests so the first clients do not pay for it
+    detector.warm_up()
+    try:
+        asyncio.run(serve(detector, args.host, args.port, args.unix, max_batch=args.max_batch,
+                          batch_window_ms=args.batch_window_ms, max_inflight=args.max_inflight))
+    except KeyboardInterrupt:
+        logging.info("Moderation server stopped")
+    finally:
+        detector.close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='nsfw_quarantine_app', description='Multimodal Content Moderation Tool (headless)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    scan = subparsers.add_parser('scan', help='Scan a directory tree and stream results as JSON Lines')
+    scan.add_argument('directory', help='Directory to scan recursively')
+    scan.add_argument('--workers', type=int, default=4, help='Image decoder threads (default: 4)')
+    scan.add_argument('--batch-size', type=int, default=16, help='Images per model forward pass (default: 16)')
+    scan.add_argument('--processes', type=int, default=0,
+                      help='Scan in this many forked worker processes sharing the model weights (default: 0, in-process)')
+    scan.add_argument('--order', choices=['input', 'size'], default='input',
+                      help='input: results in crawl order; size: per-type scan lanes, smallest first among the '
+                           'next 1024 crawled files, results as they finish (default: input)')
+    scan.add_argument('--torch-threads', type=int, default=None,
+                      help='Torch intra-op threads per worker process (default: cores / processes)')
+    scan.add_argument('--queue-depth', type=int, default=64, help='Images decoded ahead of the model (default: 64)')
+    scan.add_argument('--output', default='-', help='JSON Lines output file, appended to (default: stdout)')
+    scan.add_argument('--quarantine-dir', default='quarantine', help='Quarantine directory (default: quarantine)')
+    scan.add_argument('--quarantine-mode', choices=['copy', 'link', 'move'], default='copy',
+                      help='copy (reflink/in-kernel copy when possible), link (hard link) or move the '
+                           'original into quarantine (default: copy)')
+    scan.add_argument('--no-quarantine', action='store_true', help='Report flagged files without quarantining them')
+    scan.add_argument('--threshold', type=float, default=0.5, help='NSFW confidence threshold (default: 0.5)')
+    scan.add_argument('--cache', default=None, help='SQLite result cache file (default: no cache)')
+    scan.add_argument('--prefilter', default=None, metavar='STAGES',
+                      help='Cheap checks before the models, in order, e.g. '
+                           '"size,dimensions,allowlist:safe_hashes.txt,profanity,lowres" (default: none)')
+    scan.add_argument('--phash-distance', type=int, default=None, metavar='BITS',
+                      help='Reuse verdicts of near-duplicate images within this Hamming distance (default: off)')
+    scan.add_argument('--blocklist', default=None, metavar='PATH',
+                      help='SHA-256 blocklist of quarantined content, checked before any decoding (default: none)')
+    scan.add_argument('--backend', choices=['torch', 'onnx', 'torchscript'], default='torch',
+                      help='Inference backend; onnx and torchscript need --model-dir (default: torch)')
+    scan.add_argument('--model-dir', default=None, help='Directory written by the export command')
+    scan.add_argument('--quantize', default=None, metavar='MODELS',
+                      help='Run these models with int8 linear layers, e.g. "image,text" (default: none)')
+    scan.add_argument('--video-sampling', choices=['keyframes', 'scene', 'fps'], default='keyframes',
+                      help='Video frames to classify: codec keyframes, scene changes or --video-fps per second '
+                           '(default: keyframes)')
+    scan.add_argument('--video-fps', type=float, default=1.0, help='Frames per second for --video-sampling fps (default: 1)')
+    scan.add_argument('--asr-backend', choices=['whisper', 'stub'], default='whisper',
+                      help='Speech recognition for audio files; stub transcribes nothing (default: whisper)')
+    scan.add_argument('--asr-model', default='base', help='Whisper model size for audio files (default: base)')
+    scan.add_argument('--journal', default=None, help='Checkpoint journal; an interrupted scan resumes from it (default: none)')
+    scan.add_argument('--restart', action='store_true', help='Ignore an existing journal and scan from the top')
+    scan.add_argument('--alerts', action='store_true',
+                      help='Send quarantine alert emails (ALERT_MAIL_* and ALERT_SMTP_* env vars)')
+    scan.add_argument('--alert-digest-size', type=int, default=25,
+                      help='Quarantined files per alert email (default: 25)')
+    scan.add_argument('--alert-digest-interval', type=float, default=30.0,
+                      help='Seconds to wait for more files before sending a digest (default: 30)')
+    scan.set_defaults(func=run_scan)
+
+    blocklist = subparsers.add_parser('blocklist', help='Manage the known-bad SHA-256 blocklist')
+    blocklist.add_argument('action', choices=['import', 'export', 'compact', 'stats'])
+    blocklist.add_argument('path', help='Blocklist file')
+    blocklist.add_argument('file', nargs='?', help='Hex digest file (one per line) for import/export')
+    blocklist.set_defaults(func=run_blocklist)
+
+    export = subparsers.add_parser('export', help='Export the models to ONNX or TorchScript')
+    export.add_argument('output', help='Directory for the exported models')
+    export.add_argument('--format', choices=['onnx', 'torchscript'], default='onnx', help='Export format (default: onnx)')
+    export.add_argument('--models', default='image,text', help='Models to export (default: image,text)')
+    export.add_argument('--quantize', action='store_true', help='Write int8 (dynamically quantized) artifacts')
+    export.set_defaults(func=run_export)
+
+    parity = subparsers.add_parser('parity', help='Check exported models against eager PyTorch')
+    parity.add_argument('model_dir', help='Directory written by the export command')
+    parity.add_argument('--backend', choices=['onnx', 'torchscript'], default='onnx', help='Backend to check (default: onnx)')
+    parity.add_argument('--samples', default=None, help='Directory of sample images/texts (default: synthetic inputs)')
+    parity.add_argument('--models', default='image,text', help='Models to check (default: image,text)')
+    parity.add_argument('--tolerance', type=float, default=1e-3,
+                        help='Largest allowed probability difference (default: 1e-3)')
+    parity.set_defaults(func=run_parity)
+
+    evaluate = subparsers.add_parser('evaluate', help='Compare fp32 and int8 models on a labeled sample directory')
+    evaluate.add_argument('directory', help='Samples; nsfw/, hate/ hold positives and sfw/, clean/ negatives')
+    evaluate.add_argument('--quantize', default='image,text', help='Models to quantize (default: image,text)')
+    evaluate.add_argument('--backend', choices=['torch', 'onnx', 'torchscript'], default='torch',
+                          help='Inference backend for both runs (default: torch)')
+    evaluate.add_argument('--model-dir', default=None, help='Directory written by the export command')
+    evaluate.add_argument('--batch-size', type=int, default=16, help='Images per model forward pass (default: 16)')
+    evaluate.add_argument('--limit', type=int, default=None, help='Evaluate at most this many files')
+    evaluate.add_argument('--output', default=None, help='Also write the full report as JSON')
+    evaluate.set_defaults(func=run_evaluate)
+
+    serve = subparsers.add_parser('serve', help='Keep the models loaded and answer moderation requests over HTTP')
+    serve.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    serve.add_argument('--port', type=int, default=8765, help='TCP port (default: 8765)')
+    serve.add_argument('--unix', default=None, metavar='PATH', help='Listen on this Unix socket instead of TCP')
+    serve.add_argument('--max-batch', type=int, default=16, help='Most requests per model batch (default: 16)')
+    serve.add_argument('--batch-window-ms', type=float, default=5.0,
+                       help='How long a request waits for others to batch with (default: 5)')
+    serve.add_argument('--max-inflight', type=int, default=256,
+                       help='Requests accepted at once; more wait for a slot (default: 256)')
+    serve.add_argument('--workers', type=int, default=4, help='Image decoder threads (default: 4)')
+    serve.add_argument('--threshold', type=float, default=0.5, help='NSFW confidence threshold (default: 0.5)')
+    serve.add_argument('--cache', default=None, help='SQLite result cache file for path requests (default: no cache)')
+    serve.add_argument('--quarantine-dir', default='quarantine', help='Quarantine directory (default: quarantine)')
+    serve.add_argument('--backend', choices=['torch', 'onnx', 'torchscript'], default='torch',
+                       help='Inference backend; onnx and torchscript need --model-dir (default: torch)')
+    serve.add_argument('--model-dir', default=None, help='Directory written by the export command')
+    serve.add_argument('--quantize', default=None, metavar='MODELS',
+                       help='Run these models with int8 linear layers, e.g. "image,text" (default: none)')
+    serve.set_defaults(func=run_serve)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
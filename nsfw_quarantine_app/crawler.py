@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import time
+from typing import Iterable, Iterator, Optional, Tuple
+
+
+def _components(root: str, path: str) -> Tuple[str, ...]:
+    rel = os.path.relpath(path, root)
+    return tuple(rel.split(os.sep))
+
+
+def iter_files(root: str, extensions: Optional[Iterable[str]] = None,
+               resume_after: Optional[Tuple[str, ...]] = None) -> Iterator[str]:
+    """
+    Lazily walk root with os.scandir, yielding matching file paths.
+
+    Entries are visited depth-first in sorted name order, so the walk order is
+    deterministic: a file comes after another iff its path components compare
+    greater. Only one directory listing is held per level, so memory does not
+    grow with the size of the tree, but it does grow with the largest single
+    directory: each listing is read in full and sorted before its first entry
+    is yielded. Symlinked directories are not followed.
+
+    extensions: lower-case suffixes to keep (None keeps every file)
+    resume_after: path components (relative to root) of the last completed file;
+        it and everything before it in walk order are skipped without descending.
+    """
+    extensions = tuple(e.lower() for e in extensions) if extensions is not None else None
+    stack = [(iter(_sorted_entries(root)), ())]
+    while stack:
+        entries, dir_parts = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+        parts = dir_parts + (entry.name,)
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+        except OSError:
+            continue
+        if is_dir:
+            # The whole subtree is before the checkpoint if its prefix is
+            if resume_after is not None and parts < resume_after[:len(parts)]:
+                continue
+            stack.append((iter(_sorted_entries(entry.path)), parts))
+            continue
+        if resume_after is not None and parts <= resume_after:
+            continue
+        if extensions is not None and os.path.splitext(entry.name)[1].lower() not in extensions:
+            continue
+        yield entry.path
+
+
+def _sorted_entries(dir_path: str) -> list:
+    """
+    The directory's entries sorted by name. The whole listing is needed for the
+    sort (and the resume order depends on it), so a directory with millions of
+    files costs a few hundred bytes per entry until the walk leaves it.
+    """
+    try:
+        with os.scandir(dir_path) as it:
+            return sorted(it, key=lambda e: e.name)
+    except OSError as e:
+        logging.warning(f"Cannot list directory {dir_path}: {e}")
+        return []
+
+
+class ScanJournal:
+    """
+    Append-only checkpoint journal for a directory scan.
+
+    Each line records the last file whose result has been emitted. Because
+    iter_files walks in a deterministic order and results are emitted in order,
+    that one path is enough to resume a killed scan. The journal is compacted
+    to a single line once it grows past `compact_after` lines.
+    """
+
+    def __init__(self, journal_path: str, root: str, flush_every: int = 100,
+                 flush_interval: float = 5.0, compact_after: int = 10000):
+        self.journal_path = journal_path
+        self.root = os.path.abspath(root)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.compact_after = compact_after
+        self.completed = 0
+        self._last = None
+        self._since_flush = 0
+        self._last_flush = time.monotonic()
+        self._lines = 0
+        self._file = None
+
+    def load(self) -> Optional[Tuple[str, ...]]:
+        """Return the checkpoint left by a previous run over the same root, or None."""
+        if not os.path.exists(self.journal_path):
+            return None
+        checkpoint = None
+        other_roots = set()
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                self._lines += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from a killed process; keep the previous checkpoint
+                    continue
+                if record.get('root') != self.root:
+                    other_roots.add(record.get('root'))
+                    continue
+                checkpoint = record
+        if other_roots:
+            logging.warning(f"Journal {self.journal_path} has checkpoints for other roots "
+                            f"({', '.join(sorted(map(str, other_roots)))}), skipping them")
+        if checkpoint is None:
+            return None
+        self.completed = checkpoint.get('completed', 0)
+        self._last = tuple(checkpoint['last'])
+        return self._last
+
+    def record(self, file_path: str):
+        """Mark file_path (and everything before it in walk order) as done."""
+        self._last = _components(self.root, os.path.abspath(file_path))
+        self.completed += 1
+        self._since_flush += 1
+        if self._since_flush >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._last is None or self._since_flush == 0:
+            return
+        if self._lines >= self.compact_after:
+            self._compact()
+        if self._file is None:
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self._file.write(json.dumps({'root': self.root, 'last': list(self._last), 'completed': self.completed}) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._lines += 1
+        self._since_flush = 0
+        self._last_flush = time.monotonic()
+
+    def finish(self):
+        """The scan completed: remove the journal so the next run starts from the top."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def close(self):
+        """Flush the checkpoint and keep the journal for a later resume."""
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _compact(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'root': self.root, 'last': list(self._last), 'completed': self.completed}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+        self._lines = 1
@@ -0,0 +1,63 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+
+class DecodePipeline:
+    """
+    Bounded producer/consumer pipeline that decodes items on a pool of worker
+    threads while the caller consumes the results.
+
+    At most `queue_depth` items are in flight at any time, so a slow consumer
+    (the model forward pass) applies backpressure to the decoders, and results
+    are always yielded in input order.
+    """
+
+    def __init__(self, decode_fn: Callable[[Any], Any], workers: int = 4, queue_depth: int = 64,
+                 should_decode: Optional[Callable[[Any], bool]] = None):
+        self.decode_fn = decode_fn
+        self.workers = max(0, int(workers))
+        self.queue_depth = max(1, int(queue_depth))
+        self.should_decode = should_decode
+
+    def imap(self, items: Iterable[Any]) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+        """
+        Yield (item, decoded, error) for every item, in order.
+        Items rejected by `should_decode` pass through with decoded=None, error=None.
+        """
+        if self.workers == 0:
+            for item in items:
+                yield self._decode_inline(item)
+            return
+
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='decode')
+        window = deque()
+        try:
+            for item in items:
+                if self.should_decode is None or self.should_decode(item):
+                    window.append((item, pool.submit(self.decode_fn, item)))
+                else:
+                    window.append((item, None))
+                while len(window) >= self.queue_depth:
+                    yield self._collect(*window.popleft())
+            while window:
+                yield self._collect(*window.popleft())
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _decode_inline(self, item: Any) -> Tuple[Any, Any, Optional[Exception]]:
+        if self.should_decode is not None and not self.should_decode(item):
+            return item, None, None
+        try:
+            return item, self.decode_fn(item), None
+        except Exception as e:
+            return item, None, e
+
+    @staticmethod
+    def _collect(item: Any, future) -> Tuple[Any, Any, Optional[Exception]]:
+        if future is None:
+            return item, None, None
+        try:
+            return item, future.result(), None
+        except Exception as e:
+            return item, None, e
@@ -1,130 +1,431 @@
 from PIL import Image
+import hashlib
+import io
 import os
-import shutil
-import torch
-import timm
-from typing import Tuple, List, Dict
+import tempfile
+import threading
+from collections import namedtuple
+from typing import Tuple, List, Dict, Iterable, Iterator
 import logging
-from better_profanity import profanity
-from hate_speech_detector import HateSpeechDetector
+from decode_pipeline import DecodePipeline
+from result_cache import ResultCache, file_sha256
+from blocklist import HashBlocklist
+from text_stream import iter_text_segments, sanitize, char_to_byte_offsets, DEFAULT_CHUNK_BYTES
+from profanity_matcher import get_default_matcher
+from phash_index import PerceptualHashIndex
+from quarantine_store import QuarantineStore
+from video import iter_video_frames, prefetch, format_timestamp
+from backends import check_backend, load_image_backend, quantize_dynamic_int8
+from audio import iter_pcm_windows, create_transcriber, SAMPLE_RATE
+from sniff import sniff_extension
 
 logging.basicConfig(level=logging.INFO)
 
-import shutil
 import subprocess
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+TEXT_EXTENSIONS = ('.txt', '.md', '.csv', '.log')
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.webm', '.mov')
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.flac', '.ogg')
+SCANNABLE_EXTENSIONS = IMAGE_EXTENSIONS + TEXT_EXTENSIONS + VIDEO_EXTENSIONS + AUDIO_EXTENSIONS
+NSFW_MODEL_NAME = "hf_hub:Marqo/nsfw-image-detection-384"
+HATE_SPEECH_MODEL_NAME = "Hate-speech-CNERG/dehatebert-mono-english"
+# Text files larger than this are streamed in chunks instead of read whole
+TEXT_STREAM_MIN_BYTES = 64 * 1024
+# Flagged byte ranges listed per text file (and flagged timestamps per video)
+MAX_REPORTED_RANGES = 5
+
+
+# Output of the image decoder: the transformed tensor (None when the verdict is reused),
+# the perceptual hash (None when the index is disabled) and (distance, analysis) of a near-duplicate
+DecodedImage = namedtuple('DecodedImage', ['tensor', 'phash', 'reused'])
+
+
+def _is_image_path(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() in IMAGE_EXTENSIONS
+
+
+def _is_text_path(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() in TEXT_EXTENSIONS
+
+
+def _is_decoded(item: Tuple[str, object, Exception]) -> bool:
+    """True for pipeline output that went through the image decoder (even if it failed)."""
+    return item[1] is not None or item[2] is not None
+
 
 class ContentDetector:
-    def __init__(self, quarantine_dir: str = "quarantine", confidence_threshold: float = 0.5):
-        # Dictionary to track original path to quarantined path mapping
-        self.quarantine_map = {}
-        """Initialize the content detector with quarantine directory."""
+    def __init__(self, quarantine_dir: str = "quarantine", confidence_threshold: float = 0.5,
+                 decode_workers: int = 4, decode_queue_depth: int = 64,
+                 cache_path: str = None, cache_max_bytes: int = 256 * 1024 * 1024,
+                 text_stream_min_bytes: int = TEXT_STREAM_MIN_BYTES, text_chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                 prefilter=None, phash_distance: int = None, phash_algorithm: str = 'phash',
+                 blocklist_path: str = None, backend: str = 'torch', model_dir: str = None,
+                 quantize: Iterable[str] = (), quarantine_mode: str = 'copy',
+                 video_sampling: str = 'keyframes', video_fps: float = 1.0, video_exit_confidence: float = 0.9,
+                 asr_backend: str = 'whisper', asr_model: str = 'base', audio_window_seconds: float = 30.0):
+        """
+        Initialize the content detector with quarantine directory.
+        decode_workers: threads decoding/transforming images ahead of the model (0 = inline)
+        decode_queue_depth: max images decoded ahead of the model; keep it >= the scan batch size
+        cache_path: SQLite file for persistent scan results (None disables the cache)
+        text_stream_min_bytes: text files above this size are analyzed in streaming mode
+        text_chunk_bytes: read size for streaming text analysis
+        prefilter: optional cascade.PrefilterCascade of cheap checks run before the models
+        phash_distance: reuse the verdict of an already-scored image whose perceptual hash is
+            within this many bits (None disables the near-duplicate index)
+        blocklist_path: persistent SHA-256 blocklist; quarantined content is added to it and
+            matching files are flagged before any decoding (None disables it)
+        backend: 'torch' (eager), 'onnx' or 'torchscript'; the latter two load the
+            models exported into model_dir by the export command
+        quantize: modalities ('image', 'text') whose model runs with int8 linear layers;
+            eager models are quantized at load, exported backends load the int8 artifacts
+        quarantine_mode: 'copy' (reflink or in-kernel copy where possible), 'link' (hard link
+            on the same filesystem) or 'move' (the original is removed)
+        video_sampling: 'keyframes', 'scene' or 'fps' (video_fps frames per second), see video.py
+        video_exit_confidence: stop decoding a video at the first frame at least this NSFW
+        asr_backend: speech recognition for audio files, 'whisper' or 'stub' (see audio.py)
+        asr_model: Whisper model size ('tiny', 'base', 'small', ...)
+        audio_window_seconds: length of the audio windows transcribed and checked one at a time
+        """
         self.quarantine_dir = quarantine_dir
         self.confidence_threshold = confidence_threshold
+        self.decode_workers = decode_workers
+        self.decode_queue_depth = decode_queue_depth
+        self.text_stream_min_bytes = text_stream_min_bytes
+        self.text_chunk_bytes = text_chunk_bytes
+        self.prefilter = prefilter
+        self.blocklist = HashBlocklist(blocklist_path) if blocklist_path else None
+        self.phash_index = PerceptualHashIndex(phash_distance, phash_algorithm) if phash_distance is not None else None
+        check_backend(backend, model_dir)
+        self.backend = backend
+        self.model_dir = model_dir
+        self.quantize = frozenset(quantize)
+        unknown = self.quantize - {'image', 'text'}
+        if unknown:
+            raise ValueError(f"Unknown modality to quantize: {', '.join(sorted(unknown))}")
+        self.nsfw_model_name = NSFW_MODEL_NAME
+        self.hate_speech_model_name = HATE_SPEECH_MODEL_NAME
+        self.hate_speech_threshold = 0.5
+        self.result_cache = ResultCache(cache_path, max_bytes=cache_max_bytes) if cache_path else None
         self._ensure_quarantine_dir()
-        self._check_ffmpeg_available()
-        try:
-            # Initialize the NSFW detection model
-            logging.info("Loading NSFW detection model...")
-
-            self.nsfw_model = timm.create_model("hf_hub:Marqo/nsfw-image-detection-384", pretrained=True)
-            self.nsfw_model.eval()
-            self.nsfw_data_config = timm.data.resolve_model_data_config(self.nsfw_model)
-            self.nsfw_transforms = timm.data.create_transform(**self.nsfw_data_config, is_training=False)
-            
-            # Get NSFW class names and verify model configuration
-            nsfw_cfg = self.nsfw_model.pretrained_cfg
-            self.nsfw_class_names = nsfw_cfg.get("label_names", [])
-            
-            if not self.nsfw_class_names:
-                raise ValueError("NSFW model does not provide class names")
+        self.video_sampling = video_sampling
+        self.video_fps = video_fps
+        self.video_exit_confidence = video_exit_confidence
+        self.asr_backend = asr_backend
+        self.asr_model = asr_model
+        self.audio_window_seconds = audio_window_seconds
+        # Content-addressed copies of flagged files, indexed by original path across restarts
+        self.quarantine_store = QuarantineStore(quarantine_dir, hash_fn=self.content_hash, mode=quarantine_mode)
+        # Models (and torch/timm/transformers) are loaded the first time a file
+        # of their modality is scanned, or ahead of time by warm_up()
+        self._nsfw_model = None
+        self._nsfw_transforms = None
+        self._hate_speech_detector = None
+        self._transcriber = None
+        self._ffmpeg_available = None
+        self._nsfw_lock = threading.Lock()
+        self._text_lock = threading.Lock()
+        self._asr_lock = threading.Lock()
+
+    @property
+    def nsfw_model(self):
+        if self._nsfw_model is None:
+            self._load_nsfw_model()
+        return self._nsfw_model
+
+    @property
+    def nsfw_transforms(self):
+        if self._nsfw_transforms is None:
+            self._load_nsfw_model()
+        return self._nsfw_transforms
+
+    @property
+    def hate_speech_detector(self):
+        if self._hate_speech_detector is None:
+            with self._text_lock:
+                if self._hate_speech_detector is None:
+                    logging.info("Loading hate speech model...")
+                    from hate_speech_detector import HateSpeechDetector
+                    self._hate_speech_detector = HateSpeechDetector(
+                        model_name=self.hate_speech_model_name, threshold=self.hate_speech_threshold,
+                        backend=self.backend, model_dir=self.model_dir, quantize='text' in self.quantize
+                    )
+        return self._hate_speech_detector
+
+    @property
+    def transcriber(self):
+        if self._transcriber is None:
+            with self._asr_lock:
+                if self._transcriber is None:
+                    logging.info(f"Loading '{self.asr_backend}' speech recognition...")
+                    self._transcriber = create_transcriber(self.asr_backend, self.asr_model)
+        return self._transcriber
+
+    def _load_nsfw_model(self):
+        """Load the NSFW model for the configured backend; safe to call from several threads."""
+        with self._nsfw_lock:
+            if self._nsfw_model is not None:
+                return
+            try:
+                # Initialize the NSFW detection model
+                logging.info(f"Loading NSFW detection model ({self.backend} backend"
+                             f"{', int8' if 'image' in self.quantize else ''})...")
+                import timm
+
+                if self.backend == 'torch':
+                    nsfw_model = timm.create_model(self.nsfw_model_name, pretrained=True)
+                    nsfw_model.eval()
+                    self.nsfw_data_config = timm.data.resolve_model_data_config(nsfw_model)
+                    if 'image' in self.quantize:
+                        nsfw_model = quantize_dynamic_int8(nsfw_model)
+                    # Get NSFW class names and verify model configuration
+                    self.nsfw_class_names = nsfw_model.pretrained_cfg.get("label_names", [])
+                else:
+                    # Exported graph: only timm's preprocessing is used, no model is built
+                    nsfw_model, metadata = load_image_backend(self.backend, self.model_dir,
+                                                              quantized='image' in self.quantize)
+                    self.nsfw_data_config = metadata['data_config']
+                    self.nsfw_class_names = metadata['class_names']
+                
+                if not self.nsfw_class_names:
+                    raise ValueError("NSFW model does not provide class names")
+                    
+                # Verify we have NSFW and SFW classes
+                if 'NSFW' not in self.nsfw_class_names or 'SFW' not in self.nsfw_class_names:
+                    raise ValueError(f"NSFW model must have NSFW and SFW classes. Found: {self.nsfw_class_names}")
                 
-            # Verify we have NSFW and SFW classes
-            if 'NSFW' not in self.nsfw_class_names or 'SFW' not in self.nsfw_class_names:
-                raise ValueError(f"NSFW model must have NSFW and SFW classes. Found: {self.nsfw_class_names}")
-            
-            # Get class indices
-            self.nsfw_idx = self.nsfw_class_names.index('NSFW')
-            self.sfw_idx = self.nsfw_class_names.index('SFW')
-            
-            logging.info(f"NSFW model loaded with classes: {self.nsfw_class_names}")
-            logging.info("NSFW detection initialized successfully")
-            
+                # Get class indices
+                self.nsfw_idx = self.nsfw_class_names.index('NSFW')
+                self.sfw_idx = self.nsfw_class_names.index('SFW')
+                
+                self._nsfw_transforms = timm.data.create_transform(**self.nsfw_data_config, is_training=False)
+                self._nsfw_model = nsfw_model
+                logging.info(f"NSFW model loaded with classes: {self.nsfw_class_names}")
+                logging.info("NSFW detection initialized successfully")
+                
+            except Exception as e:
+                logging.error(f"Error initializing content detection models: {e}")
+                raise
+
+    def warm_up(self, modalities: Iterable[str] = ('image', 'text'), background: bool = False):
+        """
+        Load the models for the given modalities ahead of the first scan.
+        With background=True the loading runs on a daemon thread, which is returned.
+        """
+        def load():
+            try:
+                for modality in modalities:
+                    if modality == 'image':
+                        self._load_nsfw_model()
+                    elif modality == 'text':
+                        self.hate_speech_detector
+                    else:
+                        logging.warning(f"Unknown modality for warm-up: {modality}")
+            except Exception as e:
+                logging.error(f"Model warm-up failed: {e}")
+
+        if not background:
+            load()
+            return None
+        thread = threading.Thread(target=load, name='model-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        """Release resources held by the detector (flushes the result cache, blocklist and quarantine index)."""
+        if self.result_cache is not None:
+            self.result_cache.close()
+            self.result_cache = None
+        if self.blocklist is not None:
+            self.blocklist.close()
+            self.blocklist = None
+        self.quarantine_store.close()
+
+    def content_hash(self, file_path: str) -> str:
+        """SHA-256 of a file, reusing the result cache's (path, size, mtime) fast path when available."""
+        if self.result_cache is not None:
+            return self.result_cache.content_hash(file_path)
+        return file_sha256(file_path)
+
+    def cache_fingerprint(self) -> str:
+        """Identify the models and thresholds that produced a result, for cache keys."""
+        fingerprint = (
+            f"{self.nsfw_model_name}@{self.confidence_threshold}"
+            f"|{self.hate_speech_model_name}@{self.hate_speech_threshold}"
+        )
+        # Exported backends and int8 models may differ from eager fp32 scores
+        if self.backend != 'torch':
+            fingerprint += f"|{self.backend}"
+        if self.quantize:
+            fingerprint += f"|int8:{','.join(sorted(self.quantize))}"
+        # Audio (and video) verdicts are never cached, so the ASR settings are not part of it
+        return fingerprint
+
+    def _cache_lookup(self, file_path: str):
+        """Return a cached (is_flagged, reasons) for an unchanged file, or None."""
+        if self.result_cache is None:
+            return None
+        try:
+            return self.result_cache.get(file_path, self.cache_fingerprint())
         except Exception as e:
-            logging.error(f"Error initializing content detection models: {e}")
-            raise
-        
-        self.hate_speech_detector = HateSpeechDetector()
+            logging.warning(f"Result cache lookup failed for {file_path}: {e}")
+            return None
+
+    def _cache_store(self, file_path: str, result: Tuple[bool, List[str]]):
+        """Persist a result unless it reflects an error or an unsupported file."""
+        if self.result_cache is None or not self._cacheable(os.path.splitext(file_path)[1].lower(), result):
+            return
+        try:
+            self.result_cache.put(file_path, self.cache_fingerprint(), result)
+        except Exception as e:
+            logging.warning(f"Result cache store failed for {file_path}: {e}")
+
+    def _cache_store_digest(self, sha256: str, ext: str, result: Tuple[bool, List[str]]):
+        """_cache_store for in-memory content."""
+        if self.result_cache is None or not self._cacheable(ext, result):
+            return
+        try:
+            self.result_cache.put_digest(sha256, ext, self.cache_fingerprint(), result)
+        except Exception as e:
+            logging.warning(f"Result cache store failed for uploaded content: {e}")
+
+    @staticmethod
+    def _cacheable(ext: str, result: Tuple[bool, List[str]]) -> bool:
+        """Only image and text verdicts are cached, and never errors."""
+        if ext not in IMAGE_EXTENSIONS and ext not in TEXT_EXTENSIONS:
+            return False
+        return not any(reason.startswith('Error') for reason in result[1])
     
     def _ensure_quarantine_dir(self):
         """Ensure quarantine directory exists."""
         if not os.path.exists(self.quarantine_dir):
             os.makedirs(self.quarantine_dir)
 
-    def _check_ffmpeg_available(self):
-        """Check if ffmpeg is available on the system PATH and log a warning if not."""
-        try:
-            subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-        except Exception:
-            logging.warning("ffmpeg not found. Audio analysis will not work until ffmpeg is installed and on PATH.")
+    def _check_ffmpeg_available(self) -> bool:
+        """Check (once) if ffmpeg is available on the system PATH and log a warning if not."""
+        if self._ffmpeg_available is None:
+            try:
+                subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+                self._ffmpeg_available = True
+            except Exception:
+                logging.warning("ffmpeg not found. Audio and video analysis will not work until ffmpeg is installed and on PATH.")
+                self._ffmpeg_available = False
+        return self._ffmpeg_available
     
     def analyze_image_content(self, image_path: str) -> Tuple[bool, float, List[str]]:
         """Analyze image content using NSFW detection model."""
         try:
-            # Run NSFW detection
-            img = Image.open(image_path).convert('RGB')
-            img_tensor = self.nsfw_transforms(img).unsqueeze(0)
-            
-            with torch.no_grad():
-                output = self.nsfw_model(img_tensor).softmax(dim=-1).cpu()
-            
-            # Get NSFW probabilities
-            probabilities = output[0].numpy()
-            nsfw_prob = float(probabilities[self.nsfw_idx])
-            sfw_prob = float(probabilities[self.sfw_idx])
-            
-            # Log NSFW detection results
-            logging.info(f"NSFW analysis for {image_path}:")
-            logging.info(f"NSFW probability: {nsfw_prob:.3f}")
-            logging.info(f"SFW probability: {sfw_prob:.3f}")
-            
-            # Determine if content should be quarantined
-            is_inappropriate = nsfw_prob >= self.confidence_threshold
-            max_prob = nsfw_prob
-            
-            # Prepare reasons
-            reasons = []
-            
-            if nsfw_prob >= self.confidence_threshold:
-                reasons.append(f'NSFW content detected ({nsfw_prob:.1%} confidence)')
-                reasons.append(f'- NSFW: {nsfw_prob:.1%}')
-                reasons.append(f'- SFW: {sfw_prob:.1%}')
-            
-            return is_inappropriate, max_prob, reasons
-            
+            decoded = self._decode_image(image_path)
         except Exception as e:
             logging.error(f"Error analyzing image {image_path}: {e}")
             return False, 0.0, [f'Error analyzing image: {e}']
+        return self._classify_decoded([(image_path, decoded, None)])[0]
+
+    def analyze_image_batch(self, image_paths: List[str]) -> List[Tuple[bool, float, List[str]]]:
+        """
+        Analyze several images with a single NSFW model forward pass.
+        Returns one (is_inappropriate, max_prob, reasons) tuple per path, in order.
+        """
+        return self._classify_decoded(list(self._decode_pipeline().imap(image_paths)))
+
+    def _decode_pipeline(self) -> DecodePipeline:
+        """Build the decoder pool that prepares image tensors ahead of the model."""
+        return DecodePipeline(
+            self._decode_image,
+            workers=self.decode_workers,
+            queue_depth=self.decode_queue_depth,
+            should_decode=_is_image_path,
+        )
+
+    def _decode_image(self, image_path: str) -> DecodedImage:
+        """
+        Decode an image file and apply the NSFW model transforms (runs on decoder threads).
+        Near-duplicates of already-scored images skip the transforms and reuse their verdict.
+        """
+        img = Image.open(image_path).convert('RGB')
+        image_hash = None
+        if self.phash_index is not None:
+            image_hash = self.phash_index.hash_image(img)
+            reused = self.phash_index.lookup(image_hash)
+            if reused is not None:
+                return DecodedImage(None, image_hash, reused)
+        return DecodedImage(self.nsfw_transforms(img), image_hash, None)
+
+    def _classify_decoded(self, decoded: List[Tuple[str, object, Exception]]) -> List[Tuple[bool, float, List[str]]]:
+        """Run one forward pass over pre-decoded (path, DecodedImage, error) triples."""
+        results = [None] * len(decoded)
+        tensors = []
+        loaded = []
+        for i, (image_path, image, error) in enumerate(decoded):
+            if error is not None:
+                logging.error(f"Error analyzing image {image_path}: {error}")
+                results[i] = (False, 0.0, [f'Error analyzing image: {error}'])
+            elif image.reused is not None:
+                distance, (is_inappropriate, max_prob, reasons) = image.reused
+                logging.info(f"Reusing near-duplicate verdict for {image_path} (Hamming distance {distance})")
+                results[i] = (is_inappropriate, max_prob,
+                              reasons + [f'- Verdict reused from a near-duplicate image (Hamming distance {distance})'])
+            else:
+                tensors.append(image.tensor)
+                loaded.append(i)
+        if tensors:
+            try:
+                import torch
+
+                with torch.no_grad():
+                    output = self.nsfw_model(torch.stack(tensors)).softmax(dim=-1).cpu()
+                for row, i in enumerate(loaded):
+                    results[i] = self._nsfw_verdict(decoded[i][0], output[row].numpy())
+                    if self.phash_index is not None:
+                        self.phash_index.add(decoded[i][1].phash, results[i])
+            except Exception as e:
+                logging.error(f"Error running batched NSFW inference: {e}")
+                for i in loaded:
+                    results[i] = (False, 0.0, [f'Error analyzing image: {e}'])
+        return results
+
+    def _nsfw_verdict(self, image_path: str, probabilities) -> Tuple[bool, float, List[str]]:
+        """Turn the softmax output of the NSFW model for one image into a verdict."""
+        # Get NSFW probabilities
+        nsfw_prob = float(probabilities[self.nsfw_idx])
+        sfw_prob = float(probabilities[self.sfw_idx])
+        
+        # Log NSFW detection results
+        logging.info(f"NSFW analysis for {image_path}:")
+        logging.info(f"NSFW probability: {nsfw_prob:.3f}")
+        logging.info(f"SFW probability: {sfw_prob:.3f}")
+        
+        # Determine if content should be quarantined
+        is_inappropriate = nsfw_prob >= self.confidence_threshold
+        max_prob = nsfw_prob
+        
+        # Prepare reasons
+        reasons = []
+        
+        if nsfw_prob >= self.confidence_threshold:
+            reasons.append(f'NSFW content detected ({nsfw_prob:.1%} confidence)')
+            reasons.append(f'- NSFW: {nsfw_prob:.1%}')
+            reasons.append(f'- SFW: {sfw_prob:.1%}')
+        
+        return is_inappropriate, max_prob, reasons
     
     def quarantine_file(self, file_path: str) -> Tuple[bool, str]:
         """
-        Copy a file to quarantine directory (do not remove the original).
+        Copy a file to the quarantine store (the original is only removed in 'move' mode).
+        Identical content is stored once; the copy is named by its SHA-256.
         Returns: (success, message)
         """
         try:
-            filename = os.path.basename(file_path)
-            dest_path = os.path.join(self.quarantine_dir, filename)
-            
-            # If file with same name exists, add number suffix
-            counter = 1
-            while os.path.exists(dest_path):
-                name, ext = os.path.splitext(filename)
-                dest_path = os.path.join(self.quarantine_dir, f"{name}_{counter}{ext}")
-                counter += 1
-            
-            shutil.copy2(file_path, dest_path)
-            # Track the mapping from original to quarantined path
-            self.quarantine_map[file_path] = dest_path
+            dest_path, sha256, stored = self.quarantine_store.put(file_path)
+            if not stored:
+                logging.info(f"{file_path} matches already quarantined content {os.path.basename(dest_path)}")
+            if self.blocklist is not None:
+                # Known-bad content is flagged instantly when it shows up again under another name
+                try:
+                    self.blocklist.add(sha256)
+                except Exception as e:
+                    logging.error(f"Could not add {file_path} to the blocklist: {e}")
             return True, dest_path
         
         except Exception as e:
@@ -132,58 +433,515 @@ class ContentDetector:
     
     def get_quarantine_path(self, original_path: str) -> str:
         """Returns the quarantine path for a given original path if it exists, or None."""
-        return self.quarantine_map.get(original_path)
+        return self.quarantine_store.get(original_path)
         
     def scan_file(self, file_path: str) -> Tuple[bool, List[str]]:
         """
         Scan a single file for NSFW images or profanity/hate speech in text files.
+        Unchanged files are answered from the result cache when one is configured.
         Returns: (is_flagged, reasons)
         """
+        decided = self._prescan(file_path)
+        if decided is not None:
+            return decided
+        result = self._scan_file_uncached(file_path)
+        self._cache_store(file_path, result)
+        return result
+
+    def scan_bytes(self, data, mime: str = None) -> Tuple[bool, List[str]]:
+        """
+        Scan in-memory content (bytes, bytearray or memoryview) without writing it to disk.
+        The type is sniffed from the magic bytes; mime is only a fallback for unrecognised content.
+        Returns: (is_flagged, reasons)
+        """
+        return self.scan_bytes_batch([(data, mime)])[0]
+
+    def scan_stream(self, fileobj, mime: str = None) -> Tuple[bool, List[str]]:
+        """
+        Scan the rest of a binary stream (an upload, a BytesIO, ...) like scan_bytes.
+        A BytesIO is scanned from its buffer in place; other streams are read into memory.
+        """
+        if isinstance(fileobj, io.BytesIO):
+            data = fileobj.getbuffer()[fileobj.tell():]
+        else:
+            data = fileobj.read()
+        return self.scan_bytes(data, mime)
+
+    def scan_bytes_batch(self, payloads: Iterable[Tuple[object, str]], batch_size: int = 16) -> List[Tuple[bool, List[str]]]:
+        """
+        Scan many in-memory (data, mime) payloads along the same paths as files: the
+        blocklist and result cache by content hash, the decoder pool and batched NSFW
+        passes for images, length-bucketed hate speech batches for text. Prefilter
+        stages work on paths and are skipped. Returns one result per payload, in order.
+        """
+        batch_size = max(1, int(batch_size))
+        payloads = list(payloads)
+        results = [None] * len(payloads)
+        # (index, extension, sha256) of the payloads that need a model
+        images = []
+        texts = []
+        for i, (data, mime) in enumerate(payloads):
+            ext = sniff_extension(data, mime)
+            if ext is None:
+                results[i] = (False, ["Unsupported content type for scanning."])
+                continue
+            sha256 = hashlib.sha256(data).hexdigest()
+            decided = self._prescan_digest(sha256, ext)
+            if decided is not None:
+                results[i] = decided
+            elif ext in IMAGE_EXTENSIONS:
+                images.append((i, ext, sha256))
+            elif ext in TEXT_EXTENSIONS:
+                texts.append((i, ext, sha256))
+            else:
+                results[i] = self._scan_spooled(data, ext)
+
+        if images:
+            pipeline = DecodePipeline(self._decode_image, workers=self.decode_workers,
+                                      queue_depth=self.decode_queue_depth)
+            pending = []
+            for entry, (_, decoded, error) in zip(images, pipeline.imap(io.BytesIO(payloads[i][0]) for i, _, _ in images)):
+                pending.append((entry, (f"<{entry[1][1:]} upload>", decoded, error)))
+                if len(pending) >= batch_size:
+                    self._finish_image_payloads(pending, results)
+                    pending = []
+            if pending:
+                self._finish_image_payloads(pending, results)
+
+        small = []
+        for entry in texts:
+            data = payloads[entry[0]][0]
+            if memoryview(data).nbytes > self.text_stream_min_bytes:
+                try:
+                    result = self._analyze_text_fileobj(io.BytesIO(data))
+                except Exception as e:
+                    logging.error(f"Error analyzing uploaded text: {e}")
+                    result = (False, [f"Error analyzing text: {e}"])
+                self._finish_payload(entry, self._text_result('<text upload>', result), results)
+            else:
+                small.append(entry)
+        if small:
+            contents = [str(payloads[i][0], 'utf-8', 'ignore') for i, _, _ in small]
+            try:
+                hate_results = self.hate_speech_detector.is_hate_speech_batch(contents)
+                for entry, content, (is_hate, hate_prob) in zip(small, contents, hate_results):
+                    result = self._text_verdict(content, is_hate, hate_prob)
+                    self._finish_payload(entry, self._text_result('<text upload>', result), results)
+            except Exception as e:
+                logging.error(f"Error running batched hate speech inference: {e}")
+                for i, _, _ in small:
+                    results[i] = (False, [f"Error analyzing text: {e}"])
+        return results
+
+    def _finish_image_payloads(self, pending, results: List):
+        """Classify decoded image payloads in one forward pass and record their results."""
+        analyses = self._classify_decoded([decoded for _, decoded in pending])
+        for (entry, decoded), analysis in zip(pending, analyses):
+            self._finish_payload(entry, self._image_result(decoded[0], analysis), results)
+
+    def _finish_payload(self, entry: Tuple[int, str, str], result: Tuple[bool, List[str]], results: List):
+        i, ext, sha256 = entry
+        self._cache_store_digest(sha256, ext, result)
+        results[i] = result
+
+    def _prescan_digest(self, sha256: str, ext: str):
+        """_prescan for in-memory content: the blocklist and the result cache by content hash."""
+        if self.blocklist is not None and len(self.blocklist):
+            try:
+                if sha256 in self.blocklist:
+                    logging.warning("Known-bad content (blocklisted hash) in uploaded content")
+                    return True, ["Known-bad content: SHA-256 matches a previously quarantined file."]
+            except Exception as e:
+                logging.warning(f"Blocklist lookup failed for uploaded content: {e}")
+        if self.result_cache is not None:
+            try:
+                cached = self.result_cache.get_digest(sha256, ext, self.cache_fingerprint())
+            except Exception as e:
+                logging.warning(f"Result cache lookup failed for uploaded content: {e}")
+                cached = None
+            if cached is not None:
+                logging.info(f"Using cached result for uploaded {ext[1:]} content")
+                return cached
+        return None
+
+    def _scan_spooled(self, data, ext: str) -> Tuple[bool, List[str]]:
+        """
+        Scan video or audio content through a temporary file: ffmpeg needs a seekable
+        input for most containers (MP4 keeps its index at the end).
+        """
+        fd, tmp_path = tempfile.mkstemp(suffix=ext)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            return self._scan_file_uncached(tmp_path)
+        finally:
+            os.remove(tmp_path)
+
+    def _prescan(self, file_path: str):
+        """
+        Answer a file without the models when possible: from the known-bad blocklist, the
+        result cache, then the prefilter cascade. Every file is counted against the stage
+        that decided it.
+        """
+        if self.blocklist is not None and len(self.blocklist):
+            try:
+                if self.content_hash(file_path) in self.blocklist:
+                    logging.warning(f"Known-bad content (blocklisted hash) in {file_path}")
+                    if self.prefilter is not None:
+                        self.prefilter.record('blocklist')
+                    return True, ["Known-bad content: SHA-256 matches a previously quarantined file."]
+            except Exception as e:
+                logging.warning(f"Blocklist lookup failed for {file_path}: {e}")
+        cached = self._cache_lookup(file_path)
+        if cached is not None:
+            logging.info(f"Using cached result for {file_path}")
+            if self.prefilter is not None:
+                self.prefilter.record('cache')
+            return cached
+        if self.prefilter is not None:
+            decision = self.prefilter.decide(file_path)
+            if decision is not None:
+                result, stage = decision
+                logging.info(f"Prefilter stage '{stage}' decided {file_path}")
+                return result
+            self.prefilter.record('model')
+        return None
+
+    def _scan_file_uncached(self, file_path: str) -> Tuple[bool, List[str]]:
         try:
             ext = os.path.splitext(file_path)[1].lower()
-            if ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
-                is_inappropriate, max_prob, reasons = self.analyze_image_content(file_path)
-                if is_inappropriate:
-                    logging.warning(f"Inappropriate image detected in {file_path} with score {max_prob:.3f}")
-                else:
-                    logging.info(f"Image file {file_path} is safe (max inappropriate score: {max_prob:.3f})")
-                return is_inappropriate, reasons
-            elif ext in ['.txt', '.md', '.csv', '.log']:
-                is_flagged, reasons = self.analyze_text_content(file_path)
-                if is_flagged:
-                    logging.warning(f"Flagged text file {file_path}")
-                else:
-                    logging.info(f"Text file {file_path} is safe (no issues detected)")
-                return is_flagged, reasons
+            if ext in IMAGE_EXTENSIONS:
+                return self._image_result(file_path, self.analyze_image_content(file_path))
+            elif ext in TEXT_EXTENSIONS:
+                return self._text_result(file_path, self.analyze_text_content(file_path))
+            elif ext in VIDEO_EXTENSIONS:
+                return self._video_result(file_path, self.analyze_video_content(file_path))
+            elif ext in AUDIO_EXTENSIONS:
+                return self._audio_result(file_path, self.analyze_audio_content(file_path))
             else:
                 logging.info(f"File type not supported for scanning: {file_path}")
                 return False, ["Unsupported file type for scanning."]
         except Exception as e:
             logging.error(f"Error scanning file {file_path}: {e}")
             return False, [f"Error scanning file: {e}"]
+
+    def scan_batch(self, file_paths: Iterable[str], batch_size: int = 16) -> List[Tuple[bool, List[str]]]:
+        """
+        Scan many files, running the NSFW model once per batch of images.
+        Returns the same (is_flagged, reasons) tuples as scan_file, in input order.
+        """
+        return [result for _, result in self.iter_scan(file_paths, batch_size=batch_size)]
+
+    def iter_scan(self, file_paths: Iterable[str], batch_size: int = 16) -> Iterator[Tuple[str, Tuple[bool, List[str]]]]:
+        """
+        Lazily scan files in input order, yielding (file_path, (is_flagged, reasons))
+        as soon as the batch containing each file has been classified.
+        Images are decoded by the decoder pool while the previous batch is on the model,
+        text files are classified in length-bucketed batches, and files answered by the
+        result cache or the prefilter cascade are never decoded.
+        """
+        batch_size = max(1, int(batch_size))
+        cached = {}
+
+        def lookups():
+            for file_path in file_paths:
+                result = self._prescan(file_path)
+                if result is not None:
+                    cached[file_path] = result
+                yield file_path
+
+        pipeline = self._decode_pipeline()
+        pipeline.should_decode = lambda p: p not in cached and _is_image_path(p)
+        pending = []
+        image_count = 0
+        text_count = 0
+        for decoded in pipeline.imap(lookups()):
+            pending.append(decoded)
+            if _is_decoded(decoded):
+                image_count += 1
+            elif decoded[0] not in cached and _is_text_path(decoded[0]):
+                text_count += 1
+            if image_count >= batch_size or text_count >= batch_size:
+                yield from self._scan_pending(pending, cached)
+                pending = []
+                image_count = 0
+                text_count = 0
+        if pending:
+            yield from self._scan_pending(pending, cached)
+
+    def _scan_pending(self, decoded: List[Tuple[str, object, Exception]], cached: Dict) -> Iterator[Tuple[str, Tuple[bool, List[str]]]]:
+        """Classify the decoded images and uncached text files of a pending group in batches, then emit results in order."""
+        images = [d for d in decoded if _is_decoded(d)]
+        try:
+            analyses = iter(self._classify_decoded(images))
+        except Exception as e:
+            logging.error(f"Error scanning image batch: {e}")
+            analyses = iter([(False, 0.0, [f"Error analyzing image: {e}"])] * len(images))
+        is_batch_text = [not _is_decoded(d) and d[0] not in cached and _is_text_path(d[0]) for d in decoded]
+        text_paths = [d[0] for d, is_text in zip(decoded, is_batch_text) if is_text]
+        text_results = iter(self.analyze_text_batch(text_paths))
+        for item, is_text in zip(decoded, is_batch_text):
+            file_path = item[0]
+            if _is_decoded(item):
+                result = self._image_result(file_path, next(analyses))
+                self._cache_store(file_path, result)
+                yield file_path, result
+            elif is_text:
+                result = self._text_result(file_path, next(text_results))
+                self._cache_store(file_path, result)
+                yield file_path, result
+            elif file_path in cached:
+                yield file_path, cached.pop(file_path)
+            else:
+                # Already looked up by _prescan; go straight to the analysis
+                result = self._scan_file_uncached(file_path)
+                self._cache_store(file_path, result)
+                yield file_path, result
+
+    def _text_result(self, file_path: str, result: Tuple[bool, List[str]]) -> Tuple[bool, List[str]]:
+        """Log a text verdict."""
+        if result[0]:
+            logging.warning(f"Flagged text file {file_path}")
+        else:
+            logging.info(f"Text file {file_path} is safe (no issues detected)")
+        return result
+
+    def _image_result(self, file_path: str, analysis: Tuple[bool, float, List[str]]) -> Tuple[bool, List[str]]:
+        """Log an image verdict and reduce it to the scan_file result shape."""
+        is_inappropriate, max_prob, reasons = analysis
+        if is_inappropriate:
+            logging.warning(f"Inappropriate image detected in {file_path} with score {max_prob:.3f}")
+        else:
+            logging.info(f"Image file {file_path} is safe (max inappropriate score: {max_prob:.3f})")
+        return is_inappropriate, reasons
+
+    def _video_result(self, file_path: str, result: Tuple[bool, List[str]]) -> Tuple[bool, List[str]]:
+        """Log a video verdict."""
+        if result[0]:
+            logging.warning(f"Inappropriate frames detected in video {file_path}")
+        else:
+            logging.info(f"Video file {file_path} is safe (no flagged frames)")
+        return result
+
+    def analyze_video_content(self, video_path: str, batch_size: int = 16) -> Tuple[bool, List[str]]:
+        """
+        Classify sampled frames of a video in batches while ffmpeg streams them.
+        Decoding stops at the first frame scoring at least video_exit_confidence.
+        Returns (is_flagged, reasons) with the timestamps of flagged frames.
+        """
+        if not self._check_ffmpeg_available():
+            return False, ["Video analysis needs ffmpeg installed and on PATH."]
+        import torch
+
+        transforms = self.nsfw_transforms
+        img_size = self.nsfw_data_config['input_size'][-1]
+        frames = iter_video_frames(video_path, self.video_sampling, fps=self.video_fps, size=img_size)
+        # Frames are decoded and transformed ahead of the model, a couple of batches deep
+        tensors = prefetch(((t, transforms(frame)) for t, frame in frames), depth=batch_size * 2)
+        flagged = []
+        sampled = 0
+        max_prob = 0.0
+        stopped_early = False
+        try:
+            while not stopped_early:
+                batch = []
+                for item in tensors:
+                    batch.append(item)
+                    if len(batch) >= batch_size:
+                        break
+                if not batch:
+                    break
+                with torch.no_grad():
+                    output = self.nsfw_model(torch.stack([tensor for _, tensor in batch])).softmax(dim=-1).cpu()
+                sampled += len(batch)
+                for (timestamp, _), probabilities in zip(batch, output.numpy()):
+                    nsfw_prob = float(probabilities[self.nsfw_idx])
+                    max_prob = max(max_prob, nsfw_prob)
+                    if nsfw_prob >= self.confidence_threshold:
+                        flagged.append((timestamp, nsfw_prob))
+                    if nsfw_prob >= self.video_exit_confidence:
+                        stopped_early = True
+                if len(batch) < batch_size:
+                    break
+        finally:
+            tensors.close()
+            frames.close()
+        logging.info(f"Video {video_path}: {sampled} frames sampled ({self.video_sampling}), "
+                     f"max NSFW probability {max_prob:.3f}")
+        if not flagged:
+            return False, []
+        worst_time, worst_prob = max(flagged, key=lambda f: f[1])
+        reasons = [f"NSFW content detected in video ({worst_prob:.1%} confidence at {format_timestamp(worst_time)})"]
+        shown = ', '.join(f"{format_timestamp(t)} ({p:.1%})" for t, p in flagged[:MAX_REPORTED_RANGES])
+        more = f" and {len(flagged) - MAX_REPORTED_RANGES} more" if len(flagged) > MAX_REPORTED_RANGES else ''
+        reasons.append(f"- Flagged frames at {shown}{more}")
+        reasons.append(f"- {sampled} frames sampled ({self.video_sampling})"
+                       + (", stopped at the first confident frame" if stopped_early else ''))
+        return True, reasons
+
+    def _audio_result(self, file_path: str, result: Tuple[bool, List[str]]) -> Tuple[bool, List[str]]:
+        """Log an audio verdict."""
+        if result[0]:
+            logging.warning(f"Flagged speech in audio file {file_path}")
+        else:
+            logging.info(f"Audio file {file_path} is safe (no issues in transcript)")
+        return result
+
+    def analyze_audio_content(self, audio_path: str) -> Tuple[bool, List[str]]:
+        """
+        Transcribe an audio file window by window while ffmpeg streams its PCM, and
+        run every window's transcript through the profanity and hate speech checks.
+        Only a couple of windows are held in memory, and decoding stops at the first
+        flagged window. Returns (is_flagged, reasons) with the flagged time range.
+        """
+        if not self._check_ffmpeg_available():
+            return False, ["Audio analysis needs ffmpeg installed and on PATH."]
+        matcher = get_default_matcher()
+        transcriber = self.transcriber
+        # The next window is decoded while the current one is transcribed
+        windows = prefetch(iter_pcm_windows(audio_path, self.audio_window_seconds), depth=2)
+        reasons = []
+        transcribed = 0
+        try:
+            for start, end, pcm in windows:
+                text = transcriber.transcribe(pcm, SAMPLE_RATE).strip()
+                transcribed += 1
+                if not text:
+                    continue
+                span = f"{format_timestamp(start)}-{format_timestamp(end)}"
+                matches = matcher.find_all(text)
+                if matches:
+                    reasons.append(f"Profanity detected in audio transcript ({span}).")
+                    reasons.append(f"Censored preview: {matcher.censor(text, matches, limit=100)}...")
+                is_hate, hate_prob = self.hate_speech_detector.is_hate_speech_batch([text])[0]
+                if is_hate:
+                    reasons.append(f"Hate speech detected in audio transcript ({span}). (probability: {hate_prob:.2f})")
+                if reasons:
+                    break
+        finally:
+            windows.close()
+        logging.info(f"Audio {audio_path}: {transcribed} windows of {self.audio_window_seconds:g}s transcribed")
+        return bool(reasons), reasons
+
     def analyze_text_content(self, text_path: str) -> Tuple[bool, List[str]]:
         """
         Analyze a text file for profanity and hate speech.
+        Large files are streamed in bounded chunks (see _analyze_text_stream).
         Returns: (is_flagged, reasons)
         """
         try:
-            profanity.load_censor_words()
-            with open(text_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            reasons = []
-            is_flagged = False
-            # Profanity check
-            if profanity.contains_profanity(content):
-                censored = profanity.censor(content)
-                reasons.append("Profanity detected in text file.")
-                reasons.append(f"Censored preview: {censored[:100]}...")
-                is_flagged = True
-            # Hate speech check
-            is_hate, hate_prob = self.hate_speech_detector.is_hate_speech(content)
-            if is_hate:
-                reasons.append(f"Hate speech detected in text file. (probability: {hate_prob:.2f})")
-                is_flagged = True
-            return is_flagged, reasons
+            if os.path.getsize(text_path) > self.text_stream_min_bytes:
+                return self._analyze_text_stream(text_path)
+            content = self._read_text(text_path)
+            is_hate, hate_prob = self.hate_speech_detector.is_hate_speech_batch([content])[0]
+            return self._text_verdict(content, is_hate, hate_prob)
         except Exception as e:
             logging.error(f"Error analyzing text file {text_path}: {e}")
-            return False, [f"Error analyzing text file: {e}"]
\ No newline at end of file
+            return False, [f"Error analyzing text file: {e}"]
+
+    def analyze_text_batch(self, text_paths: List[str]) -> List[Tuple[bool, List[str]]]:
+        """
+        Analyze several text files, classifying them for hate speech in
+        length-bucketed batches. Files too large to read whole are streamed
+        individually. Returns one (is_flagged, reasons) per path, in order.
+        """
+        results = [None] * len(text_paths)
+        contents = []
+        loaded = []
+        for i, text_path in enumerate(text_paths):
+            try:
+                if os.path.getsize(text_path) > self.text_stream_min_bytes:
+                    results[i] = self.analyze_text_content(text_path)
+                    continue
+                contents.append(self._read_text(text_path))
+                loaded.append(i)
+            except Exception as e:
+                logging.error(f"Error analyzing text file {text_path}: {e}")
+                results[i] = (False, [f"Error analyzing text file: {e}"])
+        if contents:
+            try:
+                hate_results = self.hate_speech_detector.is_hate_speech_batch(contents)
+                for content, i, (is_hate, hate_prob) in zip(contents, loaded, hate_results):
+                    results[i] = self._text_verdict(content, is_hate, hate_prob)
+            except Exception as e:
+                logging.error(f"Error running batched hate speech inference: {e}")
+                for i in loaded:
+                    results[i] = (False, [f"Error analyzing text file: {e}"])
+        return results
+
+    def _analyze_text_stream(self, text_path: str) -> Tuple[bool, List[str]]:
+        """
+        Analyze a large text file in constant memory: it is read in bounded chunks,
+        every chunk goes through the profanity automaton and all of it is covered by
+        overlapping 512-token hate speech windows. Stops at the first flagged chunk or window.
+        """
+        with open(text_path, 'rb') as f:
+            return self._analyze_text_fileobj(f)
+
+    def _analyze_text_fileobj(self, f) -> Tuple[bool, List[str]]:
+        """_analyze_text_stream over an open binary stream (a file or an in-memory buffer)."""
+        matcher = get_default_matcher()
+        scanner = matcher.scanner()
+        profane = []
+        # (char_base, byte_base, text) of the last two segments, to map match offsets to bytes
+        recent = []
+
+        def to_byte(char_pos):
+            for char_base, byte_base, text in reversed(recent):
+                if char_pos >= char_base:
+                    return char_to_byte_offsets(text, byte_base, [char_pos - char_base])[0]
+            return recent[0][1]
+
+        def segments(f):
+            char_base = 0
+            for text, offset in iter_text_segments(f, self.text_chunk_bytes):
+                yield text, offset
+                clean = sanitize(text)
+                recent.append((char_base, offset, text))
+                del recent[:-2]
+                matches = list(scanner.feed(clean, char_base))
+                char_base += len(text)
+                if matches:
+                    local = [(start - recent[-1][0], end - recent[-1][0]) for start, end in matches]
+                    preview = matcher.censor(clean, local, limit=100)
+                    profane.append((to_byte(matches[0][0]), to_byte(matches[0][1]), preview))
+                    return
+            matches = scanner.finish()
+            if matches:
+                profane.append((to_byte(matches[0][0]), to_byte(matches[0][1]), ''))
+
+        is_hate, hate_prob, flagged = self.hate_speech_detector.scan_segments(segments(f), stop_on_first=True)
+
+        reasons = []
+        if profane:
+            byte_start, byte_end, preview = profane[0]
+            reasons.append("Profanity detected in text file.")
+            reasons.append(f"Censored preview: {preview}...")
+            reasons.append(f"- bytes {byte_start}-{byte_end}")
+        if is_hate:
+            reasons.append(f"Hate speech detected in text file. (probability: {hate_prob:.2f})")
+            for byte_start, byte_end, window_prob in flagged[:MAX_REPORTED_RANGES]:
+                reasons.append(f"- bytes {byte_start}-{byte_end} (probability: {window_prob:.2f})")
+        return bool(profane) or is_hate, reasons
+
+    def _read_text(self, text_path: str) -> str:
+        with open(text_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read()
+
+    def _text_verdict(self, content: str, is_hate: bool, hate_prob: float) -> Tuple[bool, List[str]]:
+        """Combine the profanity check with a hate speech result into (is_flagged, reasons)."""
+        matcher = get_default_matcher()
+        reasons = []
+        is_flagged = False
+        # Profanity check: one pass over the content, the preview is censored from the match offsets
+        matches = matcher.find_all(content)
+        if matches:
+            censored = matcher.censor(content, matches, limit=100)
+            reasons.append("Profanity detected in text file.")
+            reasons.append(f"Censored preview: {censored[:100]}...")
+            is_flagged = True
+        # Hate speech check
+        if is_hate:
+            reasons.append(f"Hate speech detected in text file. (probability: {hate_prob:.2f})")
+            is_flagged = True
+        return is_flagged, reasons
@@ -0,0 +1,135 @@
+"""
+Compare fp32 and int8-quantized inference on a labeled sample directory.
+
+Each mode runs in its own interpreter (this file is the worker entry point), so
+resident memory and load time are measured from a clean start. Labels come from
+the first directory level under the sample directory: nsfw/, hate/, flagged/
+hold positives and sfw/, safe/, clean/ negatives; files elsewhere only count
+towards agreement.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Iterable, List
+
+POSITIVE_LABELS = ('nsfw', 'hate', 'flagged', 'positive')
+NEGATIVE_LABELS = ('sfw', 'safe', 'clean', 'negative')
+
+
+def rss_mb() -> float:
+    """Resident set size of this process in MiB (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        scale = 2 ** 20 if sys.platform == 'darwin' else 2 ** 10
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def label_of(sample_dir: str, path: str):
+    """True/False from the top-level directory name, or None when unlabeled."""
+    top = os.path.relpath(path, sample_dir).split(os.sep)[0].lower()
+    if top in POSITIVE_LABELS:
+        return True
+    if top in NEGATIVE_LABELS:
+        return False
+    return None
+
+
+def run_mode(paths: List[str], quantize: Iterable[str], backend: str = 'torch', model_dir: str = None,
+             batch_size: int = 16) -> Dict:
+    """Load the models once and scan paths; returns verdicts, timings and memory."""
+    from detector import ContentDetector
+
+    baseline = rss_mb()
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as quarantine_dir:
+        detector = ContentDetector(quarantine_dir=quarantine_dir, backend=backend, model_dir=model_dir,
+                                   quantize=quantize)
+        detector.warm_up()
+        load_seconds = time.perf_counter() - start
+        loaded = rss_mb()
+        start = time.perf_counter()
+        results = detector.scan_batch(paths, batch_size=batch_size)
+        scan_seconds = time.perf_counter() - start
+        detector.close()
+    return {
+        'verdicts': [is_flagged for is_flagged, _ in results],
+        'load_seconds': load_seconds,
+        'scan_seconds': scan_seconds,
+        'model_rss_mb': loaded - baseline,
+        'peak_rss_mb': rss_mb(),
+    }
+
+
+def _run_mode_subprocess(paths: List[str], quantize: Iterable[str], backend: str, model_dir: str,
+                         batch_size: int) -> Dict:
+    request = {'paths': paths, 'quantize': sorted(quantize), 'backend': backend, 'model_dir': model_dir,
+               'batch_size': batch_size}
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__)], input=json.dumps(request),
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Evaluation worker failed:\n{proc.stderr[-2000:]}")
+    # Model libraries may print to stdout; the report is the last line
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def evaluate(sample_dir: str, paths: List[str], quantize: Iterable[str], backend: str = 'torch',
+             model_dir: str = None, batch_size: int = 16) -> Dict:
+    """Run fp32 and quantized modes on the same files and compare them."""
+    quantize = sorted(quantize)
+    fp32 = _run_mode_subprocess(paths, (), backend, model_dir, batch_size)
+    int8 = _run_mode_subprocess(paths, quantize, backend, model_dir, batch_size)
+    labels = [label_of(sample_dir, path) for path in paths]
+    report = {
+        'files': len(paths),
+        'quantized': quantize,
+        'fp32': fp32,
+        'int8': int8,
+        'speedup': fp32['scan_seconds'] / int8['scan_seconds'] if int8['scan_seconds'] else 0.0,
+        'memory_reduction_mb': fp32['model_rss_mb'] - int8['model_rss_mb'],
+        'agreement': _rate(a == b for a, b in zip(fp32['verdicts'], int8['verdicts'])),
+        'disagreements': [path for path, a, b in zip(paths, fp32['verdicts'], int8['verdicts']) if a != b],
+    }
+    labeled = [(label, i) for i, label in enumerate(labels) if label is not None]
+    if labeled:
+        report['labeled'] = len(labeled)
+        report['fp32_accuracy'] = _rate(fp32['verdicts'][i] == label for label, i in labeled)
+        report['int8_accuracy'] = _rate(int8['verdicts'][i] == label for label, i in labeled)
+    return report
+
+
+def _rate(matches) -> float:
+    matches = list(matches)
+    return sum(matches) / len(matches) if matches else 0.0
+
+
+def format_report(report: Dict) -> str:
+    fp32, int8 = report['fp32'], report['int8']
+    lines = [
+        f"files: {report['files']}  quantized: {', '.join(report['quantized'])}",
+        f"{'':8s}{'load s':>10s}{'scan s':>10s}{'files/s':>10s}{'model MiB':>12s}{'peak MiB':>11s}",
+    ]
+    for name, mode in (('fp32', fp32), ('int8', int8)):
+        rate = report['files'] / mode['scan_seconds'] if mode['scan_seconds'] else 0.0
+        lines.append(f"{name:8s}{mode['load_seconds']:10.2f}{mode['scan_seconds']:10.2f}{rate:10.1f}"
+                     f"{mode['model_rss_mb']:12.0f}{mode['peak_rss_mb']:11.0f}")
+    lines.append(f"speedup: {report['speedup']:.2f}x  memory saved: {report['memory_reduction_mb']:.0f} MiB  "
+                 f"verdict agreement: {report['agreement']:.1%}")
+    if 'labeled' in report:
+        lines.append(f"accuracy on {report['labeled']} labeled files: fp32 {report['fp32_accuracy']:.1%}, "
+                     f"int8 {report['int8_accuracy']:.1%}")
+    for path in report['disagreements'][:20]:
+        lines.append(f"  disagrees: {path}")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    request = json.loads(sys.stdin.read())
+    print(json.dumps(run_mode(request['paths'], request['quantize'], request['backend'], request['model_dir'],
+                              request['batch_size'])))
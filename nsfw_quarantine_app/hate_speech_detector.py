@@ -1,21 +1,140 @@
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch.nn.functional as F
+from itertools import islice
+from text_stream import iter_text_segments, sanitize, char_to_byte_offsets, DEFAULT_CHUNK_BYTES
+from backends import TorchTextBackend, load_text_backend, quantize_dynamic_int8
+
+# Tokens per classification window (512 minus [CLS] and [SEP]) and overlap between windows
+WINDOW_TOKENS = 510
+WINDOW_OVERLAP = 128
 
 
 class HateSpeechDetector:
-    def __init__(self, model_name="Hate-speech-CNERG/dehatebert-mono-english", threshold=0.5):
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
-        self.model.eval()
+    def __init__(self, model_name="Hate-speech-CNERG/dehatebert-mono-english", threshold=0.5,
+                 backend="torch", model_dir=None, quantize=False):
+        """
+        backend: "torch" (eager transformers), or "onnx" / "torchscript" to run
+        the artifact exported into model_dir (see backends.export_models)
+        quantize: int8 linear layers; eager models are quantized dynamically at
+        load, exported backends load the int8 artifact
+        """
+        self.model_name = model_name
+        self.backend = backend
+        self.quantize = quantize
+        if backend == "torch":
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+            self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+            self.model.eval()
+            if quantize:
+                self.model = quantize_dynamic_int8(self.model)
+            self.forward = TorchTextBackend(self.model)
+        else:
+            self.model = None
+            self.forward, self.tokenizer = load_text_backend(backend, model_dir, quantized=quantize)
         self.threshold = threshold
         self.label_map = {0: "non-hate", 1: "hate"}
 
     def is_hate_speech(self, text):
         inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
         with torch.no_grad():
-            outputs = self.model(**inputs)
-            probs = F.softmax(outputs.logits, dim=-1)
+            probs = F.softmax(self.forward(inputs), dim=-1)
             hate_prob = probs[0, 1].item()
             is_hate = hate_prob >= self.threshold
-        return is_hate, hate_prob 
\ No newline at end of file
+        return is_hate, hate_prob
+
+    def is_hate_speech_batch(self, texts, batch_size=16):
+        """
+        Classify many texts, returning (is_hate, prob) per input in order.
+        Texts longer than one window are split into overlapping 512-token windows
+        and scored by their worst window. All windows are sorted by token length
+        and run in dynamically padded batches, so each batch only pads to its own
+        longest member.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        encodings = self.tokenizer(texts, add_special_tokens=False, verbose=False)
+        owners = []
+        windows = []
+        for i, ids in enumerate(encodings["input_ids"]):
+            for start in _window_starts(len(ids)):
+                owners.append(i)
+                windows.append(ids[start:start + WINDOW_TOKENS])
+        best = [0.0] * len(texts)
+        for i, hate_prob in zip(owners, self._classify_windows(windows, batch_size)):
+            best[i] = max(best[i], hate_prob)
+        return [(hate_prob >= self.threshold, hate_prob) for hate_prob in best]
+
+    def scan_text_stream(self, fileobj, batch_size=16, chunk_bytes=DEFAULT_CHUNK_BYTES, stop_on_first=True):
+        """Classify a binary text stream window by window; see scan_segments."""
+        return self.scan_segments(iter_text_segments(fileobj, chunk_bytes), batch_size, stop_on_first)
+
+    def scan_segments(self, segments, batch_size=16, stop_on_first=True):
+        """
+        Classify (text, byte_offset) segments as overlapping 512-token windows.
+        Memory is bounded by one segment plus one batch of windows. With
+        stop_on_first, scanning stops after the batch containing the first
+        window over the threshold.
+        Returns (is_hate, max_prob, flagged) where flagged lists (byte_start, byte_end, prob).
+        """
+        windows = self.iter_windows(segments)
+        max_prob = 0.0
+        flagged = []
+        while True:
+            batch = list(islice(windows, batch_size))
+            if not batch:
+                break
+            probs = self._classify_windows([ids for ids, _, _ in batch], batch_size)
+            for (_, byte_start, byte_end), hate_prob in zip(batch, probs):
+                max_prob = max(max_prob, hate_prob)
+                if hate_prob >= self.threshold:
+                    flagged.append((byte_start, byte_end, hate_prob))
+            if flagged and stop_on_first:
+                break
+        return bool(flagged), max_prob, flagged
+
+    def iter_windows(self, segments):
+        """Yield (token_ids, byte_start, byte_end) windows over a stream of (text, byte_offset) segments."""
+        buffer = []
+        uncovered = 0
+        for text, offset in segments:
+            encoding = self.tokenizer(sanitize(text), add_special_tokens=False,
+                                      return_offsets_mapping=True, verbose=False)
+            spans = encoding["offset_mapping"]
+            starts = char_to_byte_offsets(text, offset, (start for start, _ in spans))
+            ends = char_to_byte_offsets(text, offset, (end for _, end in spans))
+            buffer.extend(zip(encoding["input_ids"], starts, ends))
+            uncovered += len(spans)
+            while len(buffer) >= WINDOW_TOKENS:
+                yield _window(buffer[:WINDOW_TOKENS])
+                uncovered = len(buffer) - WINDOW_TOKENS
+                del buffer[:WINDOW_TOKENS - WINDOW_OVERLAP]
+        if buffer and uncovered > 0:
+            yield _window(buffer)
+
+    def _classify_windows(self, windows, batch_size=16):
+        """Return the hate probability of each token-id window, batching windows of similar length."""
+        probs = [0.0] * len(windows)
+        order = sorted(range(len(windows)), key=lambda i: len(windows[i]))
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            features = [{"input_ids": self.tokenizer.build_inputs_with_special_tokens(windows[i])} for i in indices]
+            inputs = self.tokenizer.pad(features, return_tensors="pt")
+            with torch.no_grad():
+                batch_probs = F.softmax(self.forward(inputs), dim=-1)[:, 1].tolist()
+            for i, hate_prob in zip(indices, batch_probs):
+                probs[i] = hate_prob
+        return probs
+
+
+def _window_starts(n_tokens):
+    """Start offsets of overlapping windows covering n_tokens (one window for short texts)."""
+    if n_tokens <= WINDOW_TOKENS:
+        return [0]
+    stride = WINDOW_TOKENS - WINDOW_OVERLAP
+    return list(range(0, n_tokens - WINDOW_TOKENS, stride)) + [n_tokens - WINDOW_TOKENS]
+
+
+def _window(tokens):
+    return [token_id for token_id, _, _ in tokens], tokens[0][1], tokens[-1][2]
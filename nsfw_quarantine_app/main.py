@@ -7,13 +7,13 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
 from dotenv import load_dotenv
-from alert_mailer import send_quarantine_alert
+from alert_mailer import AlertDispatcher
 import sys
-import numpy as np
-import cv2
 from PIL import Image, ImageTk
 from logger import setup_logger
-from detector import ContentDetector
+from detector import ContentDetector, SCANNABLE_EXTENSIONS
+from crawler import iter_files
+from scheduler import ScanScheduler
 from threading import Thread
 import webbrowser
 from datetime import datetime
@@ -49,11 +49,26 @@ FONTS = {
     'mono': ('Consolas', 9),
 }
 
+# Number of images classified per NSFW model forward pass
+SCAN_BATCH_SIZE = 16
+
+# Persistent scan results so unchanged files are not re-scanned
+SCAN_CACHE_PATH = os.path.join('cache', 'scan_results.sqlite')
+
+# Hashes of quarantined content, so renamed copies are flagged without a model pass
+BLOCKLIST_PATH = os.path.join('cache', 'blocklist.bin')
+
 class NSFWQuarantineApp:
     def __init__(self):
         self.logger = logger
         self.selected_files = []
-        self.detector = ContentDetector()
+        self.detector = ContentDetector(cache_path=SCAN_CACHE_PATH, blocklist_path=BLOCKLIST_PATH)
+        # Load the models while the window comes up instead of on the first scan
+        self.detector.warm_up(background=True)
+        # Per-type scan lanes; small files first, double-click rescans jump the queue
+        self.scheduler = ScanScheduler(self.detector, batch_size=SCAN_BATCH_SIZE)
+        # Quarantine alerts are emailed from a background thread, batched into digests
+        self.alerts = AlertDispatcher.from_env()
         self.scanning = False
         self.preview_image = None
         self.scan_results = {}  # Always initialize scan_results
@@ -129,6 +144,7 @@ class NSFWQuarantineApp:
                                    font=FONTS['label'])
         self.file_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.file_list.bind('<<ListboxSelect>>', self.on_file_select)
+        self.file_list.bind('<Double-Button-1>', self.rescan_selected)
         
         # Scrollbar for the listbox
         list_scrollbar = ttk.Scrollbar(file_list_frame, orient="vertical", command=self.file_list.yview)
@@ -143,6 +159,9 @@ class NSFWQuarantineApp:
         self.browse_btn = ttk.Button(btn_frame, text='Browse Files', command=self.browse_files, style='Primary.TButton')
         self.browse_btn.pack(side=tk.LEFT, padx=5)
         
+        self.folder_btn = ttk.Button(btn_frame, text='Browse Folder', command=self.browse_folder, style='Primary.TButton')
+        self.folder_btn.pack(side=tk.LEFT, padx=5)
+        
         self.scan_btn = ttk.Button(btn_frame, text='Scan Selected', command=self.scan_files, state='disabled', style='Action.TButton')
         self.scan_btn.pack(side=tk.LEFT, padx=5)
         
@@ -242,7 +261,9 @@ class NSFWQuarantineApp:
         file_types = (
             ('All Files', '*.*'),
             ('Image Files', '*.jpg;*.jpeg;*.png;*.gif;*.bmp'),
-            ('Text Files', '*.txt;*.md;*.csv;*.log')   
+            ('Text Files', '*.txt;*.md;*.csv;*.log'),
+            ('Video Files', '*.mp4;*.mkv;*.webm;*.mov'),
+            ('Audio Files', '*.wav;*.mp3;*.m4a;*.flac;*.ogg')
         )
         
         files = filedialog.askopenfilenames(
@@ -251,39 +272,54 @@ class NSFWQuarantineApp:
         )
         
         if files:
-            # Verify files exist before adding them
-            valid_files = []
-            for file in files:
-                if os.path.exists(file):
-                    valid_files.append(file)
-                else:
-                    self.log_message(f"File not found: {os.path.basename(file)}", 'error')
-            
-            if not valid_files:
-                messagebox.showwarning("No Valid Files", "None of the selected files could be found.")
-                return
-                
-            self.selected_files = valid_files
-            self.file_list.delete(0, tk.END)
-            
-            # Add files to listbox with just filenames (not full paths)
-            for file in self.selected_files:
-                filename = os.path.basename(file)
-                self.file_list.insert(tk.END, filename)
-                
-            # Enable controls
-            self.scan_btn['state'] = 'normal'
-            self.clear_btn['state'] = 'normal'
-            self.status_label['text'] = 'Ready to scan'
-            self.progress_details['text'] = f'0/{len(self.selected_files)} files processed'
+            self._set_selected_files(files)
+
+    def browse_folder(self):
+        """Select every scannable file below a folder."""
+        folder = filedialog.askdirectory(title='Choose Folder to Scan')
+        if not folder:
+            return
+        files = list(iter_files(folder, SCANNABLE_EXTENSIONS))
+        if not files:
+            messagebox.showwarning("No Files Found", "The selected folder contains no supported files.")
+            return
+        self._set_selected_files(files)
+
+    def _set_selected_files(self, files):
+        """Replace the scan list with the given files and refresh the UI."""
+        # Verify files exist before adding them
+        valid_files = []
+        for file in files:
+            if os.path.exists(file):
+                valid_files.append(file)
+            else:
+                self.log_message(f"File not found: {os.path.basename(file)}", 'error')
+        
+        if not valid_files:
+            messagebox.showwarning("No Valid Files", "None of the selected files could be found.")
+            return
             
-            # Log the action
-            self.log_message(f'Selected {len(self.selected_files)} files for scanning', 'info')
+        self.selected_files = valid_files
+        self.file_list.delete(0, tk.END)
+        
+        # Add files to listbox with just filenames (not full paths)
+        for file in self.selected_files:
+            filename = os.path.basename(file)
+            self.file_list.insert(tk.END, filename)
             
-            # Load preview of first file (blurred by default)
-            if self.selected_files:
-                self.file_list.selection_set(0)
-                self.load_image_preview(self.selected_files[0], is_safe=None)
+        # Enable controls
+        self.scan_btn['state'] = 'normal'
+        self.clear_btn['state'] = 'normal'
+        self.status_label['text'] = 'Ready to scan'
+        self.progress_details['text'] = f'0/{len(self.selected_files)} files processed'
+        
+        # Log the action
+        self.log_message(f'Selected {len(self.selected_files)} files for scanning', 'info')
+        
+        # Load preview of first file (blurred by default)
+        if self.selected_files:
+            self.file_list.selection_set(0)
+            self.load_image_preview(self.selected_files[0], is_safe=None)
     
     def configure_styles(self):
         """Configure custom ttk styles for the application."""
@@ -386,6 +422,10 @@ class NSFWQuarantineApp:
         if blur_radius % 2 == 0:  # If even
             blur_radius += 1  # Make it odd
             
+        # OpenCV is only needed for previews, so import it on first use
+        import numpy as np
+        import cv2
+
         # Convert PIL Image to numpy array (for OpenCV)
         img_np = np.array(img) 
         
@@ -426,6 +466,11 @@ class NSFWQuarantineApp:
                 self.no_preview_label.configure(text="Audio file – no preview available")
                 self.no_preview_label.place(relx=0.5, rely=0.5, anchor='center')
                 return
+            elif ext in ['.mp4', '.mkv', '.webm', '.mov']:
+                # For video files, show video placeholder
+                self.no_preview_label.configure(text="Video file – no preview available")
+                self.no_preview_label.place(relx=0.5, rely=0.5, anchor='center')
+                return
 
             # Default: image preview logic (unchanged)
             img = Image.open(file_path)
@@ -580,6 +625,7 @@ class NSFWQuarantineApp:
         
         # Update UI state
         self.browse_btn['state'] = 'disabled'
+        self.folder_btn['state'] = 'disabled'
         self.scan_btn['state'] = 'disabled'
         self.clear_btn['state'] = 'disabled'
         self.progress_var.set(0)
@@ -616,31 +662,34 @@ class NSFWQuarantineApp:
                     self.log_message("No valid files to scan", 'error')
                     return
                 
-                # Start scanning valid files
-                for i, file_path in enumerate(self.selected_files):
-                    # Double-check file still exists before scanning
-                    if not os.path.exists(file_path):
-                        self.log_message(f'File disappeared during scan: {os.path.basename(file_path)}', 'error')
-                        continue
+                # Start scanning valid files; each file type has its own lane and
+                # results arrive as files finish, small files first
+                file_positions = {path: idx for idx, path in enumerate(self.selected_files)}
+
+                def files_to_scan():
+                    for file_path in self.selected_files:
+                        # Double-check file still exists before scanning
+                        if not os.path.exists(file_path):
+                            self.log_message(f'File disappeared during scan: {os.path.basename(file_path)}', 'error')
+                            continue
+                        yield file_path
+
+                processed = 0
+                for file_path, (is_flagged, reasons) in self.scheduler.iter_scan(files_to_scan()):
+                    i = file_positions[file_path]
+                    filename = os.path.basename(file_path)
+                    processed += 1
                     
                     # Update progress
-                    progress = (i + 1) / total_files * 100
+                    progress = processed / total_files * 100
                     self.progress_var.set(progress)
-                    self.progress_details['text'] = f'{i + 1}/{total_files} files processed'
+                    self.progress_details['text'] = f'{processed}/{total_files} files processed'
                     
                     # Update file list selection to show current file
                     self.window.after(0, lambda idx=i: self.file_list.selection_clear(0, tk.END) 
                                       or self.file_list.selection_set(idx) 
                                       or self.file_list.see(idx))
                     
-                    # Load preview of current file with blur (before analysis)
-                    self.window.after(0, lambda path=file_path: self.load_image_preview(path, is_safe=None))
-                    
-                    # Scan file
-                    filename = os.path.basename(file_path)
-                    self.log_message(f'Scanning {filename}...', 'info')
-                    is_flagged, reasons = self.detector.scan_file(file_path)
-                    
                     # Store result in our scan_results dictionary
                     self.scan_results[file_path] = (is_flagged, reasons)
                     
@@ -659,17 +708,10 @@ class NSFWQuarantineApp:
                             self.window.after(0, lambda path=quarantine_path: self.load_image_preview(path, is_safe=False))
                             self.log_message(f"File quarantined to: {os.path.basename(quarantine_path)}", 'info')
                             # --- ALERT EMAIL SYSTEM (pure Python) ---
-                            try:
-                                sender = os.environ.get('ALERT_MAIL_SENDER')
-                                recipient = os.environ.get('ALERT_MAIL_RECIPIENT')
-                                smtp_user = os.environ.get('ALERT_MAIL_USER')
-                                smtp_pass = os.environ.get('ALERT_MAIL_PASS')
-                                if not (sender and recipient and smtp_user and smtp_pass):
-                                    self.log_message('[ALERT ERROR] Email env vars missing (ALERT_MAIL_SENDER, ALERT_MAIL_RECIPIENT, ALERT_MAIL_USER, ALERT_MAIL_PASS)', 'error')
-                                else:
-                                    send_quarantine_alert(file_path, reasons, quarantine_path, sender, recipient, smtp_user, smtp_pass)
-                            except Exception as alert_exc:
-                                self.log_message(f"[ALERT ERROR] {alert_exc}", 'error')
+                            if self.alerts is None:
+                                self.log_message('[ALERT ERROR] Email env vars missing (ALERT_MAIL_SENDER, ALERT_MAIL_RECIPIENT, ALERT_MAIL_USER, ALERT_MAIL_PASS)', 'error')
+                            else:
+                                self.alerts.submit(file_path, reasons, quarantine_path)
                         else:
                             # Use original path if quarantine failed
                             self.window.after(0, lambda path=file_path: self.load_image_preview(path, is_safe=False))
@@ -685,7 +727,9 @@ class NSFWQuarantineApp:
                     for reason in reasons:
                         self.log_message(f'   → {reason}', 'info')
                 
-                # Scan complete
+                # Scan complete; send the pending alert digest now rather than after the interval
+                if self.alerts is not None:
+                    self.alerts.flush()
                 scan_result = f"Scan complete: {safe_files} safe, {flagged_files} quarantined"
                 self.log_message(scan_result, 'bold')
                 
@@ -705,11 +749,40 @@ class NSFWQuarantineApp:
                 # Re-enable controls
                 self.scanning = False
                 self.window.after(0, lambda: self.browse_btn.configure(state='normal'))
+                self.window.after(0, lambda: self.folder_btn.configure(state='normal'))
                 self.window.after(0, lambda: self.scan_btn.configure(state='normal' if self.selected_files else 'disabled'))
                 self.window.after(0, lambda: self.clear_btn.configure(state='normal' if self.selected_files else 'disabled'))
         
         Thread(target=scan_thread, daemon=True).start()
     
+    def rescan_selected(self, event=None):
+        """Rescan the double-clicked file ahead of any scan in progress."""
+        selection = self.file_list.curselection()
+        if not selection:
+            return
+        file_path = self.selected_files[selection[0]]
+        filename = os.path.basename(file_path)
+        if not os.path.exists(file_path):
+            self.log_message(f'File not found: {filename}', 'error')
+            return
+        self.log_message(f'Rescanning {filename}...', 'info')
+
+        def rescan_thread():
+            try:
+                is_flagged, reasons = self.scheduler.scan(file_path)
+            except Exception as e:
+                self.log_message(f'Error rescanning {filename}: {e}', 'error')
+                return
+            self.scan_results[file_path] = (is_flagged, reasons)
+            if is_flagged:
+                self.log_message(f'⚠️ {filename} - Flagged', 'warning')
+            else:
+                self.log_message(f'✅ {filename} - Safe', 'success')
+            for reason in reasons:
+                self.log_message(f'   → {reason}', 'info')
+
+        Thread(target=rescan_thread, daemon=True).start()
+
     def show_about(self):
         """Show about dialog with application information"""
         # About window
@@ -766,6 +839,12 @@ class NSFWQuarantineApp:
     def run(self):
         """Run the main application window."""
         self.window.mainloop()
+        self.scheduler.close()
+        # Commits the result cache and closes the blocklist and quarantine index
+        self.detector.close()
+        if self.alerts is not None:
+            # Deliver alerts still waiting for their digest before exiting
+            self.alerts.close(timeout=60)
 
 if __name__ == '__main__':
     app = NSFWQuarantineApp()
@@ -0,0 +1,148 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+_DCT_SIZE = 32
+_dct_matrix = None
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def dhash(img: Image.Image, hash_size: int = 8) -> int:
+    """Difference hash: sign of horizontal gradients on a (hash_size+1) x hash_size grayscale thumbnail."""
+    gray = img.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(gray.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def phash(img: Image.Image, hash_size: int = 8) -> int:
+    """
+    Perceptual hash: low-frequency DCT coefficients of a 32x32 grayscale
+    thumbnail compared against their median. Robust to resizing and re-encoding.
+    """
+    import numpy as np
+
+    global _dct_matrix
+    if _dct_matrix is None:
+        n = np.arange(_DCT_SIZE)
+        _dct_matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * _DCT_SIZE))
+    gray = img.convert('L').resize((_DCT_SIZE, _DCT_SIZE), Image.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.float64)
+    coefficients = _dct_matrix @ pixels @ _dct_matrix.T
+    low = coefficients[:hash_size, :hash_size].flatten()[1:]  # drop the DC term
+    bits = low > np.median(low)
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+HASH_FUNCTIONS = {'phash': phash, 'dhash': dhash}
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes with Hamming distance as the metric."""
+
+    def __init__(self):
+        self._root = None
+        self.size = 0
+
+    def add(self, key: int, value: Any):
+        node = [key, value, {}]
+        if self._root is None:
+            self._root = node
+            self.size = 1
+            return
+        current = self._root
+        while True:
+            distance = hamming(key, current[0])
+            if distance == 0:
+                current[1] = value
+                return
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                self.size += 1
+                return
+            current = child
+
+    def nearest(self, key: int, max_distance: int) -> Optional[Tuple[int, Any]]:
+        """Return (distance, value) of the closest key within max_distance, or None."""
+        if self._root is None:
+            return None
+        best = None
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= max_distance and (best is None or distance < best[0]):
+                best = (distance, node[1])
+                if distance == 0:
+                    break
+            limit = best[0] if best is not None else max_distance
+            # Triangle inequality: only children within [d - limit, d + limit] can be closer
+            for child_distance, child in node[2].items():
+                if distance - limit <= child_distance <= distance + limit:
+                    stack.append(child)
+        return best
+
+
+class PerceptualHashIndex:
+    """
+    Near-duplicate index of already-scored images. An image whose perceptual
+    hash lies within max_distance bits of a stored one inherits its verdict.
+    Thread-safe; keeps hit/miss counts and cumulative lookup time.
+    """
+
+    def __init__(self, max_distance: int = 4, algorithm: str = 'phash'):
+        if algorithm not in HASH_FUNCTIONS:
+            raise ValueError(f"Unknown perceptual hash '{algorithm}'. Choose from: {', '.join(HASH_FUNCTIONS)}")
+        self.max_distance = max_distance
+        self.algorithm = algorithm
+        self.hash_image = HASH_FUNCTIONS[algorithm]
+        self._tree = BKTree()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+
+    def lookup(self, image_hash: int) -> Optional[Tuple[int, Any]]:
+        """Return (distance, verdict) of the nearest scored image, or None."""
+        start = time.perf_counter()
+        with self._lock:
+            found = self._tree.nearest(image_hash, self.max_distance)
+            self.lookup_seconds += time.perf_counter() - start
+            if found is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return found
+
+    def add(self, image_hash: int, verdict: Any):
+        with self._lock:
+            self._tree.add(image_hash, verdict)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': self._tree.size,
+                'lookups': lookups,
+                'hits': self.hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'mean_lookup_us': self.lookup_seconds / lookups * 1e6 if lookups else 0.0,
+            }
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (f"{s['hits']}/{s['lookups']} near-duplicate hits ({s['hit_rate']:.1%}), "
+                f"{s['entries']} indexed, mean lookup {s['mean_lookup_us']:.1f} us")
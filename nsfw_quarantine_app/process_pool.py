@@ -0,0 +1,180 @@
+import logging
+import multiprocessing
+import os
+import queue
+from collections import deque
+from typing import Iterable, Iterator, List, Tuple
+
+from decode_pipeline import DecodePipeline
+
+# Objects a forked worker inherits but must never close (the parent still uses them)
+_inherited = []
+
+
+def fork_available() -> bool:
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def _scan_worker(detector, tasks, results, torch_threads: int, batch_size: int):
+    """Worker loop: scan chunks of paths with the inherited detector until the None sentinel."""
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    # The parent answers blocklist, cache and prefilter lookups and writes the cache;
+    # the SQLite connection and the blocklist map are not safe to use after fork
+    _inherited.extend([detector.result_cache, detector.blocklist])
+    detector.result_cache = None
+    detector.blocklist = None
+    detector.prefilter = None
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        chunk_id, paths = task
+        try:
+            results.put((chunk_id, list(detector.iter_scan(paths, batch_size=batch_size)), None))
+        except Exception as e:
+            results.put((chunk_id, None, f"{type(e).__name__}: {e}"))
+
+
+class ProcessScanner:
+    """
+    Scan with a pool of forked worker processes that share the detector's model
+    weights copy-on-write.
+
+    The models are loaded in the parent before forking. Each worker limits torch
+    to torch_threads intra-op threads so the pool does not oversubscribe the
+    cores, and pulls chunks of files from one shared queue, so fast workers
+    simply take more chunks. The parent does the blocklist, cache and prefilter
+    lookups on prescan_workers threads (hashing every file is I/O and hashlib
+    work that releases the GIL), stores new results in the cache and yields
+    results in input order, so quarantining, alerts and checkpoint journals stay
+    in the caller.
+    Requires the fork start method (Linux, macOS).
+    """
+
+    def __init__(self, detector, processes: int = None, torch_threads: int = None,
+                 chunk_size: int = 16, decode_workers: int = 1, max_inflight: int = None,
+                 prescan_workers: int = None):
+        if not fork_available():
+            raise RuntimeError("Multi-process scanning needs the fork start method, which this platform lacks")
+        cpus = os.cpu_count() or 1
+        self.detector = detector
+        self.processes = max(1, processes or cpus)
+        self.torch_threads = max(1, torch_threads or cpus // self.processes)
+        self.chunk_size = max(1, chunk_size)
+        self.decode_workers = decode_workers
+        # Chunks submitted ahead of the oldest unfinished one; bounds buffered results
+        self.max_inflight = max_inflight or self.processes * 4
+        self.prescan_workers = max(1, prescan_workers or min(8, cpus))
+
+    def iter_scan(self, file_paths: Iterable[str], batch_size: int = 16,
+                  modalities: Iterable[str] = ('image', 'text')) -> Iterator[Tuple[str, Tuple[bool, List[str]]]]:
+        """Yield (file_path, (is_flagged, reasons)) in input order, like ContentDetector.iter_scan."""
+        detector = self.detector
+        # Load the weights once, before forking, so every worker shares them
+        detector.warm_up(modalities)
+        decode_workers = detector.decode_workers
+        detector.decode_workers = self.decode_workers
+
+        ctx = multiprocessing.get_context('fork')
+        tasks = ctx.Queue()
+        results = ctx.Queue()
+        workers = [
+            ctx.Process(target=_scan_worker, args=(detector, tasks, results, self.torch_threads, batch_size),
+                        name=f'scan-worker-{i}', daemon=True)
+            for i in range(self.processes)
+        ]
+        try:
+            for worker in workers:
+                worker.start()
+        finally:
+            detector.decode_workers = decode_workers
+        logging.info(f"Started {self.processes} scan workers with {self.torch_threads} torch threads each")
+
+        # Chunks in input order: [chunk_id, [(path, known result or None)], {path: result} or None]
+        chunks = deque()
+        inflight = 0
+        next_id = 0
+        # Started only now, after the fork, so no worker inherits the pool's threads
+        prescan = DecodePipeline(detector._prescan, workers=self.prescan_workers,
+                                 queue_depth=self.prescan_workers * 4)
+        prescanned = prescan.imap(file_paths)
+        try:
+            entries = []
+            uncached = 0
+            for file_path, result, error in prescanned:
+                if error is not None:
+                    logging.warning(f"Prescan failed for {file_path}: {error}")
+                entries.append((file_path, result))
+                if result is None:
+                    uncached += 1
+                if uncached >= self.chunk_size or len(entries) >= self.chunk_size * 8:
+                    inflight += self._submit(tasks, chunks, next_id, entries)
+                    next_id += 1
+                    entries = []
+                    uncached = 0
+                    while inflight >= self.max_inflight:
+                        inflight -= self._receive(results, chunks, workers)
+                        yield from self._drain(chunks)
+                    yield from self._drain(chunks)
+            if entries:
+                inflight += self._submit(tasks, chunks, next_id, entries)
+            while chunks:
+                yield from self._drain(chunks)
+                if chunks:
+                    inflight -= self._receive(results, chunks, workers)
+        finally:
+            prescanned.close()
+            for _ in workers:
+                tasks.put(None)
+            for worker in workers:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
+                    worker.join()
+            tasks.close()
+            results.close()
+
+    def _submit(self, tasks, chunks, chunk_id: int, entries) -> int:
+        """Queue the files of a chunk that still need the models; returns 1 if work was queued."""
+        paths = [path for path, result in entries if result is None]
+        chunks.append([chunk_id, entries, None if paths else {}])
+        if not paths:
+            return 0
+        tasks.put((chunk_id, paths))
+        return 1
+
+    def _receive(self, results, chunks, workers) -> int:
+        """Wait for one finished chunk, store its results in the cache and attach them to the chunk."""
+        while True:
+            try:
+                chunk_id, scanned, error = results.get(timeout=1.0)
+                break
+            except queue.Empty:
+                dead = [w for w in workers if not w.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Scan worker {dead[0].name} exited unexpectedly (exit code {dead[0].exitcode})")
+        for chunk in chunks:
+            if chunk[0] == chunk_id:
+                break
+        else:
+            return 1
+        if error is not None:
+            logging.error(f"Scan worker failed on a chunk: {error}")
+            chunk[2] = {path: (False, [f"Error scanning file: {error}"]) for path, result in chunk[1] if result is None}
+        else:
+            chunk[2] = dict(scanned)
+            for file_path, result in scanned:
+                self.detector._cache_store(file_path, result)
+        return 1
+
+    @staticmethod
+    def _drain(chunks) -> Iterator[Tuple[str, Tuple[bool, List[str]]]]:
+        """Yield results of the finished chunks at the front of the queue."""
+        while chunks and chunks[0][2] is not None:
+            _, entries, scanned = chunks.popleft()
+            for file_path, result in entries:
+                yield file_path, result if result is not None else scanned[file_path]
@@ -0,0 +1,354 @@
+import importlib.util
+import json
+import os
+import threading
+from collections import deque
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Characters each wordlist character may be written as, as in better_profanity's
+# CHARS_MAPPING ("f*ck", "$h1t"); other characters only match themselves
+CHARS_MAPPING = {
+    'a': ('a', '@', '*', '4'),
+    'i': ('i', '*', 'l', '1'),
+    'o': ('o', '*', '0', '@'),
+    'u': ('u', '*', 'v'),
+    'v': ('v', '*', 'u'),
+    'l': ('l', '1'),
+    'e': ('e', '*', '3'),
+    's': ('s', '$', '5'),
+    't': ('t', '7'),
+}
+# Word characters besides letters and digits; everything else separates words
+_WORD_PUNCTUATION = '@$*\'"'
+
+
+def _lookalike_groups(mapping) -> dict:
+    """Map every character linked through the mapping onto one representative of its group."""
+    groups = {}
+    for ch, alternatives in mapping.items():
+        members = {ch, *alternatives}
+        for member in list(members):
+            members |= groups.get(member, set())
+        for member in members:
+            groups[member] = members
+    return {member: min(members) for member, members in groups.items()}
+
+
+# The automaton runs on these groups, so one pass finds every candidate; a
+# candidate is then checked character by character against its wordlist entry
+_FOLD = _lookalike_groups(CHARS_MAPPING)
+
+# ASCII character -> automaton symbol, None for separators
+_ASCII_FOLD = {}
+for _code in range(128):
+    _ch = chr(_code)
+    if _ch.isalnum() or _ch in _WORD_PUNCTUATION:
+        _ASCII_FOLD[_ch] = _FOLD.get(_ch.lower(), _ch.lower())
+    else:
+        _ASCII_FOLD[_ch] = None
+
+_unicode_letters = None
+
+
+def _is_unicode_letter(ch: str) -> bool:
+    """Non-ASCII word characters: better_profanity's alphabet when it is installed, else str.isalpha()."""
+    global _unicode_letters
+    if _unicode_letters is None:
+        letters = frozenset()
+        spec = importlib.util.find_spec('better_profanity')
+        if spec is not None and spec.origin is not None:
+            try:
+                with open(os.path.join(os.path.dirname(spec.origin), 'alphabetic_unicode.json'), encoding='utf-8') as f:
+                    letters = frozenset(json.load(f))
+            except (OSError, ValueError):
+                pass
+        _unicode_letters = letters
+    return ch in _unicode_letters if _unicode_letters else ch.isalpha()
+
+
+def _fold(ch: str) -> Optional[str]:
+    """The automaton symbol for a character, None for separators."""
+    if ch in _ASCII_FOLD:
+        return _ASCII_FOLD[ch]
+    if not _is_unicode_letter(ch):
+        return None
+    low = ch.lower()
+    return _FOLD.get(low, low)
+
+
+def _compile_entry(word: str) -> Optional[Tuple[str, dict]]:
+    """
+    (the entry's word characters, {position: separator run before it}) for a
+    lowercased wordlist entry. "blow job" is ('blowjob', {4: ' '}). Entries that
+    start or end with a separator can never match a run of whole words, so None.
+    """
+    chars = []
+    joins = {}
+    separator = []
+    for ch in word:
+        if _fold(ch) is None:
+            separator.append(ch)
+            continue
+        if separator:
+            if not chars:
+                return None
+            joins[len(chars)] = ''.join(separator)
+            separator = []
+        chars.append(ch)
+    if separator or not chars:
+        return None
+    return ''.join(chars), joins
+
+
+def default_wordlist_path() -> str:
+    """Path of the wordlist shipped with better_profanity."""
+    spec = importlib.util.find_spec('better_profanity')
+    if spec is None or spec.origin is None:
+        raise ImportError("better_profanity is not installed; pass an explicit wordlist path")
+    return os.path.join(os.path.dirname(spec.origin), 'profanity_wordlist.txt')
+
+
+class ProfanityMatcher:
+    """
+    Aho-Corasick automaton over a profanity wordlist, matching the way
+    better_profanity does.
+
+    Text is split into words (letters, digits and @$*'"). A wordlist entry
+    matches one word, several consecutive words written together ("f u c k"
+    for "fuck") or, for entries such as "blow job", the words with exactly the
+    entry's separators between them; each entry character may be written as
+    any of its CHARS_MAPPING look-alikes. Compiled once, it finds every match
+    in a single linear pass and reports (start, end) character offsets. Use
+    scanner() to match across the chunks of a stream.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        # (word characters, {position: separator before it}) per compiled entry
+        self._entries = []
+        self.max_length = 0
+        # Longest separator run inside an entry
+        self.max_join = 0
+        # Words after the first one that a match may span; better_profanity looks
+        # ahead as many words as the most separator characters in any entry
+        max_separators = 1
+        seen = set()
+        for word in words:
+            word = word.strip().lower()
+            if not word or word in seen:
+                continue
+            seen.add(word)
+            max_separators = max(max_separators, sum(1 for ch in word if _fold(ch) is None))
+            entry = _compile_entry(word)
+            if entry is None:
+                continue
+            self._add(entry)
+        self.max_following_words = max_separators
+        self.pattern_count = len(self._entries)
+        self._build_failure_links()
+
+    @classmethod
+    def from_wordlist(cls, path: Optional[str] = None) -> 'ProfanityMatcher':
+        with open(path or default_wordlist_path(), 'r', encoding='utf-8') as f:
+            return cls(line for line in f if line.strip())
+
+    def find_all(self, text: str) -> List[Tuple[int, int]]:
+        """All (start, end) character offsets of profane words/phrases in text."""
+        scanner = self.scanner()
+        matches = list(scanner.feed(text))
+        matches.extend(scanner.finish())
+        return matches
+
+    def contains(self, text: str) -> bool:
+        """True as soon as the first match is confirmed."""
+        scanner = self.scanner()
+        for _ in scanner.feed(text):
+            return True
+        return any(True for _ in scanner.finish())
+
+    def scanner(self) -> 'ProfanityScanner':
+        return ProfanityScanner(self)
+
+    @staticmethod
+    def censor(text: str, matches: Iterable[Tuple[int, int]], censor_char: str = '*',
+               limit: Optional[int] = None) -> str:
+        """
+        Replace each matched span with four censor characters (as better_profanity does).
+        With limit, stop building once the output is that long.
+        """
+        out = []
+        length = 0
+        pos = 0
+        for start, end in sorted(matches):
+            if end <= pos:
+                continue
+            start = max(start, pos)
+            out.append(text[pos:start])
+            out.append(censor_char * 4)
+            length += start - pos + 4
+            pos = end
+            if limit is not None and length >= limit:
+                return ''.join(out)[:limit]
+        out.append(text[pos:] if limit is None else text[pos:pos + max(0, limit - length)])
+        result = ''.join(out)
+        return result if limit is None else result[:limit]
+
+    def _add(self, entry: Tuple[str, dict]):
+        chars, joins = entry
+        state = 0
+        for ch in chars:
+            c = _fold(ch)
+            nxt = self._goto[state].get(c)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][c] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + (len(self._entries),)
+        self._entries.append(entry)
+        self.max_length = max(self.max_length, len(chars))
+        self.max_join = max([self.max_join] + [len(separator) for separator in joins.values()])
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and c not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(c, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                if self._out[self._fail[nxt]]:
+                    self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+
+def _entry_matches(entry: Tuple[str, dict], recent) -> bool:
+    """Whether the last len(chars) word characters in recent spell the entry exactly."""
+    chars, joins = entry
+    length = len(chars)
+    for k in range(length):
+        ch, _, _, separator = recent[k - length]
+        expected = chars[k]
+        if ch != expected and ch not in CHARS_MAPPING.get(expected, ()):
+            return False
+        if joins and k:
+            # Phrase entries need their own separators at their own word boundaries
+            if separator != joins.get(k):
+                return False
+    return True
+
+
+class ProfanityScanner:
+    """
+    Incremental matcher state. feed() accepts consecutive pieces of one text
+    (with their starting offset) and yields (start, end) offsets of confirmed
+    matches; a match is confirmed once the character after it is known to end
+    the word, so call finish() after the last piece.
+    """
+
+    def __init__(self, matcher: ProfanityMatcher):
+        self._goto = matcher._goto
+        self._fail = matcher._fail
+        self._out = matcher._out
+        self._entries = matcher._entries
+        self._max_following = matcher.max_following_words
+        self._max_join = matcher.max_join
+        self._state = 0
+        # (lowercased char, original offset, word number, separator run before it or
+        # None inside a word) of the last word characters; separators are skipped
+        self._recent = deque(maxlen=matcher.max_length)
+        # (start, end, spans several words) of matches waiting for their word to end
+        self._pending = []
+        self._separator = []
+        self._in_word = False
+        self._words = 0
+        self._word_length = 0
+        self._position = 0
+
+    def feed(self, text: str, offset: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        if offset is not None:
+            self._position = offset
+        goto, fail, out, recent, entries = self._goto, self._fail, self._out, self._recent, self._entries
+        fold = _ASCII_FOLD.get
+        state = self._state
+        pending = self._pending
+        separator = self._separator
+        in_word = self._in_word
+        words = self._words
+        word_length = self._word_length
+        max_following = self._max_following
+        base = self._position
+        for i, ch in enumerate(text):
+            c = fold(ch, False)
+            if c is False:
+                c = _fold(ch)
+            if c is None:
+                if in_word:
+                    in_word = False
+                    if pending:
+                        for start, end, _ in pending:
+                            yield start, end
+                        pending = []
+                if len(separator) <= self._max_join:
+                    separator.append(ch.lower())
+                continue
+            if in_word:
+                boundary = None
+                word_length += 1
+                if pending:
+                    # The word continues, so the pending matches were only prefixes of it
+                    pending = []
+            else:
+                boundary = ''.join(separator)
+                separator = []
+                in_word = True
+                words += 1
+                word_length = 1
+            recent.append((ch.lower(), base + i, words, boundary))
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            for index in out[state]:
+                entry = entries[index]
+                first = recent[-len(entry[0])]
+                # Whole words only, and no further than better_profanity looks ahead
+                if first[3] is None or words - first[2] > max_following:
+                    continue
+                if _entry_matches(entry, recent):
+                    pending.append((first[1], base + i + 1, words > first[2]))
+        self._state = state
+        self._pending = pending
+        self._separator = separator
+        self._in_word = in_word
+        self._words = words
+        self._word_length = word_length
+        self._position = base + len(text)
+
+    def finish(self) -> List[Tuple[int, int]]:
+        """End of input: confirm matches that run up to the last character."""
+        pending, self._pending = self._pending, []
+        if self._word_length == 1:
+            # better_profanity never looks ahead to a one-character word at the very
+            # end of the text ("f u c k" is clean, "f u c k." is not)
+            pending = [match for match in pending if not match[2] and self._words > 1]
+        return [(start, end) for start, end, _ in pending]
+
+
+_default_matcher = None
+_default_lock = threading.Lock()
+
+
+def get_default_matcher() -> ProfanityMatcher:
+    """The process-wide matcher over better_profanity's wordlist, compiled on first use."""
+    global _default_matcher
+    if _default_matcher is None:
+        with _default_lock:
+            if _default_matcher is None:
+                _default_matcher = ProfanityMatcher.from_wordlist()
+    return _default_matcher
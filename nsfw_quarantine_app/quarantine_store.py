@@ -0,0 +1,135 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Callable, Optional, Tuple
+
+from result_cache import file_sha256
+from transfer import MODES, transfer
+
+
+class QuarantineStore:
+    """
+    Content-addressed quarantine directory.
+
+    Each distinct content is stored once per file type as
+    objects/<h[:2]>/<h[2:4]>/<sha256><ext>, so the destination is computed in
+    O(1), never collides and keeps the suffix previews and viewers rely on. Objects are transferred (reflink, hard link, rename or in-kernel
+    copy where possible, see transfer.py) to a temporary name and renamed into
+    place, so a reader never sees a partial file and concurrent quarantines of
+    the same content simply race to publish identical bytes. Copies are named by
+    the hash of the bytes actually stored. A SQLite index maps every quarantined
+    original path to its object and extension and survives restarts.
+    """
+
+    def __init__(self, root: str, hash_fn: Callable[[str], str] = file_sha256, mode: str = 'copy'):
+        if mode not in MODES:
+            raise ValueError(f"Unknown quarantine mode '{mode}'. Choose from: {', '.join(MODES)}")
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.hash_fn = hash_fn
+        self.mode = mode
+        # Objects stored per transfer method (reflink, copy_file_range, ...)
+        self.transfers = Counter()
+        self._lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, 'index.sqlite'), check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS quarantined ('
+            'original_path TEXT PRIMARY KEY, sha256 TEXT, object_path TEXT, size INTEGER, quarantined_at REAL)'
+        )
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(quarantined)')}
+        if 'ext' not in columns:
+            # Indexes written before the extension was recorded
+            self._conn.execute('ALTER TABLE quarantined ADD COLUMN ext TEXT')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS quarantined_sha256 ON quarantined(sha256)')
+        self._conn.commit()
+
+    def object_path(self, sha256: str, ext: str = '') -> str:
+        return os.path.join(self.objects_dir, sha256[:2], sha256[2:4], sha256 + ext.lower())
+
+    def put(self, file_path: str, mode: str = None) -> Tuple[str, str, bool]:
+        """
+        Quarantine file_path with the given transfer mode ('copy', 'link' or 'move';
+        default: the store's mode). Returns (object path, sha256, stored), where
+        stored is False when the content was already in the store.
+
+        Copies are hashed after the transfer, so a file modified while it is being
+        quarantined is still stored under the digest of what was copied. A hard
+        link or rename shares the original's inode (see transfer.py), so those are
+        named by hash_fn and deduplicated before anything is transferred.
+        """
+        mode = mode or self.mode
+        ext = os.path.splitext(file_path)[1]
+        sha256 = None
+        if mode in ('link', 'move'):
+            sha256 = self.hash_fn(file_path)
+            dest_path = self.object_path(sha256, ext)
+            if os.path.exists(dest_path):
+                if mode == 'move':
+                    os.remove(file_path)
+                self._record(file_path, sha256, dest_path)
+                return dest_path, sha256, False
+        os.makedirs(self.objects_dir, exist_ok=True)
+        tmp_path = os.path.join(self.objects_dir, f'.incoming-{uuid.uuid4().hex}')
+        try:
+            method = transfer(file_path, tmp_path, mode)
+            if method not in ('hardlink', 'rename'):
+                # Name the object after the bytes that were actually stored
+                sha256 = file_sha256(tmp_path)
+            dest_path = self.object_path(sha256, ext)
+            stored = not os.path.exists(dest_path)
+            if stored:
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                os.replace(tmp_path, dest_path)
+            else:
+                os.remove(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if stored:
+            with self._lock:
+                self.transfers[method] += 1
+            logging.info(f"Stored quarantined content {sha256[:12]} from {file_path} ({method})")
+        self._record(file_path, sha256, dest_path)
+        return dest_path, sha256, stored
+
+    def get(self, original_path: str) -> Optional[str]:
+        """Object path of a quarantined original path, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT object_path FROM quarantined WHERE original_path = ?', (os.path.abspath(original_path),)
+            ).fetchone()
+        if row is None:
+            return None
+        path = os.path.join(self.root, row[0])
+        return path if os.path.exists(path) else None
+
+    def __contains__(self, original_path: str) -> bool:
+        return self.get(original_path) is not None
+
+    def count(self) -> Tuple[int, int]:
+        """(quarantined paths, distinct stored objects)."""
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*), COUNT(DISTINCT sha256) FROM quarantined').fetchone()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _record(self, file_path: str, sha256: str, dest_path: str):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO quarantined (original_path, sha256, object_path, size, quarantined_at, ext) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (os.path.abspath(file_path), sha256, os.path.relpath(dest_path, self.root),
+                 os.path.getsize(dest_path), time.time(), os.path.splitext(file_path)[1].lower()),
+            )
+            self._conn.commit()
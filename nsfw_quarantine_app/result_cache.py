@@ -0,0 +1,219 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Bytes counted per remembered file hash besides its path (digest, size and mtime)
+HASH_ROW_BYTES = 88
+
+
+def file_sha256(file_path: str) -> str:
+    """Hash a file's contents in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Persistent SQLite cache of scan results keyed by file content.
+
+    Results are stored under sha256(content) + a detector fingerprint (model IDs
+    and thresholds), so changing a model or threshold never returns stale verdicts.
+    Content hashes are remembered per (path, size, mtime) so unchanged files are
+    not re-hashed. When results and remembered hashes together exceed `max_bytes`
+    the least recently used results are evicted, along with the hashes no
+    remaining result refers to.
+    """
+
+    COMMIT_EVERY = 64
+    # Seconds a write may stay uncommitted, so a crash loses at most this much
+    COMMIT_INTERVAL = 5.0
+
+    def __init__(self, db_path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        self._commit_timer = None
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        if not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS file_hashes ('
+            'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, is_flagged INTEGER, reasons TEXT, nbytes INTEGER, last_used REAL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS file_hashes_sha256 ON file_hashes(sha256)')
+        self._conn.commit()
+        self._total_bytes = self._stored_bytes()
+
+    def content_hash(self, file_path: str) -> str:
+        """Return the file's sha256, skipping the read when (path, size, mtime) is unchanged."""
+        st = os.stat(file_path)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT size, mtime_ns, sha256 FROM file_hashes WHERE path = ?', (file_path,)
+            ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+        sha = file_sha256(file_path)
+        with self._lock:
+            known = self._conn.execute('SELECT 1 FROM file_hashes WHERE path = ?', (file_path,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)',
+                (file_path, st.st_size, st.st_mtime_ns, sha),
+            )
+            if not known:
+                self._total_bytes += len(file_path) + HASH_ROW_BYTES
+                if self._total_bytes > self.max_bytes:
+                    self._evict()
+            self._maybe_commit()
+        return sha
+
+    def get(self, file_path: str, fingerprint: str) -> Optional[Tuple[bool, List[str]]]:
+        """Return the cached (is_flagged, reasons) for this file, or None."""
+        return self._get(self._key(file_path, fingerprint))
+
+    def get_digest(self, sha256: str, ext: str, fingerprint: str) -> Optional[Tuple[bool, List[str]]]:
+        """Like get, for in-memory content already hashed; shares entries with files of the same type."""
+        return self._get(f"{sha256}:{ext}:{fingerprint}")
+
+    def _get(self, key: str) -> Optional[Tuple[bool, List[str]]]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT is_flagged, reasons FROM results WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+            self._maybe_commit()
+        return bool(row[0]), json.loads(row[1])
+
+    def put(self, file_path: str, fingerprint: str, result: Tuple[bool, List[str]]):
+        """Store a scan result for this file's current content."""
+        self._put(self._key(file_path, fingerprint), result)
+
+    def put_digest(self, sha256: str, ext: str, fingerprint: str, result: Tuple[bool, List[str]]):
+        """Store a scan result for in-memory content."""
+        self._put(f"{sha256}:{ext}:{fingerprint}", result)
+
+    def _put(self, key: str, result: Tuple[bool, List[str]]):
+        reasons = json.dumps(list(result[1]))
+        nbytes = len(key) + len(reasons) + 16
+        with self._lock:
+            old = self._conn.execute('SELECT nbytes FROM results WHERE key = ?', (key,)).fetchone()
+            if old:
+                self._total_bytes -= old[0]
+            self._conn.execute(
+                'INSERT OR REPLACE INTO results (key, is_flagged, reasons, nbytes, last_used) VALUES (?, ?, ?, ?, ?)',
+                (key, int(bool(result[0])), reasons, nbytes, time.time()),
+            )
+            self._total_bytes += nbytes
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._maybe_commit()
+
+    def close(self):
+        """Flush pending writes and close the database."""
+        with self._lock:
+            if self._commit_timer is not None:
+                self._commit_timer.cancel()
+                self._commit_timer = None
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+    def _key(self, file_path: str, fingerprint: str) -> str:
+        ext = os.path.splitext(file_path)[1].lower()
+        return f"{self.content_hash(file_path)}:{ext}:{fingerprint}"
+
+    def _stored_bytes(self) -> int:
+        results = self._conn.execute('SELECT COALESCE(SUM(nbytes), 0) FROM results').fetchone()[0]
+        count, path_chars = self._conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(path)), 0) FROM file_hashes'
+        ).fetchone()
+        return results + path_chars + count * HASH_ROW_BYTES
+
+    def _evict(self):
+        """Drop least recently used results until the cache is back under 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        forgotten = self._drop_orphan_hashes()
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                'SELECT key, nbytes FROM results ORDER BY last_used LIMIT 256'
+            ).fetchall()
+            if not rows:
+                self._total_bytes = self._stored_bytes()
+                break
+            self._conn.executemany('DELETE FROM results WHERE key = ?', [(r[0],) for r in rows])
+            self._total_bytes -= sum(r[1] for r in rows)
+            evicted += len(rows)
+            forgotten += self._drop_orphan_hashes({r[0].split(':', 1)[0] for r in rows})
+        logging.info(f"Result cache evicted {evicted} entries and {forgotten} file hashes "
+                     f"({self._total_bytes} bytes retained)")
+
+    def _drop_orphan_hashes(self, sha256s=None) -> int:
+        """
+        Forget remembered file hashes that no cached result refers to (only among
+        sha256s when given); a file whose result is gone is re-read anyway.
+        Returns the number of hashes dropped.
+        """
+        where = ("NOT EXISTS (SELECT 1 FROM results WHERE key >= file_hashes.sha256 || ':' "
+                 "AND key < file_hashes.sha256 || ';')")
+        params = ()
+        if sha256s is not None:
+            if not sha256s:
+                return 0
+            params = tuple(sha256s)
+            where += f" AND sha256 IN ({','.join('?' * len(params))})"
+        count, path_chars = self._conn.execute(
+            f'SELECT COUNT(*), COALESCE(SUM(LENGTH(path)), 0) FROM file_hashes WHERE {where}', params
+        ).fetchone()
+        if count:
+            self._conn.execute(f'DELETE FROM file_hashes WHERE {where}', params)
+            self._total_bytes -= path_chars + count * HASH_ROW_BYTES
+        return count
+
+    def _maybe_commit(self):
+        """Commit every COMMIT_EVERY writes, and at the latest COMMIT_INTERVAL seconds after the first pending one."""
+        self._uncommitted += 1
+        if self._uncommitted >= self.COMMIT_EVERY:
+            self._commit()
+        elif self._commit_timer is None:
+            self._commit_timer = threading.Timer(self.COMMIT_INTERVAL, self._commit_pending)
+            self._commit_timer.daemon = True
+            self._commit_timer.start()
+
+    def _commit(self):
+        self._conn.commit()
+        self._uncommitted = 0
+        if self._commit_timer is not None:
+            self._commit_timer.cancel()
+            self._commit_timer = None
+
+    def _commit_pending(self):
+        with self._lock:
+            self._commit_timer = None
+            if self._conn is not None and self._uncommitted:
+                self._commit()
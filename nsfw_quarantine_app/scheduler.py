@@ -0,0 +1,287 @@
+"""
+Priority scheduling of scans across per-modality lanes.
+
+Files are routed to a lane by type (image, text, video, audio), so a long video
+or a multi-gigabyte log never sits in front of thousands of small images. Each
+lane has its own worker threads and a heap of queued files ordered by
+
+    (job priority, size, submission order)
+
+so an interactive rescan (PRIORITY_INTERACTIVE) is picked before everything a
+bulk crawl (PRIORITY_BULK) has queued, and within a priority the smallest files
+go first (order='size', shortest job first) or files keep their submission
+order (order='fifo'). A job is read from its iterable as the lanes drain, with
+at most `window` of its files queued at a time, so a crawl generator streams
+in flat memory and smallest-first applies within that window. Lane workers feed their queue into
+ContentDetector.iter_scan, so batching, the decode pool and the result cache
+work exactly as for a plain scan; a newly submitted file waits at most for the
+images already decoded ahead of the model.
+"""
+import heapq
+import itertools
+import logging
+import os
+import queue
+import threading
+from collections import Counter, deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from detector import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, AUDIO_EXTENSIONS
+
+LANES = ('image', 'text', 'video', 'audio')
+ORDERS = ('size', 'fifo')
+# Lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+# Worker threads per lane
+DEFAULT_WORKERS = {'image': 1, 'text': 1, 'video': 1, 'audio': 1}
+# Files of one job queued in the lanes at a time
+DEFAULT_WINDOW = 1024
+
+
+def lane_of(file_path: str) -> str:
+    """The lane scanning file_path; text and unsupported files share the cheap text lane."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        return 'image'
+    if ext in VIDEO_EXTENSIONS:
+        return 'video'
+    if ext in AUDIO_EXTENSIONS:
+        return 'audio'
+    return 'text'
+
+
+class ScanJob:
+    """A group of submitted files; results arrive in completion order."""
+
+    def __init__(self, job_id: int, priority: int, on_cancel: Optional[Callable[[], None]] = None):
+        self.id = job_id
+        self.priority = priority
+        self._on_cancel = on_cancel
+        # Files read from the job's iterable so far; final once all are read
+        self.total = 0
+        self.completed = 0
+        self.cancelled = False
+        # Files in the lane heaps, not yet handed to a detector
+        self.queued = 0
+        self._all_read = False
+        self._results = queue.Queue()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def results(self) -> Iterator[Tuple[str, Tuple[bool, List[str]]]]:
+        """Yield (file_path, (is_flagged, reasons)) as files finish, until all are done or the job is cancelled."""
+        while True:
+            item = self._results.get()
+            if item is None:
+                return
+            yield item
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until every file is scanned or the job is cancelled; False on timeout."""
+        return self._done.wait(timeout)
+
+    def cancel(self):
+        """Drop the job's queued and unread files; files already on a model finish but are not reported."""
+        with self._lock:
+            if self._done.is_set():
+                return
+            self.cancelled = True
+            self._done.set()
+        self._results.put(None)
+        if self._on_cancel is not None:
+            self._on_cancel()
+
+    def _deliver(self, file_path: str, result: Tuple[bool, List[str]]):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.completed += 1
+            self._results.put((file_path, result))
+            self._check_done()
+
+    def _read_all(self):
+        """The iterable is exhausted; total is final."""
+        with self._lock:
+            self._all_read = True
+            if not self.cancelled:
+                self._check_done()
+
+    def _check_done(self):
+        if self._all_read and self.completed >= self.total and not self._done.is_set():
+            self._done.set()
+            self._results.put(None)
+
+
+class ScanScheduler:
+    """
+    Scan files submitted as prioritized jobs on per-modality worker lanes.
+
+    workers: threads per lane, e.g. {'image': 2} (missing lanes use DEFAULT_WORKERS)
+    batch_size: batch size each lane passes to ContentDetector.iter_scan
+    order: 'size' (smallest file first within a priority) or 'fifo'
+    size_fn: cost of a file for order='size'
+    window: files of one job queued at a time; order='size' sorts within it
+    """
+
+    def __init__(self, detector, workers: Optional[Dict[str, int]] = None, batch_size: int = 16,
+                 order: str = 'size', size_fn: Callable[[str], int] = os.path.getsize,
+                 window: int = DEFAULT_WINDOW):
+        if order not in ORDERS:
+            raise ValueError(f"Unknown scan order '{order}'. Choose from: {', '.join(ORDERS)}")
+        workers = dict(DEFAULT_WORKERS, **(workers or {}))
+        unknown = set(workers) - set(LANES)
+        if unknown:
+            raise ValueError(f"Unknown scan lane: {', '.join(sorted(unknown))}")
+        self.detector = detector
+        self.batch_size = max(1, int(batch_size))
+        self.order = order
+        self.size_fn = size_fn
+        self.window = max(1, int(window))
+        # Files scanned per lane
+        self.completed = Counter()
+        self._heaps = {lane: [] for lane in LANES}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._job_ids = itertools.count(1)
+        self._closed = False
+        # Jobs still reading their iterable
+        self._reading = set()
+        self._threads = []
+        for lane in LANES:
+            for i in range(max(0, workers[lane])):
+                thread = threading.Thread(target=self._run_lane, args=(lane,), name=f'scan-{lane}-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, file_paths: Iterable[str], priority: int = PRIORITY_BULK) -> ScanJob:
+        """
+        Queue files as one job; lower priority values are scanned first. A list or
+        tuple that fits in the window is queued at once, anything else is read by a
+        feeder thread as the lanes make room.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Scan scheduler is closed")
+        job = ScanJob(next(self._job_ids), priority, on_cancel=self._wake)
+        if isinstance(file_paths, (list, tuple)) and len(file_paths) <= self.window:
+            self._feed(job, file_paths)
+        else:
+            with self._cond:
+                self._reading.add(job)
+            threading.Thread(target=self._feed, args=(job, file_paths), name=f'scan-feed-{job.id}',
+                             daemon=True).start()
+        return job
+
+    def scan(self, file_path: str, priority: int = PRIORITY_INTERACTIVE) -> Tuple[bool, List[str]]:
+        """Scan one file ahead of queued bulk work and return (is_flagged, reasons)."""
+        for _, result in self.submit([file_path], priority).results():
+            return result
+        raise RuntimeError("Scan scheduler was closed before the file was scanned")
+
+    def iter_scan(self, file_paths: Iterable[str],
+                  priority: int = PRIORITY_BULK) -> Iterator[Tuple[str, Tuple[bool, List[str]]]]:
+        """
+        Like ContentDetector.iter_scan, but yield results in completion order. The
+        lanes are shared by every job, so they batch with the scheduler's batch_size.
+        Stopping early cancels the job.
+        """
+        job = self.submit(file_paths, priority)
+        try:
+            yield from job.results()
+        finally:
+            job.cancel()
+
+    def pending(self) -> Dict[str, int]:
+        """Queued (not yet started) files per lane."""
+        with self._cond:
+            return {lane: len(heap) for lane, heap in self._heaps.items()}
+
+    def close(self, timeout: float = 5.0):
+        """Stop the lanes; queued files are dropped and their jobs cancelled."""
+        with self._cond:
+            self._closed = True
+            jobs = {entry[3] for heap in self._heaps.values() for entry in heap} | self._reading
+            for heap in self._heaps.values():
+                heap.clear()
+            self._cond.notify_all()
+        for job in jobs:
+            job.cancel()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _feed(self, job: ScanJob, file_paths: Iterable[str]):
+        """Move files from the iterable into the lane heaps, keeping at most `window` of them queued."""
+        try:
+            for file_path in file_paths:
+                cost = 0
+                if self.order == 'size':
+                    try:
+                        cost = self.size_fn(file_path)
+                    except OSError:
+                        pass
+                with self._cond:
+                    while job.queued >= self.window and not job.cancelled and not self._closed:
+                        self._cond.wait()
+                    if job.cancelled or self._closed:
+                        return
+                    with job._lock:
+                        job.total += 1
+                    job.queued += 1
+                    entry = (job.priority, cost, next(self._seq), job, file_path)
+                    heapq.heappush(self._heaps[lane_of(file_path)], entry)
+                    self._cond.notify_all()
+        except Exception as e:
+            logging.error(f"Error reading files for scan job {job.id}: {e}")
+        finally:
+            with self._cond:
+                self._reading.discard(job)
+            job._read_all()
+
+    def _next(self, lane: str):
+        """Pop the most urgent queued (job, file_path) of a lane, skipping cancelled jobs; None if empty."""
+        heap = self._heaps[lane]
+        with self._cond:
+            while heap and not self._closed:
+                _, _, _, job, file_path = heapq.heappop(heap)
+                job.queued -= 1
+                if job.queued <= self.window // 2 and job in self._reading:
+                    # Let the feeder refill the job's window
+                    self._cond.notify_all()
+                if not job.cancelled:
+                    return job, file_path
+        return None
+
+    def _run_lane(self, lane: str):
+        while True:
+            with self._cond:
+                while not self._heaps[lane] and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            # Files handed to the detector, in order; iter_scan yields in the same order
+            taken = deque()
+
+            def feed():
+                while True:
+                    item = self._next(lane)
+                    if item is None:
+                        return
+                    taken.append(item)
+                    yield item[1]
+
+            try:
+                for file_path, result in self.detector.iter_scan(feed(), batch_size=self.batch_size):
+                    job, _ = taken.popleft()
+                    job._deliver(file_path, result)
+                    with self._cond:
+                        self.completed[lane] += 1
+            except Exception as e:
+                logging.error(f"Error in {lane} scan lane: {e}")
+                while taken:
+                    job, file_path = taken.popleft()
+                    job._deliver(file_path, (False, [f"Error scanning file: {e}"]))
@@ -0,0 +1,202 @@
+"""
+Local moderation server: one resident ContentDetector shared by every client.
+
+    python -m nsfw_quarantine_app serve --port 8765
+    python -m nsfw_quarantine_app serve --unix /tmp/moderation.sock
+
+    POST /scan    body: raw image, video or audio bytes, UTF-8 text, or
+                  JSON {"path": "/abs/file.jpg"} or {"text": "..."} (Content-Type: application/json)
+    GET  /health  status and batching counters
+
+Every verdict is returned as JSON {"flagged": bool, "reasons": [...], "elapsed_ms": float}.
+Requests from all connections go through one AsyncContentDetector, so those
+arriving within --batch-window-ms of each other share a model forward pass.
+HTTP/1.1 keep-alive is supported; chunked request bodies are not.
+"""
+import asyncio
+import json
+import logging
+import os
+import stat
+import time
+from typing import Dict, Optional, Tuple
+
+from async_detector import AsyncContentDetector
+
+DEFAULT_PORT = 8765
+# Largest accepted request body
+MAX_BODY_BYTES = 64 * 1024 * 1024
+# Most header lines accepted per request
+MAX_HEADERS = 100
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 411: 'Length Required',
+            413: 'Payload Too Large', 415: 'Unsupported Media Type', 431: 'Request Header Fields Too Large',
+            500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ModerationServer:
+    """HTTP/1.1 request handling on asyncio streams, for TCP and Unix sockets alike."""
+
+    def __init__(self, detector: AsyncContentDetector, max_body: int = MAX_BODY_BYTES):
+        self.detector = detector
+        self.max_body = max_body
+        self.requests = 0
+        self.started = time.time()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    self._write(writer, e.status, {'error': str(e)}, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                status, payload = await self._route(method, target, headers, body)
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+                self._write(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """Parse one request; None when the client closed the connection between requests."""
+        try:
+            line = await reader.readline()
+        except ValueError:
+            raise HTTPError(431, "Request line too long")
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                raise HTTPError(431, "Header line too long")
+            if line in (b'\r\n', b'\n', b''):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HTTPError(431, "Too many headers")
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HTTPError(411, "Chunked request bodies are not supported; send Content-Length")
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > self.max_body:
+            raise HTTPError(413, f"Request body larger than {self.max_body} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, version.upper(), headers, body
+
+    async def _route(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Tuple[int, dict]:
+        path = target.split('?', 1)[0]
+        if path == '/health':
+            if method != 'GET':
+                return 405, {'error': "Use GET /health"}
+            return 200, self.health()
+        if path != '/scan':
+            return 404, {'error': f"No such endpoint: {path}"}
+        if method != 'POST':
+            return 405, {'error': "Use POST /scan"}
+        try:
+            item, mime = self._scan_item(headers.get('content-type', ''), body)
+        except HTTPError as e:
+            return e.status, {'error': str(e)}
+        self.requests += 1
+        start = time.perf_counter()
+        try:
+            is_flagged, reasons = await self.detector.scan(item, mime)
+        except Exception as e:
+            logging.error(f"Error serving scan request: {e}")
+            return 500, {'error': str(e)}
+        return 200, {'flagged': is_flagged, 'reasons': reasons,
+                     'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)}
+
+    @staticmethod
+    def _scan_item(content_type: str, body: bytes):
+        """(path or content, declared MIME type) to scan from a /scan request body."""
+        media_type = content_type.split(';', 1)[0].strip().lower()
+        if media_type == 'application/json':
+            try:
+                request = json.loads(body)
+            except ValueError as e:
+                raise HTTPError(400, f"Invalid JSON: {e}")
+            if not isinstance(request, dict):
+                raise HTTPError(400, 'Expected a JSON object with "path" or "text"')
+            if isinstance(request.get('path'), str):
+                if not os.path.isfile(request['path']):
+                    raise HTTPError(400, f"No such file: {request['path']}")
+                return request['path'], None
+            if isinstance(request.get('text'), str):
+                return request['text'].encode('utf-8'), 'text/plain'
+            raise HTTPError(400, 'Expected a JSON object with "path" or "text"')
+        if media_type.startswith(('image/', 'text/', 'video/', 'audio/')) or media_type in ('', 'application/octet-stream'):
+            if not body:
+                raise HTTPError(400, "Empty request body")
+            return body, media_type or None
+        raise HTTPError(415, f"Unsupported Content-Type: {media_type}")
+
+    def health(self) -> dict:
+        detector = self.detector
+        return {
+            'status': 'ok',
+            'uptime_s': round(time.time() - self.started, 1),
+            'requests': self.requests,
+            'batches': detector.batches,
+            'mean_batch_size': round(detector.batched_requests / detector.batches, 2) if detector.batches else 0.0,
+        }
+
+    @staticmethod
+    def _write(writer: asyncio.StreamWriter, status: int, payload: dict, keep_alive: bool):
+        body = json.dumps(payload).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+
+
+async def serve(detector, host: str = '127.0.0.1', port: int = DEFAULT_PORT, unix_path: Optional[str] = None,
+                max_batch: int = 16, batch_window_ms: float = 5.0, max_inflight: int = 256):
+    """Serve moderation requests until cancelled."""
+    async_detector = AsyncContentDetector(detector, max_batch=max_batch, batch_window_ms=batch_window_ms,
+                                          max_inflight=max_inflight)
+    handler = ModerationServer(async_detector)
+    if unix_path:
+        # A socket left behind by a previous run would make the bind fail
+        if os.path.exists(unix_path) and stat.S_ISSOCK(os.stat(unix_path).st_mode):
+            os.remove(unix_path)
+        server = await asyncio.start_unix_server(handler.handle, path=unix_path)
+        where = unix_path
+    else:
+        server = await asyncio.start_server(handler.handle, host, port)
+        where = f"http://{host}:{port}"
+    logging.info(f"Moderation server listening on {where} (batches of up to {max_batch}, "
+                 f"{batch_window_ms:g} ms window)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await async_detector.aclose()
+        if unix_path and os.path.exists(unix_path):
+            os.remove(unix_path)
@@ -0,0 +1,92 @@
+"""
+Identify in-memory content by its leading bytes instead of a file name.
+
+sniff_extension() maps content to the extension the detector would route it
+by ('.jpg', '.txt', '.mp4', ...). Magic numbers win over a declared MIME type,
+which is only used when the bytes are not recognised (e.g. Latin-1 text sent
+as text/plain), since upload metadata is easy to get wrong.
+"""
+from typing import Optional
+
+# Leading bytes looked at
+SNIFF_BYTES = 4096
+
+# (magic prefix, extension), checked in order
+_PREFIXES = (
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+    (b'fLaC', '.flac'),
+    (b'OggS', '.ogg'),
+    (b'ID3', '.mp3'),
+)
+# ISO-BMFF major brands of HEIF/HEIC/AVIF still images and image sequences; they
+# share MP4's ftyp box but are not video and PIL cannot decode them without a plugin
+_IMAGE_BRANDS = (
+    b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'hevm', b'hevs',
+    b'mif1', b'mif2', b'msf1', b'avif', b'avis',
+)
+# DIB header sizes of the BMP variants; 'BM' alone is too common a text prefix
+_BMP_HEADER_SIZES = (12, 40, 52, 56, 64, 108, 124)
+
+MIME_EXTENSIONS = {
+    'image/jpeg': '.jpg', 'image/png': '.png', 'image/gif': '.gif', 'image/bmp': '.bmp', 'image/webp': '.webp',
+    'text/plain': '.txt', 'text/markdown': '.md', 'text/csv': '.csv',
+    'video/mp4': '.mp4', 'video/x-matroska': '.mkv', 'video/webm': '.webm', 'video/quicktime': '.mov',
+    'audio/wav': '.wav', 'audio/x-wav': '.wav', 'audio/mpeg': '.mp3', 'audio/mp4': '.m4a', 'audio/flac': '.flac',
+    'audio/ogg': '.ogg',
+}
+
+
+def sniff_extension(data, mime: Optional[str] = None) -> Optional[str]:
+    """The extension content is scanned as, or None when it is neither recognised nor declared."""
+    view = memoryview(data)
+    head = bytes(view[:SNIFF_BYTES])
+    ext = _sniff_binary(head)
+    if ext == '':
+        # Recognised, but not a format the detector scans; a declared type must not override that
+        return None
+    if ext is None and _looks_like_text(head, complete=len(head) == view.nbytes):
+        ext = '.txt'
+    if ext is None and mime:
+        media_type = mime.split(';', 1)[0].strip().lower()
+        ext = MIME_EXTENSIONS.get(media_type, '.txt' if media_type.startswith('text/') else None)
+    return ext
+
+
+def _sniff_binary(head: bytes) -> Optional[str]:
+    """The extension for known magic bytes, '' for a known format that is not scanned, else None."""
+    for prefix, ext in _PREFIXES:
+        if head.startswith(prefix):
+            return ext
+    if head[:4] == b'RIFF':
+        return {b'WEBP': '.webp', b'WAVE': '.wav'}.get(head[8:12])
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        if brand in _IMAGE_BRANDS:
+            return ''
+        if brand in (b'M4A ', b'M4B '):
+            return '.m4a'
+        return '.mov' if brand == b'qt  ' else '.mp4'
+    if head[:4] == b'\x1aE\xdf\xa3':
+        # EBML; WebM declares its DocType near the start
+        return '.webm' if b'webm' in head[:64] else '.mkv'
+    if head[:2] == b'BM' and len(head) >= 18 and int.from_bytes(head[14:18], 'little') in _BMP_HEADER_SIZES:
+        return '.bmp'
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        # MPEG audio frame sync without an ID3 tag
+        return '.mp3'
+    return None
+
+
+def _looks_like_text(head: bytes, complete: bool) -> bool:
+    """UTF-8 without NUL bytes; a character cut off at the end of a partial sample is allowed."""
+    if not head or b'\x00' in head:
+        return False
+    try:
+        head.decode('utf-8')
+        return True
+    except UnicodeDecodeError as e:
+        # Only an incomplete sequence in the last 3 bytes of a truncated sample is acceptable
+        return not complete and e.start >= len(head) - 3 and e.reason == 'unexpected end of data'
@@ -0,0 +1,72 @@
+import re
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+
+DEFAULT_CHUNK_BYTES = 1024 * 1024
+
+_ESCAPED_BYTES = re.compile('[\udc80-\udcff]')
+
+
+def iter_text_segments(fileobj: BinaryIO, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Iterator[Tuple[str, int]]:
+    """
+    Read a binary stream in bounded chunks and yield (text, byte_offset) segments.
+
+    Segments are cut at the last ASCII whitespace of each chunk, so words are
+    never split across segments and every cut lands on a UTF-8 character
+    boundary. Invalid bytes are decoded with surrogateescape, so every
+    character maps back to an exact byte range (see char_to_byte_offsets).
+    At most about two chunks are held in memory at once.
+    """
+    carry = b''
+    offset = 0
+    while True:
+        chunk = fileobj.read(chunk_bytes)
+        if not chunk:
+            break
+        data = carry + chunk
+        cut = _last_whitespace(data)
+        if cut <= 0:
+            if len(data) < 2 * chunk_bytes:
+                carry = data
+                continue
+            # A single huge "word": cut at the chunk size anyway
+            cut = _utf8_boundary(data, chunk_bytes)
+        yield data[:cut].decode('utf-8', 'surrogateescape'), offset
+        offset += cut
+        carry = data[cut:]
+    if carry:
+        yield carry.decode('utf-8', 'surrogateescape'), offset
+
+
+def sanitize(text: str) -> str:
+    """Replace surrogate-escaped bytes with U+FFFD, keeping character positions unchanged."""
+    return _ESCAPED_BYTES.sub('\ufffd', text)
+
+
+def char_to_byte_offsets(text: str, base: int, char_offsets: Iterable[int]) -> List[int]:
+    """
+    Map ascending character offsets within a segment to absolute byte offsets.
+    Runs in a single pass over the segment.
+    """
+    result = []
+    prev_char = 0
+    byte_pos = base
+    for char_offset in char_offsets:
+        if char_offset < prev_char:
+            # Offsets must be ascending; restart from the beginning of the segment
+            prev_char, byte_pos = 0, base
+        byte_pos += len(text[prev_char:char_offset].encode('utf-8', 'surrogateescape'))
+        prev_char = char_offset
+        result.append(byte_pos)
+    return result
+
+
+def _last_whitespace(data: bytes) -> int:
+    """Index just past the last ASCII whitespace byte, or 0 if there is none."""
+    return max(data.rfind(b'\n'), data.rfind(b' '), data.rfind(b'\t'), data.rfind(b'\r')) + 1
+
+
+def _utf8_boundary(data: bytes, cut: int) -> int:
+    """Move cut back so it does not fall inside a multi-byte UTF-8 sequence."""
+    while cut > 0 and (data[cut] & 0xC0) == 0x80:
+        cut -= 1
+    return cut or len(data)
@@ -0,0 +1,177 @@
+"""
+Stream sampled video frames out of ffmpeg.
+
+Frames are piped as PPM images (a small header plus raw RGB, so every frame
+carries its own size and nothing has to be probed first) and their timestamps
+are read from the showinfo filter on stderr. Only the frames being classified
+are held in memory, so the length of the video does not matter.
+"""
+import queue
+import re
+import subprocess
+import threading
+from typing import Iterable, Iterator, Optional, Tuple
+
+from PIL import Image
+
+# keyframes: codec keyframes only; the decoder skips every other frame, and encoders
+#            place keyframes at scene cuts, so this is the cheapest sampling
+# scene:     frames whose scene-change score exceeds scene_threshold, and at least one
+#            every max_gap seconds (every frame is decoded to score it)
+# fps:       a fixed number of frames per second
+SAMPLING_MODES = ('keyframes', 'scene', 'fps')
+
+_PTS_TIME = re.compile(r'pts_time:\s*(-?[0-9.]+)')
+
+
+def ffmpeg_command(video_path: str, sampling: str = 'keyframes', fps: float = 1.0, scene_threshold: float = 0.3,
+                   max_gap: float = 5.0, size: int = 384, ffmpeg: str = 'ffmpeg'):
+    """The ffmpeg invocation that writes sampled frames, shorter side scaled to size, as PPM to stdout."""
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f"Unknown video sampling '{sampling}'. Choose from: {', '.join(SAMPLING_MODES)}")
+    command = [ffmpeg, '-nostdin', '-hide_banner', '-loglevel', 'info']
+    filters = []
+    if sampling == 'keyframes':
+        command += ['-skip_frame', 'nokey']
+    elif sampling == 'scene':
+        filters.append(f"select='isnan(prev_selected_t)+gt(scene,{scene_threshold})"
+                       f"+gte(t-prev_selected_t,{max_gap})'")
+    else:
+        filters.append(f'fps={fps}')
+    filters.append('showinfo')
+    filters.append(f'scale={size}:{size}:force_original_aspect_ratio=increase')
+    command += ['-i', video_path, '-an', '-sn', '-dn', '-vf', ','.join(filters), '-vsync', 'vfr',
+                '-f', 'image2pipe', '-vcodec', 'ppm', '-']
+    return command
+
+
+def iter_video_frames(video_path: str, sampling: str = 'keyframes', fps: float = 1.0, scene_threshold: float = 0.3,
+                      max_gap: float = 5.0, size: int = 384,
+                      ffmpeg: str = 'ffmpeg') -> Iterator[Tuple[Optional[float], Image.Image]]:
+    """
+    Yield (timestamp in seconds, RGB frame) for the sampled frames. Closing the
+    generator early (e.g. after the first confident detection) stops ffmpeg.
+    """
+    command = ffmpeg_command(video_path, sampling, fps, scene_threshold, max_gap, size, ffmpeg)
+    proc = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    timestamps = queue.Queue()
+    errors = []
+    reader = threading.Thread(target=_read_showinfo, args=(proc.stderr, timestamps, errors), daemon=True)
+    reader.start()
+    try:
+        while True:
+            frame = _read_ppm(proc.stdout)
+            if frame is None:
+                break
+            try:
+                timestamp = timestamps.get(timeout=10)
+            except queue.Empty:
+                timestamp = None
+            yield timestamp, frame
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {' '.join(errors[-3:]) or f'exit code {proc.returncode}'}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        reader.join(timeout=1)
+
+
+def _read_showinfo(stream, timestamps: queue.Queue, errors: list):
+    """Forward showinfo frame timestamps; keep the last few other lines for error messages."""
+    for raw in stream:
+        line = raw.decode('utf-8', errors='replace').rstrip()
+        if 'showinfo' in line:
+            match = _PTS_TIME.search(line)
+            if match:
+                timestamps.put(float(match.group(1)))
+                continue
+        if line and not line.startswith(' '):
+            errors.append(line)
+            del errors[:-20]
+    stream.close()
+
+
+def _read_ppm(stream) -> Optional[Image.Image]:
+    """Read one binary PPM (P6) image from the stream, or None at end of stream."""
+    magic = stream.readline()
+    if not magic:
+        return None
+    if magic.strip() != b'P6':
+        raise ValueError(f"Unexpected frame header from ffmpeg: {magic[:20]!r}")
+    fields = []
+    while len(fields) < 3:
+        line = stream.readline()
+        if not line:
+            raise ValueError("Truncated frame header from ffmpeg")
+        if line.startswith(b'#'):
+            continue
+        fields.extend(int(value) for value in line.split())
+    width, height, maxval = fields[:3]
+    if maxval != 255:
+        raise ValueError(f"Unsupported PPM max value {maxval}")
+    data = stream.read(width * height * 3)
+    if len(data) != width * height * 3:
+        raise ValueError("Truncated frame from ffmpeg")
+    return Image.frombytes('RGB', (width, height), data)
+
+
+def prefetch(items: Iterable, depth: int) -> Iterator:
+    """
+    Run an iterator in a background thread, keeping up to depth items ready, so
+    decoding the next frames overlaps with classifying the current ones.
+    Closing the returned generator stops the producer.
+    """
+    buffer = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                while not stop.is_set():
+                    try:
+                        buffer.put((item, None), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    break
+        except Exception as e:
+            buffer.put((done, e))
+            return
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+        buffer.put((done, None))
+
+    thread = threading.Thread(target=produce, name='video-prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                break
+            yield item
+    finally:
+        stop.set()
+        # Unblock a producer waiting on a full buffer
+        while thread.is_alive():
+            try:
+                buffer.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        thread.join()
+
+
+def format_timestamp(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return '?'
+    minutes, secs = divmod(max(0.0, seconds), 60)
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours:02d}:{minutes:02d}:{secs:04.1f}"